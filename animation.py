@@ -0,0 +1,148 @@
+"""
+Opacity fade engine for CodeFlowVision.
+A single FadeScheduler drives every in-flight opacity transition at a fixed
+frame rate. Retargeting a window mid-fade continues from its current value,
+and late frames are dropped instead of queued.
+"""
+import math
+import time
+
+
+def linear(t):
+    return t
+
+
+def ease_in_out(t):
+    return t * t * (3 - 2 * t)
+
+
+def ease_out(t):
+    return 1 - (1 - t) * (1 - t)
+
+
+EASINGS = {
+    "linear": linear,
+    "ease-in-out": ease_in_out,
+    "ease-out": ease_out,
+}
+
+
+class Fade:
+    """One window's transition from start to target opacity."""
+
+    __slots__ = ("start", "target", "start_time", "last_value")
+
+    def __init__(self, start, target, start_time):
+        self.start = start
+        self.target = target
+        self.start_time = start_time
+        self.last_value = start
+
+
+class FadeScheduler:
+    """Interpolate window opacities over time.
+
+    apply(hwnd, opacity) is called at most once per window per frame, and
+    only when the integer opacity actually changes. on_start() is called when
+    the scheduler goes from idle to having work, so the owner can arm a timer
+    for next_frame_delay().
+    """
+
+    def __init__(self, apply, clock=time.monotonic, duration=0.15, fps=60, easing="ease-in-out", on_start=None):
+        self.apply = apply
+        self.clock = clock
+        self.duration = duration
+        self.frame_interval = 1.0 / fps
+        self.easing = EASINGS.get(easing, ease_in_out)
+        self.on_start = on_start
+        self._fades = {}
+        self._next_frame = None
+        self.frames = 0
+        self.frames_skipped = 0
+        self.applied = 0
+
+    @property
+    def enabled(self):
+        return self.duration > 0
+
+    def active(self):
+        return bool(self._fades)
+
+    def current(self, hwnd, default=None):
+        """Return the opacity hwnd is showing mid-fade, or default."""
+        fade = self._fades.get(hwnd)
+        return fade.last_value if fade is not None else default
+
+    def animate(self, hwnd, start, target):
+        """Fade hwnd from start to target, merging with any fade in flight."""
+        fade = self._fades.get(hwnd)
+        if fade is not None:
+            if fade.target == target:
+                return
+            start = fade.last_value
+        if start == target:
+            self._fades.pop(hwnd, None)
+            return
+        now = self.clock()
+        self._fades[hwnd] = Fade(start, target, now)
+        if self._next_frame is None:
+            self._next_frame = now
+            if self.on_start is not None:
+                self.on_start()
+
+    def cancel(self, hwnd=None):
+        """Stop animating one window (or all) without applying anything."""
+        if hwnd is None:
+            self._fades.clear()
+        else:
+            self._fades.pop(hwnd, None)
+        if not self._fades:
+            self._next_frame = None
+
+    def next_frame_delay(self, now=None):
+        """Return seconds until the next frame is due, or None if idle."""
+        if self._next_frame is None:
+            return None
+        if now is None:
+            now = self.clock()
+        return max(0.0, self._next_frame - now)
+
+    def tick(self, now=None):
+        """Render one frame for every in-flight fade."""
+        if not self._fades:
+            self._next_frame = None
+            return
+        if now is None:
+            now = self.clock()
+        frame_time = self._next_frame if self._next_frame is not None else now
+
+        for hwnd, fade in list(self._fades.items()):
+            progress = 1.0 if self.duration <= 0 else min(1.0, (now - fade.start_time) / self.duration)
+            value = int(round(fade.start + (fade.target - fade.start) * self.easing(progress)))
+            if value != fade.last_value:
+                fade.last_value = value
+                self.apply(hwnd, value)
+                self.applied += 1
+            if progress >= 1.0:
+                # apply() may already have cancelled the fade
+                self._fades.pop(hwnd, None)
+        self.frames += 1
+
+        if not self._fades:
+            self._next_frame = None
+            return
+        # Stay on the frame grid; frames we are already late for are dropped
+        next_frame = frame_time + self.frame_interval
+        if next_frame <= now:
+            missed = math.floor((now - next_frame) / self.frame_interval) + 1
+            self.frames_skipped += missed
+            next_frame += missed * self.frame_interval
+        self._next_frame = next_frame
+
+    def stats(self):
+        return {
+            "in_flight": len(self._fades),
+            "frames": self.frames,
+            "frames_skipped": self.frames_skipped,
+            "applied": self.applied,
+        }
@@ -0,0 +1,1162 @@
+#!/usr/bin/env python
+"""
+CodeFlow Vision - Benchmarks
+Exercises the window-management engines against fake clocks and fake window
+backends, so they can be measured on any platform.
+
+Usage: python benchmark.py [name ...]
+
+A benchmark that checks an invariant lists what it found wrong under
+"violations"; the script then exits with status 1.
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import subprocess
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from animation import FadeScheduler
+from command_bus import CommandBus
+from control_server import ControlServer, send
+from event_loop import EventLoop, SimulatedClock, SimulatedMessageSource
+from focus_follow import FocusFollower
+from instrumentation import Profiler
+from log_pipeline import Deferred, LogPipeline
+from session_journal import SessionJournal
+from session_trace import load_trace, regressions, replay
+from simulated_desktop import SimulatedDesktop
+from layout import LAYOUT_MODES, Monitor, Rect, choose_monitor, compute_layout
+from window_events import DESTROY, FOREGROUND, MINIMIZE, MOVED, RESTORE, ScriptedEventSource, WindowTracker
+from window_ranking import WS_EX_TOOLWINDOW, WindowRanker
+from window_registry import WindowRegistry
+from window_rules import compile_rules
+from window_state import WS_EX_LAYERED, LayeredWindowState
+
+WS_EX_TOPMOST = 0x00000008
+
+
+class FakeLayeredWindows:
+    """Extended styles and alphas for fake windows, with a log of alpha calls.
+
+    Each alpha call is tagged with frame(), so calls can be grouped per frame.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.exstyles = {}
+        self.alphas = {}
+        self.alpha_calls = []
+
+    def get_exstyle(self, hwnd):
+        return self.exstyles.get(hwnd, 0)
+
+    def set_exstyle(self, hwnd, style):
+        self.exstyles[hwnd] = style
+
+    def set_alpha(self, hwnd, alpha):
+        self.alphas[hwnd] = alpha
+        self.alpha_calls.append((self.frame(), hwnd))
+
+
+def bench_fade(args):
+    """Hotkey storm against the fade scheduler; checks one alpha call per window per frame."""
+    rng = random.Random(args.seed)
+    clock = SimulatedClock()
+    windows = FakeLayeredWindows(lambda: fader.frames)
+    state = LayeredWindowState(windows.get_exstyle, windows.set_exstyle, windows.set_alpha)
+
+    def apply_frame(hwnd, opacity):
+        state.apply(hwnd, opacity, state.get(hwnd).clickthrough)
+
+    fps = 60
+    fader = FadeScheduler(apply_frame, clock=clock, duration=0.15, fps=fps)
+
+    def set_transparency(hwnd, opacity):
+        # Mirrors CodeFlowVision.set_transparency with fading enabled
+        applied = state.get(hwnd).opacity if state.get(hwnd) else 255
+        state.apply(hwnd, applied, False)
+        fader.animate(hwnd, fader.current(hwnd, applied), opacity)
+
+    hwnds = list(range(1, args.windows + 1))
+    for hwnd in hwnds:
+        set_transparency(hwnd, 255)
+    del windows.alpha_calls[:]
+
+    tick_seconds = 0.0
+    duration = 5.0
+    next_hotkey = 0.0
+    retargets = 0
+    while clock.now < duration:
+        delay = fader.next_frame_delay()
+        step = min(delay if delay is not None else 0.05, max(0.0, next_hotkey - clock.now))
+        # Simulate a busy UI thread that occasionally runs late
+        if rng.random() < 0.05:
+            step += rng.uniform(0.02, 0.08)
+        clock.advance(step)
+        if clock.now >= next_hotkey:
+            target = rng.choice((64, 160, 255))
+            for hwnd in rng.sample(hwnds, max(1, len(hwnds) // 2)):
+                set_transparency(hwnd, target)
+                retargets += 1
+            next_hotkey = clock.now + rng.uniform(0.005, 0.05)
+        if fader.next_frame_delay() == 0.0:
+            started = time.perf_counter()
+            fader.tick()
+            tick_seconds += time.perf_counter() - started
+
+    per_frame = Counter(windows.alpha_calls)
+    stats = fader.stats()
+    max_calls = max(per_frame.values()) if per_frame else 0
+    return {
+        "windows": args.windows,
+        "retargets": retargets,
+        "frames": stats["frames"],
+        "frames_skipped": stats["frames_skipped"],
+        "alpha_calls": len(windows.alpha_calls),
+        "max_alpha_calls_per_window_frame": max_calls,
+        "mean_tick_us": tick_seconds / max(1, stats["frames"]) * 1e6,
+        "state": state.stats(),
+        "violations": [f"{max_calls} alpha calls for one window in one frame"] if max_calls > 1 else [],
+    }
+
+
+def bench_control(args):
+    """Concurrent clients sending batched commands to the control server over a local socket."""
+    if sys.platform == "win32":
+        address = r"\\.\pipe\CodeFlowVision-benchmark-" + str(os.getpid())
+    else:
+        address = os.path.join(tempfile.gettempdir(), f"codeflowvision-benchmark-{os.getpid()}.sock")
+    opacities = {}
+    handlers = {
+        "state": lambda command: {"windows": len(opacities)},
+        "opacity": lambda command: opacities.update({hwnd: int(command["opacity"]) for hwnd in range(4)}),
+        "preset": lambda command: None,
+    }
+    wakeup = threading.Event()
+    server = ControlServer(handlers, address=address, wake=wakeup.set)
+    ui_busy = [0.0]
+    stopping = threading.Event()
+
+    def ui_thread():
+        # Stands in for the event loop: sleeps until woken, then runs the poller
+        while not stopping.is_set():
+            wakeup.wait(0.1)
+            wakeup.clear()
+            started = time.perf_counter()
+            server.process()
+            ui_busy[0] += time.perf_counter() - started
+
+    if not server.start():
+        return {"error": f"could not listen on {address}"}
+    ui = threading.Thread(target=ui_thread, daemon=True)
+    ui.start()
+
+    clients = 32
+    round_trips = 50
+    batch = [{"cmd": "opacity", "opacity": 200}, {"cmd": "preset", "name": "dynamic"},
+             {"cmd": "opacity", "opacity": 255}, {"cmd": "state"}]
+    samples = []
+    failures = []
+
+    def client():
+        local = []
+        for _ in range(round_trips):
+            started = time.perf_counter()
+            try:
+                response = send(batch, address=address)
+            except OSError as e:
+                failures.append(str(e))
+                continue
+            local.append(time.perf_counter() - started)
+            if not all(result["ok"] for result in response["results"]):
+                failures.append(response)
+        samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stopping.set()
+    wakeup.set()
+    ui.join()
+    server.stop()
+
+    samples.sort()
+    stats = server.stats()
+    return {
+        "clients": clients,
+        "requests": stats["requests"],
+        "commands": stats["commands"],
+        "failures": len(failures),
+        "requests_per_second": len(samples) / elapsed,
+        "commands_per_second": len(samples) * len(batch) / elapsed,
+        "round_trip_p50_ms": samples[len(samples) // 2] * 1000 if samples else 0.0,
+        "round_trip_p99_ms": samples[int(len(samples) * 0.99)] * 1000 if samples else 0.0,
+        "ui_thread_us_per_request": ui_busy[0] / max(1, stats["requests"]) * 1e6,
+    }
+
+
+def bench_event_loop(args):
+    """Wakeups per second over an idle hour with sporadic hotkeys, versus the old 100 ms poll."""
+    rng = random.Random(args.seed)
+    clock = SimulatedClock()
+    source = SimulatedMessageSource(clock)
+    loop = EventLoop(source, clock=clock)
+    bus = CommandBus(debounce=0.03, clock=clock, on_post=loop.wake)
+
+    def process_commands():
+        for command in bus.drain():
+            bus.complete(command)
+
+    loop.add_poller(process_commands, bus.time_until_ready)
+    loop.call_every(5.0, lambda: None)  # fallback window check
+    duration = 3600.0
+    at = 0.0
+    while True:
+        at += rng.expovariate(1 / 60.0)  # a hotkey about once a minute
+        if at >= duration:
+            break
+        source.post(at, lambda: bus.post("toggle_transparency"))
+    loop.call_later(duration, loop.stop)
+    loop.run()
+
+    stats = loop.stats()
+    return {
+        "simulated_seconds": duration,
+        "hotkeys": bus.posted,
+        "wakeups": stats["wakeups"],
+        "wakeups_per_second": stats["wakeups_per_second"],
+        "polling_wakeups_per_second": 1 / 0.1 + 1 / 5.0,
+        "command_p95_latency_ms": bus.stats()["p95_latency"] * 1000,
+    }
+
+
+def bench_focus(args):
+    """Simulated focus stream (clicks, Alt+Tab bursts, popups) through tracker, follower and window state."""
+    rng = random.Random(args.seed)
+    clock = SimulatedClock()
+    source = SimulatedMessageSource(clock)
+    loop = EventLoop(source, clock=clock)
+    registry = WindowRegistry()
+    managed = [1, 2, 3, 4]
+    for hwnd in managed:
+        registry.add(hwnd, "ide" if hwnd % 2 else "browser")
+    popups = list(range(100, 110))  # dialogs, menus and other applications
+    events = ScriptedEventSource(clock)
+    tracker = WindowTracker(events, registry, lambda hwnd: None, clock=clock)
+    windows = FakeLayeredWindows(lambda: 0)
+    state = LayeredWindowState(windows.get_exstyle, windows.set_exstyle, windows.set_alpha)
+    emitted_at = {}  # hwnd -> wall time of its last focus event
+    reaction_us = []
+    active = [None]
+
+    def on_focus(hwnd):
+        # Mirrors CodeFlowVision.follow_focus with the dynamic preset
+        if hwnd == active[0]:
+            return
+        active[0] = hwnd
+        for member in managed:
+            state.apply(member, 160 if member == hwnd else 255, False)
+        reaction_us.append((time.perf_counter() - emitted_at[hwnd]) * 1e6)
+
+    follower = FocusFollower(lambda hwnd: hwnd in registry, on_focus, debounce=0.04, clock=clock)
+    tracker.focus_listeners.append(lambda event, role: follower.note(event.hwnd, event.timestamp))
+    loop.add_poller(tracker.process)
+    loop.add_poller(follower.flush, follower.time_until_ready)
+
+    def focus(hwnd):
+        emitted_at[hwnd] = time.perf_counter()
+        events.emit(FOREGROUND, hwnd)
+
+    duration = 600.0
+    at = 0.0
+    while at < duration:
+        at += rng.expovariate(1 / 2.0)
+        kind = rng.random()
+        if kind < 0.2:
+            # Alt+Tab burst: several windows flash past 10-30 ms apart
+            for _ in range(rng.randint(3, 6)):
+                source.post(at, lambda hwnd=rng.choice(managed): focus(hwnd))
+                at += rng.uniform(0.01, 0.03)
+        elif kind < 0.35:
+            source.post(at, lambda hwnd=rng.choice(popups): focus(hwnd))
+        else:
+            source.post(at, lambda hwnd=rng.choice(managed): focus(hwnd))
+    loop.call_later(duration + 1.0, loop.stop)
+    started = time.perf_counter()
+    loop.run()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(follower.latencies)
+    reaction_us.sort()
+    stats = follower.stats()
+    return {
+        "simulated_seconds": duration,
+        "focus_events": stats["events"],
+        "ignored_unmanaged": stats["ignored"],
+        "coalesced": stats["coalesced"],
+        "applied": stats["applied"],
+        "immediate_applies": sum(1 for latency in latencies if latency == 0),
+        "settled_max_latency_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "alpha_calls": len(windows.alpha_calls),
+        "reaction_p50_us": reaction_us[len(reaction_us) // 2] if reaction_us else 0.0,
+        "reaction_max_us": reaction_us[-1] if reaction_us else 0.0,
+        "wall_seconds": elapsed,
+    }
+
+
+def bench_registry(args):
+    """Refresh, lookup and group resolution cost for a registry of many windows."""
+    rng = random.Random(args.seed)
+    count = max(args.windows, 500)
+    processes = [("code.exe", "ide"), ("pycharm64.exe", "ide"), ("chrome.exe", "browser"), ("msedge.exe", "browser")]
+    entries = []
+    for index in range(count):
+        process_name, role = rng.choice(processes)
+        entries.append((1000 + index, role, process_name, rng.randrange(100, 140)))
+    registry = WindowRegistry()
+
+    def timed(func, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) / repeat * 1e6
+
+    hwnds = [entry[0] for entry in entries]
+    spec = {"ide": 3, "browser": 2}
+    refresh_us = timed(lambda: registry.refresh(entries), 50)
+    lookup_us = timed(lambda: (registry.get(rng.choice(hwnds)), registry.by_pid(120), registry.by_process("code.exe")), 10000)
+    touch_us = timed(lambda: registry.touch(rng.choice(hwnds)), 10000)
+    group_us = timed(lambda: registry.group(spec), 1000)
+    return {
+        "windows": count,
+        "refresh_us": refresh_us,
+        "lookup_us": lookup_us,
+        "touch_us": touch_us,
+        "group_resolve_us": group_us,
+        "group": registry.group(spec),
+    }
+
+
+def bench_ranking(args):
+    """Pick the main browser and IDE windows on a desktop of thousands of windows, by z-order versus by rank.
+
+    Every candidate process owns three main windows (one minimized) among many
+    decoys: owned popups, tool windows, windows cloaked on another virtual
+    desktop and small panels, more of which open on top during the session.
+    The right pick for a role is the main window focused last, or the topmost
+    one before any is focused.
+    """
+    rng = random.Random(args.seed)
+    count = max(args.windows, 3000)
+    monitors = synthetic_monitors()
+    desktop = SimulatedDesktop(monitors=monitors)
+    roles = {"chrome.exe": "browser", "msedge.exe": "browser", "code.exe": "ide", "cursor.exe": "ide"}
+    for pid, name in enumerate(list(roles) + ["explorer.exe", "slack.exe", "outlook.exe"], 100):
+        desktop.add_process(pid, name)
+    candidate_pids = [pid for pid, (name, _, _) in desktop.processes.items() if name in roles]
+    mains = {}  # hwnd -> role
+
+    def open_window(pid, kind):
+        left, top = rng.randrange(-1920, 2000), rng.randrange(0, 900)
+        if kind in ("main", "minimized", "tool", "cloaked"):
+            width, height = rng.randrange(1000, 1900), rng.randrange(700, 1040)
+        else:
+            width, height = rng.randrange(400, 700), rng.randrange(300, 500)
+        owner = rng.choice([hwnd for hwnd in mains if desktop.windows[hwnd].pid == pid] or [0]) if kind == "popup" else 0
+        hwnd = desktop.create_window(
+            f"{kind} {len(desktop.windows)}", pid, "Chrome_WidgetWin_1", (left, top, left + width, top + height),
+            exstyle=WS_EX_TOOLWINDOW if kind == "tool" else 0, owner=owner, cloaked=kind == "cloaked"
+        )
+        if kind == "minimized":
+            desktop.minimize(hwnd)
+        return hwnd
+
+    decoys = ["popup", "tool", "cloaked", "panel"]
+    layout_order = [(pid, kind) for pid in candidate_pids for kind in ("main", "main", "minimized")]
+    layout_order += [(rng.choice(candidate_pids), rng.choice(decoys)) for _ in range(count // 2 - len(layout_order))]
+    layout_order += [(rng.choice([103, 104, 105]), "other") for _ in range(count - len(layout_order))]
+    rng.shuffle(layout_order)
+    for pid, kind in layout_order:
+        hwnd = open_window(pid, kind)
+        if kind in ("main", "minimized"):
+            mains[hwnd] = roles[desktop.processes[pid][0]]
+    desktop.events.poll()  # the desktop as the application finds it
+
+    def classify(hwnd):
+        pid = desktop.window_pid(hwnd)
+        name = desktop.name(pid)
+        return (roles[name], name, pid) if name in roles else None
+
+    ranker = WindowRanker(desktop)
+    registry = WindowRegistry()
+
+    def rank(event, role):
+        hwnd = event.hwnd
+        if event.kind == DESTROY:
+            ranker.forget(hwnd)
+            return
+        if event.kind == FOREGROUND:
+            ranker.note_focus(hwnd)
+        elif event.kind in (MINIMIZE, RESTORE):
+            ranker.note_minimized(hwnd, event.kind == MINIMIZE)
+        elif event.kind == MOVED:
+            ranker.invalidate(hwnd)
+        registry.set_score(hwnd, ranker.score(hwnd))
+
+    tracker = WindowTracker(desktop.events, registry, classify, clock=desktop.clock)
+    tracker.listeners.append(rank)
+
+    # Full scan: classify every window, read every candidate's features and rank them
+    calls = sum(desktop.calls.values())
+    busy = desktop.busy
+    started = time.perf_counter()
+    candidates = []
+    for hwnd in desktop.enum_windows():
+        verdict = classify(hwnd)
+        if verdict is not None:
+            candidates.append((hwnd,) + verdict)
+    ranker.set_monitors(desktop.monitors())
+    scores = {hwnd: ranker.score(hwnd, refresh=True) for hwnd, *_ in candidates}
+    registry.refresh(candidates, scores, [hwnd for hwnd, *_ in candidates if ranker.features(hwnd).minimized])
+    scan_seconds = time.perf_counter() - started
+    scan_calls = sum(desktop.calls.values()) - calls
+    scan_busy = desktop.busy - busy
+
+    def z_order_pick(role):
+        # What a pick by z-order alone (the topmost window of the role) would choose
+        infos = [info for info in registry if info.role == role]
+        return min(infos, key=lambda info: (info.hwnd in registry.minimized, info.z)).hwnd if infos else None
+
+    truth = {}
+    for hwnd in desktop.z_order:
+        if hwnd in mains and not desktop.windows[hwnd].minimized:
+            truth.setdefault(mains[hwnd], hwnd)
+    live_decoys = [hwnd for hwnd, window in desktop.windows.items() if hwnd not in mains and window.pid in candidate_pids]
+    right = Counter()
+    events = 0
+    event_seconds = 0.0
+    calls = sum(desktop.calls.values())
+    for _ in range(args.actions):
+        roll = rng.random()
+        if roll < 0.4:
+            hwnd = rng.choice(list(mains))
+            desktop.focus(hwnd)
+            truth[mains[hwnd]] = hwnd
+        elif roll < 0.6:
+            live_decoys.append(open_window(rng.choice(candidate_pids), rng.choice(decoys)))
+        elif roll < 0.75:
+            # A dialog, popup or panel takes focus for a moment (cloaked windows cannot)
+            desktop.focus(rng.choice([hwnd for hwnd in live_decoys if not desktop.windows[hwnd].cloaked]))
+        elif roll < 0.85:
+            hwnd = rng.choice(list(mains))
+            left, top = rng.randrange(0, 1000), rng.randrange(0, 400)
+            desktop.move_window(hwnd, (left, top, left + rng.randrange(900, 1900), top + rng.randrange(600, 1000)))
+        elif roll < 0.95:
+            hwnd = rng.choice(live_decoys)
+            (desktop.unminimize if desktop.windows[hwnd].minimized else desktop.minimize)(hwnd)
+        else:
+            hwnd = live_decoys.pop(rng.randrange(len(live_decoys)))
+            desktop.destroy_window(hwnd)
+        started = time.perf_counter()
+        events += tracker.process()
+        event_seconds += time.perf_counter() - started
+        for role, hwnd in truth.items():
+            right["z_order"] += z_order_pick(role) == hwnd
+            right["ranked"] += registry.top(role, 1) == [hwnd]
+    checks = args.actions * len(truth)
+    return {
+        "windows": len(desktop.windows),
+        "candidates": len(registry),
+        "full_scan_ms": scan_seconds * 1000,
+        "full_scan_calls": scan_calls,
+        "modeled_full_scan_ms": scan_busy * 1000,
+        "events": events,
+        "incremental_us_per_event": event_seconds / events * 1e6 if events else 0.0,
+        "calls_per_event": (sum(desktop.calls.values()) - calls) / events if events else 0.0,
+        "feature_reads": ranker.reads,
+        "z_order_pick_correct": right["z_order"] / checks,
+        "ranked_pick_correct": right["ranked"] / checks,
+        "violations": ["ranking picks the main window less often than z-order"]
+        if right["ranked"] < right["z_order"] else [],
+    }
+
+
+def bench_rules(args):
+    """Classify 10k synthetic windows with the compiled rule matcher versus per-rule checks."""
+    rng = random.Random(args.seed)
+    config = {
+        "ide_process_names": ["code.exe", "pycharm64.exe", "eclipse.exe", "sublime_text.exe", "atom.exe", "webstorm64.exe", "cursor.exe"],
+        "browser_process_names": ["chrome.exe", "firefox.exe", "msedge.exe", "opera.exe", "brave.exe", "vivaldi.exe", "safari.exe", "iexplore.exe"],
+        "rules": [
+            {"exclude": True, "title": "^DevTools"},
+            {"exclude": True, "max_width": 399},
+            {"exclude": True, "max_height": 299},
+            {"role": "ide", "class": ["SunAwtFrame"], "title": " \u2013 "},
+        ] + [{"role": "ide", "process": [f"tool{index}.exe"], "title": f"project{index}"} for index in range(args.rules)],
+    }
+    processes = config["ide_process_names"] + config["browser_process_names"] + ["explorer.exe", "slack.exe", "java.exe", "outlook.exe"]
+    classes = ["Chrome_WidgetWin_1", "SunAwtFrame", "MozillaWindowClass", "CabinetWClass", "ConsoleWindowClass"]
+    titles = ["main.py - Visual Studio Code", "DevTools - localhost", "Inbox", "proj \u2013 app.py", "Stack Overflow - Chrome", "project7 notes"]
+    windows = []
+    for hwnd in range(10000):
+        size = (rng.choice((200, 800, 1920)), rng.choice((150, 600, 1080)))
+        windows.append((hwnd, rng.choice(processes), rng.choice(classes), rng.choice(titles), lambda size=size: size))
+
+    compiled_rules = compile_rules(config)
+
+    def naive(process_name, class_name, title, size):
+        # Every rule checked in turn, each title regex searched separately
+        for rule in compiled_rules.rules:
+            if "process" in rule and process_name not in rule["process"]:
+                continue
+            if "class" in rule and class_name not in rule["class"]:
+                continue
+            if "title" in rule and not re.search(rule["title"], title, re.IGNORECASE):
+                continue
+            width, height = size()
+            if width < rule.get("min_width", width) or height < rule.get("min_height", height):
+                continue
+            if width > rule.get("max_width", width) or height > rule.get("max_height", height):
+                continue
+            return None if rule.get("exclude") else rule["role"]
+        return None
+
+    started = time.perf_counter()
+    expected = [naive(p, c, t, s) for _, p, c, t, s in windows]
+    naive_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    verdicts = [compiled_rules.match(p, c, t, size=s) for _, p, c, t, s in windows]
+    compiled_seconds = time.perf_counter() - started
+
+    for (hwnd, _, _, title, _), verdict in zip(windows, verdicts):
+        compiled_rules.remember(hwnd, title, verdict)
+    started = time.perf_counter()
+    for hwnd, _, _, title, _ in windows:
+        compiled_rules.recall(hwnd, title)
+    memo_seconds = time.perf_counter() - started
+
+    return {
+        "windows": len(windows),
+        "rules": len(compiled_rules.rules),
+        "verdicts_agree": verdicts == expected,
+        "naive_us_per_window": naive_seconds / len(windows) * 1e6,
+        "compiled_us_per_window": compiled_seconds / len(windows) * 1e6,
+        "memoized_us_per_window": memo_seconds / len(windows) * 1e6,
+        "matched": Counter(verdicts),
+        "violations": [] if verdicts == expected else ["compiled rules disagree with per-rule checks"],
+    }
+
+
+def synthetic_monitors():
+    """Triple-monitor, mixed-DPI topology with a bottom taskbar on the primary and a side one on the left."""
+    return [
+        Monitor(1, Rect(0, 0, 3840, 2160), Rect(0, 0, 3840, 2100), True, 144),
+        Monitor(2, Rect(-1920, 0, 0, 1080), Rect(-1860, 0, 0, 1080), False, 96),
+        Monitor(3, Rect(3840, -400, 5280, 2160), Rect(3840, -400, 5280, 2160), False, 120),
+    ]
+
+
+def bench_layout(args):
+    """Compute every layout mode on a synthetic topology and check placements stay inside work areas."""
+    monitors = synthetic_monitors()
+    results = {}
+    for mode in LAYOUT_MODES:
+        for count in (2, 5):
+            hwnds = list(range(1, count + 1))
+            monitor = choose_monitor(monitors, "current", point=(-500, 500))
+            ratios = [2, 1] if count == 2 else None
+            started = time.perf_counter()
+            for _ in range(1000):
+                placements = compute_layout(mode, monitors, hwnds, ratios, monitor, gap=4)
+            elapsed = (time.perf_counter() - started) / 1000
+            inside = all(any(m.work_area.left <= r.left and r.right <= m.work_area.right and
+                             m.work_area.top <= r.top and r.bottom <= m.work_area.bottom for m in monitors)
+                         for _, r in placements)
+            results[f"{mode}/{count}"] = {
+                "us": elapsed * 1e6,
+                "inside_work_areas": inside,
+            }
+    results["violations"] = [f"{name} places windows outside the work areas"
+                             for name, result in results.items() if not result["inside_work_areas"]]
+    return results
+
+
+class SlowHandler(logging.Handler):
+    """Handler that formats records and stalls like a slow or contended disk."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.written = 0
+
+    def emit(self, record):
+        self.format(record)
+        time.sleep(self.delay)
+        self.written += 1
+
+
+def bench_logging(args):
+    """Hotkey handler latency with synchronous vs queued logging, across disk speeds and log levels."""
+    title_delay = 0.001  # GetWindowText on a busy window
+
+    def slow_title(hwnd):
+        time.sleep(title_delay)
+        return f"window {hwnd}"
+
+    def hotkey_sync(logger, hwnd):
+        # The old style: f-strings resolve titles while the record is created
+        logger.info(f"Z-order set: {slow_title(hwnd)} (transparent) on top of {slow_title(hwnd + 1)} (opaque)")
+        logger.info(f"Active window swapped to: {slow_title(hwnd)}")
+
+    def hotkey_queued(logger, hwnd):
+        logger.info("Z-order set: %s (transparent) on top of %s (opaque)",
+                    Deferred(slow_title, hwnd), Deferred(slow_title, hwnd + 1))
+        logger.info("Active window swapped to: %s", Deferred(slow_title, hwnd))
+
+    results = {}
+    for disk_ms in (0.0, 5.0):
+        for level in ("INFO", "WARNING"):
+            for mode, hotkey in (("sync", hotkey_sync), ("queued", hotkey_queued)):
+                logger = logging.getLogger(f"benchmark.logging.{disk_ms}.{level}.{mode}")
+                logger.propagate = False
+                logger.setLevel(level)
+                sink = SlowHandler(disk_ms / 1000)
+                pipeline = None
+                if mode == "queued":
+                    pipeline = LogPipeline([sink])
+                    logger.addHandler(pipeline.handler)
+                    pipeline.start()
+                else:
+                    logger.addHandler(sink)
+                samples = []
+                for index in range(50):
+                    started = time.perf_counter()
+                    hotkey(logger, index)
+                    samples.append((time.perf_counter() - started) * 1e6)
+                if pipeline is not None:
+                    pipeline.stop()
+                samples.sort()
+                results[f"disk_{disk_ms:g}ms/{level}/{mode}"] = {
+                    "p50_us": samples[len(samples) // 2],
+                    "max_us": samples[-1],
+                    "records_written": sink.written,
+                }
+    return results
+
+
+# Modules on the startup path, ours and third-party, in roughly the order they load
+STARTUP_MODULES = [
+    "main", "log_pipeline", "instrumentation", "config_service", "control_server", "event_loop",
+    "window_rules", "window_ranking", "layout", "window_backend", "transparency_manager",
+    "win32gui", "win32con", "pynput", "psutil", "tkinter",
+]
+
+
+def cold_import_us(module, repeat):
+    """Median cumulative import time of module in fresh interpreters (-X importtime), or None if it fails."""
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        if result.returncode != 0:
+            return None
+        for line in result.stderr.splitlines():
+            fields = [field.strip() for field in line.split("|")]
+            if len(fields) == 3 and fields[2] == module:
+                samples.append(int(fields[1]))
+    samples.sort()
+    return samples[len(samples) // 2] if samples else None
+
+
+def bench_startup(args):
+    """Cold import time per startup module and, on Windows, the app's own per-phase startup times."""
+    repeat = 5
+    results = {"imports_ms": {}}
+    for module in STARTUP_MODULES:
+        micros = cold_import_us(module, repeat)
+        results["imports_ms"][module] = micros / 1000 if micros is not None else "unavailable"
+
+    if sys.platform == "win32":
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "main.py", "--exit-after-startup"],
+                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            wall_ms = (time.perf_counter() - started) * 1000
+            lines = result.stdout.strip().splitlines()
+            if result.returncode != 0 or not lines:
+                results["app"] = {"error": result.stderr[-500:]}
+                break
+            summary = json.loads(lines[-1])
+            summary["process_ms"] = wall_ms
+            runs.append(summary)
+        if runs:
+            def median(values):
+                return sorted(values)[len(values) // 2]
+            results["app"] = {
+                "runs": len(runs),
+                "phases_ms": {name: median([run["phases_ms"][name] for run in runs]) for name in runs[0]["phases_ms"]},
+                "total_ms": median([run["total_ms"] for run in runs]),
+                "process_ms": median([run["process_ms"] for run in runs]),
+            }
+    else:
+        results["app"] = "requires Windows (main.py --exit-after-startup)"
+    return results
+
+
+def bench_journal(args):
+    """Journal many changed windows, abandon the session as a crash would, then restore them all on the next start."""
+    rng = random.Random(args.seed)
+    count = max(args.windows, 150)
+    monitors = synthetic_monitors()
+    desktop = SimulatedDesktop(monitors=monitors)
+    hwnds = []
+    for index in range(count):
+        pid = 1000 + index % 40
+        desktop.add_process(pid, f"app{pid}.exe")
+        left, top = rng.randrange(0, 1500), rng.randrange(0, 800)
+        hwnd = desktop.create_window(f"Window {index}", pid, "AppWindow", (left, top, left + 1200, top + 900))
+        if rng.random() < 0.1:
+            # Already layered by its own application
+            desktop.windows[hwnd].exstyle = WS_EX_LAYERED
+            desktop.windows[hwnd].alpha = 230
+        hwnds.append(hwnd)
+    originals = {hwnd: (w.exstyle, w.alpha, w.rect) for hwnd, w in desktop.windows.items()}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.journal")
+        journal = SessionJournal(path, desktop)
+        state = LayeredWindowState(desktop.get_exstyle, desktop.set_exstyle, desktop.set_alpha, on_adopt=journal.adopt)
+        started = time.perf_counter()
+        for hwnd in hwnds:
+            state.apply(hwnd, rng.choice([64, 128, 160, 200]), clickthrough=rng.random() < 0.5)
+            journal.note_geometry(hwnd)
+        adopt_seconds = time.perf_counter() - started
+        desktop.apply_layout(compute_layout("split", monitors, hwnds, monitor=monitors[0]))
+        for hwnd in hwnds:
+            journal.note_placement(hwnd)
+        journal_bytes = os.path.getsize(path)
+        journal.close()  # the process dies here: nothing is restored
+
+        desktop.calls.clear()
+        busy = desktop.busy
+        started = time.perf_counter()
+        restored = SessionJournal(path, desktop).recover()
+        restore_seconds = time.perf_counter() - started
+        journal_left = os.path.exists(path)
+
+    intact = all(
+        w.exstyle == exstyle and w.rect == rect and (not exstyle & WS_EX_LAYERED or w.alpha == alpha)
+        for w, (exstyle, alpha, rect) in ((desktop.windows[hwnd], originals[hwnd]) for hwnd in hwnds)
+    )
+    return {
+        "windows": count,
+        "journal_us_per_window": adopt_seconds / count * 1e6,
+        "journal_bytes": journal_bytes,
+        "restored": restored,
+        "restore_ms": restore_seconds * 1000,
+        "modeled_restore_ms": (desktop.busy - busy) * 1000,
+        "position_batches": desktop.calls["win32gui.EndDeferWindowPos"],
+        "restore_calls": dict(sorted(desktop.calls.items())),
+        "all_restored": intact and restored == count,
+        "journal_removed": not journal_left,
+        "violations": [problem for problem, failed in (
+            (f"{count - restored} windows not restored", restored != count),
+            ("a window's style, alpha or position differs from the original", not intact),
+            ("the journal was left behind", journal_left),
+        ) if failed],
+    }
+
+
+def synthetic_session(rng, windows, actions):
+    """A recorded-session lookalike: a busy desktop, then focus changes, hotkeys and windows coming and going."""
+    from transparency_manager import DEFAULT_CONFIG
+    apps = [
+        ("code.exe", "Chrome_WidgetWin_1", "{} - project - Visual Studio Code"),
+        ("pycharm64.exe", "SunAwtFrame", "project \u2013 {}"),
+        ("chrome.exe", "Chrome_WidgetWin_1", "{} - Google Chrome"),
+        ("firefox.exe", "MozillaWindowClass", "{} \u2014 Mozilla Firefox"),
+        ("explorer.exe", "CabinetWClass", "{}"),
+        ("slack.exe", "Chrome_WidgetWin_1", "Slack | {}"),
+        ("outlook.exe", "rctrl_renwnd32", "Inbox - {}"),
+    ]
+    processes = {"4": {"name": "explorer.exe", "ppid": 0}}
+    hwnds = iter(range(0x10000, 0x10000 + 2 * (windows + actions), 2))
+
+    def new_window(index):
+        name, class_name, title = rng.choice(apps)
+        pid = 100 + apps.index((name, class_name, title))
+        processes[str(pid)] = {"name": name, "ppid": 4}
+        if rng.random() < 0.15:
+            size = (rng.randrange(150, 400), rng.randrange(80, 300))  # popups and tooltips
+        else:
+            size = (rng.randrange(800, 1900), rng.randrange(600, 1040))
+        left, top = rng.randrange(0, 200), rng.randrange(0, 200)
+        return {
+            "hwnd": next(hwnds), "title": title.format(f"doc{index}"), "class_name": class_name, "pid": pid,
+            "rect": [left, top, left + size[0], top + size[1]], "visible": True, "child": False,
+        }
+
+    open_windows = [new_window(index) for index in range(windows)]
+    header = {
+        "type": "desktop",
+        "monitors": [{"handle": m.handle, "rect": list(m.rect), "work_area": list(m.work_area),
+                      "primary": m.primary, "dpi": m.dpi} for m in synthetic_monitors()],
+        "processes": processes,
+        "windows": list(open_windows),
+        "config": DEFAULT_CONFIG,
+    }
+    events = [{"t": 0.5, "type": "hotkey", "action": "toggle_transparency"}]
+    minimized = set()
+    t = 0.5
+    hotkeys = ["swap_active"] * 6 + ["next_preset", "reset_layout", "next_group"]
+    for index in range(actions):
+        # Mostly spread out, with occasional bursts faster than the debounce intervals
+        t += rng.uniform(0.005, 0.03) if rng.random() < 0.2 else rng.uniform(0.1, 1.0)
+        roll = rng.random()
+        hwnd = rng.choice(open_windows)["hwnd"]
+        if roll < 0.4:
+            event = {"type": "focus", "hwnd": hwnd}
+            minimized.discard(hwnd)
+        elif roll < 0.65:
+            event = {"type": "hotkey", "action": rng.choice(hotkeys)}
+        elif roll < 0.78:
+            window = new_window(windows + index)
+            open_windows.append(window)
+            event = {"type": "create", "window": window, "processes": processes}
+        elif roll < 0.88 and len(open_windows) > 4:
+            open_windows = [window for window in open_windows if window["hwnd"] != hwnd]
+            minimized.discard(hwnd)
+            event = {"type": "destroy", "hwnd": hwnd}
+        elif hwnd in minimized:
+            minimized.discard(hwnd)
+            event = {"type": "restore", "hwnd": hwnd}
+        else:
+            minimized.add(hwnd)
+            event = {"type": "minimize", "hwnd": hwnd}
+        event["t"] = round(t, 6)
+        events.append(event)
+    return header, events
+
+
+def bench_replay(args):
+    """Replay a session trace (--trace, or a synthetic one) through CodeFlowVision on a simulated desktop."""
+    if args.trace:
+        header, events = load_trace(args.trace)
+    else:
+        header, events = synthetic_session(random.Random(args.seed), args.windows, args.actions)
+    result = replay(header, events)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            result["regressions"] = regressions(result, json.load(f))
+    return result
+
+
+class SimulatedApp:
+    """CodeFlowVision on a SimulatedDesktop with a throwaway config folder; use as a context manager."""
+
+    def __init__(self, desktop, **config):
+        self.desktop = desktop
+        self.config = dict(config, control_server=False)
+        self.directory = None
+        self.app = None
+
+    def __enter__(self):
+        from transparency_manager import CodeFlowVision
+        self.directory = tempfile.TemporaryDirectory()
+        config_file = os.path.join(self.directory.name, "config.json")
+        with open(config_file, "w", encoding="utf-8") as f:
+            json.dump(self.config, f)
+        self.desktop.events.poll()  # windows that existed before the application started
+        self.app = CodeFlowVision(backend=self.desktop, config_file=config_file)
+        self.app.finish_startup()
+        return self.app
+
+    def __exit__(self, *exc_info):
+        self.app.restore_windows()
+        self.app.journal.close()
+        self.directory.cleanup()
+
+
+def ide_and_browsers(desktop, ides=1, browsers=1):
+    """Open IDE and browser windows (pids 11 and 10) on desktop; return their handles, IDEs first."""
+    desktop.add_process(10, "chrome.exe")
+    desktop.add_process(11, "code.exe")
+    hwnds = [desktop.create_window(f"file{index}.py - Visual Studio Code", 11, rect=(0, 0, 1200, 900))
+             for index in range(ides)]
+    hwnds += [desktop.create_window(f"Docs {index} - Google Chrome", 10, rect=(100, 50, 1500, 1000))
+              for index in range(browsers)]
+    return hwnds
+
+
+def scenario_recycled_pid():
+    """A PID freed by the browser and reused by Notepad must not make Notepad a browser window."""
+    desktop = SimulatedDesktop()
+    browser = ide_and_browsers(desktop)[1]
+    with SimulatedApp(desktop) as app:
+        desktop.destroy_window(browser)
+        desktop.end_process(10)
+        desktop.clock.advance(5.0)
+        desktop.add_process(10, "notepad.exe")
+        notepad = desktop.create_window("Untitled - Notepad", 10)
+        app.window_tracker.process()
+        info = app.window_registry.get(notepad)
+        if info is not None:
+            return f"Notepad registered as {info.role} ({info.process_name})"
+
+
+def scenario_double_swap():
+    """Two swaps inside the debounce interval move two places through a three-window group."""
+    desktop = SimulatedDesktop()
+    ide_and_browsers(desktop, ides=2)
+    with SimulatedApp(desktop, groups={"default": {"ide": 2, "browser": 1}}) as app:
+        expected = app.group_windows[(app.group_windows.index(app.active_window) + 2) % 3]
+        app.on_hotkey("swap_active")
+        app.on_hotkey("swap_active")
+        desktop.clock.advance(1.0)
+        app.process_commands()
+        if app.active_window != expected:
+            return f"active window {app.active_window}, expected {expected}"
+
+
+def scenario_late_title():
+    """A window shown untitled and titled afterwards is managed once it is focused."""
+    desktop = SimulatedDesktop()
+    ide_and_browsers(desktop, ides=0)
+    with SimulatedApp(desktop) as app:
+        hwnd = desktop.create_window("", 11)
+        app.window_tracker.process()
+        desktop.set_title(hwnd, "main.py - Visual Studio Code")
+        desktop.focus(hwnd)
+        app.window_tracker.process()
+        if hwnd not in app.window_registry:
+            return "the retitled IDE window was never registered"
+
+
+def scenario_bad_control_command():
+    """A control command that raises an unexpected exception is answered with an error."""
+    desktop = SimulatedDesktop()
+    ide_and_browsers(desktop)
+    with SimulatedApp(desktop) as app:
+        replies = []
+        app.control_server.submit('{"cmd": "opacity", "opacity": 1e999}', replies.append)
+        app.control_server.process()
+        response = json.loads(replies[0]) if replies else {}
+        if any(result.get("ok") for result in response.get("results", [{"ok": True}])):
+            return f"reply {response}"
+
+
+def scenario_failing_poller():
+    """The event loop survives a poller that raises."""
+    desktop = SimulatedDesktop()
+    ide_and_browsers(desktop)
+    with SimulatedApp(desktop) as app:
+        def fail():
+            raise OverflowError("poller failure")
+
+        app.loop.add_poller(fail)
+        app.loop.call_later(1.0, app.loop.stop)
+        try:
+            app.loop.run()
+        except OverflowError:
+            return "the poller's exception ended the event loop"
+
+
+def scenario_restore_keeps_new_state():
+    """Exiting restores our style bits only, and leaves a window maximized after Reset Layout where it is."""
+    desktop = SimulatedDesktop()
+    ide, browser = ide_and_browsers(desktop)
+    with SimulatedApp(desktop) as app:
+        app.toggle_transparency()
+        app.reset_layout()
+        desktop.windows[ide].exstyle |= WS_EX_TOPMOST
+        maximized = desktop.windows[browser]
+        maximized.maximized = True
+        maximized.rect = desktop.monitor_list[0].rect
+    problems = []
+    if not desktop.windows[ide].exstyle & WS_EX_TOPMOST:
+        problems.append("WS_EX_TOPMOST was cleared")
+    if desktop.windows[ide].exstyle & WS_EX_LAYERED:
+        problems.append("WS_EX_LAYERED was left set")
+    if not maximized.maximized or maximized.rect != desktop.monitor_list[0].rect:
+        problems.append("the maximized window was moved back")
+    return "; ".join(problems) or None
+
+
+def scenario_config_edit_and_save():
+    """Edits to config.json are merged over the defaults and applied live, bad edits are ignored,
+    and saves replace the file atomically."""
+    desktop = SimulatedDesktop()
+    ide_and_browsers(desktop)
+    with SimulatedApp(desktop) as app:
+        service = app.config_service
+
+        def edit(overrides):
+            with open(service.path, "w", encoding="utf-8") as f:
+                json.dump(overrides, f)
+            return service.reload()
+
+        problems = []
+        edit({"presets": {"dynamic": {"active": 100}}, "hotkeys": {"exit": "<ctrl>+<alt>+<f11>"}})
+        if app.config["presets"]["dynamic"] != {"active": 100, "background": 255}:
+            problems.append(f"dynamic preset {dict(app.config['presets']['dynamic'])} after the edit")
+        if "code-focused" not in app.config["presets"]:
+            problems.append("the edit dropped the default presets")
+        if "<ctrl>+<alt>+<f11>" not in desktop.hotkeys.bindings:
+            problems.append("the edited exit hotkey was not registered")
+        if edit({"presets": {"dynamic": {"active": 999}}}) or app.config["presets"]["dynamic"]["active"] != 100:
+            problems.append("an out-of-range opacity was applied")
+        service.update({"focus_follow": False})
+        service.flush()
+        with open(service.path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["focus_follow"] is not False or saved["presets"]["dynamic"]["active"] != 100:
+            problems.append(f"saved file has focus_follow={saved['focus_follow']}, "
+                            f"dynamic preset {saved['presets']['dynamic']}")
+        leftovers = [name for name in os.listdir(os.path.dirname(service.path)) if name.endswith(".tmp")]
+        if leftovers:
+            problems.append(f"temporary files left behind: {', '.join(leftovers)}")
+    return "; ".join(problems) or None
+
+
+SCENARIOS = [
+    scenario_recycled_pid, scenario_double_swap, scenario_late_title,
+    scenario_bad_control_command, scenario_failing_poller, scenario_restore_keeps_new_state,
+    scenario_config_edit_and_save,
+]
+
+
+def bench_scenarios(args):
+    """Edge cases from real sessions run through CodeFlowVision on a simulated desktop; each must come out right."""
+    results = {}
+    violations = []
+    logging.disable(logging.CRITICAL)  # the failures provoked here are logged as errors
+    try:
+        for scenario in SCENARIOS:
+            name = scenario.__name__[len("scenario_"):]
+            started = time.perf_counter()
+            try:
+                problem = scenario()
+            except Exception as e:
+                problem = f"raised {type(e).__name__}: {e}"
+            results[name] = {"ms": (time.perf_counter() - started) * 1000, "ok": problem is None}
+            if problem is not None:
+                violations.append(f"{name}: {problem}")
+    finally:
+        logging.disable(logging.NOTSET)
+    results["violations"] = violations
+    return results
+
+
+def bench_profiler(args):
+    """Per-call cost of an instrumented method with profiling absent, disabled and enabled."""
+    class Target:
+        def work(self, value):
+            return value + 1
+
+    calls = 200000
+    labels = (("baseline", None), ("disabled", False), ("enabled", True))
+    works = {}
+    violations = []
+    for label, enabled in labels:
+        target = Target()
+        if enabled is not None:
+            Profiler(enabled=enabled).instrument(target, ["work"])
+        if enabled is False and "work" in vars(target):
+            violations.append("a disabled profiler wrapped the method")
+        works[label] = target.work
+    # Interleave the rounds so a slow stretch of the machine hits every variant alike
+    best = {}
+    for _ in range(7):
+        for label, _ in labels:
+            work = works[label]
+            started = time.perf_counter()
+            for i in range(calls):
+                work(i)
+            elapsed = time.perf_counter() - started
+            best[label] = min(best.get(label, elapsed), elapsed)
+    results = {f"{label}_ns_per_call": best[label] / calls * 1e9 for label, _ in labels}
+    baseline = results["baseline_ns_per_call"]
+    results["disabled_overhead_pct"] = (results["disabled_ns_per_call"] - baseline) / baseline * 100
+    results["enabled_overhead_ns"] = results["enabled_ns_per_call"] - baseline
+    # Disabled profiling must cost nothing; the margin only absorbs timing noise
+    if results["disabled_overhead_pct"] > 20:
+        violations.append(f"disabled profiling adds {results['disabled_overhead_pct']:.0f}% per call")
+    results["violations"] = violations
+    return results
+
+
+BENCHMARKS = {
+    "control": bench_control,
+    "event_loop": bench_event_loop,
+    "fade": bench_fade,
+    "focus": bench_focus,
+    "journal": bench_journal,
+    "layout": bench_layout,
+    "logging": bench_logging,
+    "profiler": bench_profiler,
+    "ranking": bench_ranking,
+    "registry": bench_registry,
+    "replay": bench_replay,
+    "rules": bench_rules,
+    "scenarios": bench_scenarios,
+    "startup": bench_startup,
+}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="CodeFlow Vision benchmarks")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run (default: all): {', '.join(sorted(BENCHMARKS))}")
+    parser.add_argument("--windows", type=int, default=50, help="Number of simulated windows")
+    parser.add_argument("--rules", type=int, default=50, help="Number of extra synthetic window rules")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for simulated input")
+    parser.add_argument("--actions", type=int, default=500, help="Number of actions in the synthetic replay session")
+    parser.add_argument("--trace", help="Replay this recorded session trace (main.py --record-trace) instead of a synthetic one")
+    parser.add_argument("--baseline", help="Compare the replay's Win32 call counts with this saved result; exit 1 if any grew")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Save the replay result as a baseline")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    results = {}
+    for name in args.names or sorted(BENCHMARKS):
+        results[name] = BENCHMARKS[name](args)
+    print(json.dumps(results, indent=2))
+    failed = False
+    for name, result in results.items():
+        if not isinstance(result, dict):
+            continue
+        for problem in result.get("regressions", []) + result.get("violations", []):
+            print(f"{name}: {problem}", file=sys.stderr)
+            failed = True
+    if failed:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,26 @@
+import argparse
 import PyInstaller.__main__
 import os
 
 # Get the directory containing build.py
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+parser = argparse.ArgumentParser(description="Build the CodeFlowVision executable")
+# A one-file build unpacks itself to a temp directory on every launch, which
+# dominates cold start; the default one-folder build starts straight from dist/
+parser.add_argument("--onefile", action="store_true", help="Build a single self-extracting executable instead of a folder")
+args = parser.parse_args()
+
 PyInstaller.__main__.run([
     'main.py',
-    '--onefile',
+    '--onefile' if args.onefile else '--onedir',
     '--windowed',
     '--icon=icon.ico',  # Optional: Add this if you have an icon file
     '--name=CodeFlowVision',
     '--add-data=requirements.txt;.',
     '--noconsole',
+    '--noupx',  # UPX-compressed DLLs must be decompressed on every load
     f'--workpath={os.path.join(current_dir, "build")}',
     f'--distpath={os.path.join(current_dir, "dist")}',
     '--clean'
-]) 
\ No newline at end of file
+])
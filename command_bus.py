@@ -0,0 +1,141 @@
+"""
+Command bus between the hotkey listener thread and the UI thread.
+Hotkey and tray actions are posted as commands; the UI thread drains them,
+coalescing redundant ones, and records how long each took to be applied.
+The first command after a quiet period is released immediately; commands
+arriving within the debounce window after it (key repeat, a burst of
+presses) are coalesced.
+"""
+import time
+from collections import deque, namedtuple
+
+# Commands that undo themselves when repeated: an even number cancels out
+TOGGLE_COMMANDS = {"toggle_transparency", "toggle_focus_follow"}
+# Commands whose repeats add up to a single command with a step count
+COUNTED_COMMANDS = {"next_preset", "next_group", "swap_active"}
+# Commands that override everything else still pending
+TERMINAL_COMMANDS = {"exit"}
+
+# name: command name, count: net repetitions, enqueued: post times of merged commands
+Command = namedtuple("Command", ["name", "count", "enqueued"])
+
+
+class CommandBus:
+    """Multi-producer, single-consumer queue of UI commands.
+
+    post() may be called from any thread; deque.append and deque.popleft are
+    atomic, so no lock is taken. drain() must only be called from the UI thread.
+    A command posted after `debounce` seconds without any is released at
+    once. Commands posted during a burst are released once no new command has
+    arrived for `debounce` seconds, or once the oldest pending command has
+    waited `max_delay`.
+    """
+
+    def __init__(self, debounce=0.0, max_delay=None, clock=time.monotonic, on_post=None, max_samples=1000):
+        self.debounce = debounce
+        self.max_delay = max_delay if max_delay is not None else debounce * 4
+        self.clock = clock
+        self.on_post = on_post
+        self._queue = deque()
+        self._last_post = None
+        self._leading = False  # a command posted after a quiet period is pending
+        self.latencies = deque(maxlen=max_samples)
+        self.posted = 0
+        self.executed = 0
+
+    def post(self, name):
+        """Queue a command; safe to call from any thread."""
+        now = self.clock()
+        if self._last_post is None or now >= self._last_post + self.debounce:
+            self._leading = True
+        self._queue.append((name, now))
+        self._last_post = now
+        self.posted += 1
+        if self.on_post is not None:
+            self.on_post()
+
+    def pending(self):
+        return len(self._queue)
+
+    def ready(self, now=None):
+        """Return True if pending commands should be drained now."""
+        if not self._queue:
+            return False
+        if self._leading:
+            return True
+        if now is None:
+            now = self.clock()
+        return now >= min(self._last_post + self.debounce, self._queue[0][1] + self.max_delay)
+
+    def time_until_ready(self, now=None):
+        """Return seconds until ready() becomes true, or None if nothing is pending."""
+        if not self._queue:
+            return None
+        if self._leading:
+            return 0.0
+        if now is None:
+            now = self.clock()
+        wait = min(self._last_post + self.debounce, self._queue[0][1] + self.max_delay) - now
+        return max(0.0, wait)
+
+    def drain(self, now=None):
+        """Pop all pending commands if ready and return them coalesced."""
+        if not self.ready(now):
+            return []
+        # Cleared before popping: a post racing with the drain is taken along or keeps its own flag
+        self._leading = False
+        raw = []
+        while self._queue:
+            raw.append(self._queue.popleft())
+        return self.coalesce(raw)
+
+    @staticmethod
+    def coalesce(raw):
+        """Merge (name, enqueued_at) pairs into Commands, in first-seen order."""
+        merged = {}
+        for name, enqueued_at in raw:
+            if name in merged:
+                merged[name][0] += 1
+                merged[name][1].append(enqueued_at)
+            else:
+                merged[name] = [1, [enqueued_at]]
+
+        for name in TERMINAL_COMMANDS:
+            if name in merged:
+                count, enqueued = merged[name]
+                return [Command(name, 1, tuple(enqueued))]
+
+        commands = []
+        cancelled = []
+        for name, (count, enqueued) in merged.items():
+            if name in TOGGLE_COMMANDS:
+                if count % 2 == 0:
+                    cancelled.append(Command(name, 0, tuple(enqueued)))
+                    continue
+                count = 1
+            elif name not in COUNTED_COMMANDS:
+                count = 1
+            commands.append(Command(name, count, tuple(enqueued)))
+        return commands + cancelled
+
+    def complete(self, command, now=None):
+        """Record enqueue-to-apply latency for every post merged into command."""
+        if now is None:
+            now = self.clock()
+        for enqueued_at in command.enqueued:
+            self.latencies.append(now - enqueued_at)
+        self.executed += 1
+
+    def stats(self):
+        """Return queue counters and latency percentiles (seconds)."""
+        samples = sorted(self.latencies)
+        def pct(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))] if samples else 0.0
+        return {
+            "posted": self.posted,
+            "executed": self.executed,
+            "pending": len(self._queue),
+            "p50_latency": pct(0.50),
+            "p95_latency": pct(0.95),
+            "max_latency": samples[-1] if samples else 0.0,
+        }
@@ -0,0 +1,383 @@
+"""
+Configuration service for CodeFlowVision.
+config.json is deep-merged over the defaults, validated and published as an
+immutable snapshot that any thread can read without locking. Edits to the
+file are picked up while running and reported per top-level key, so only the
+affected parts of the application are rebuilt. Changes made by the
+application are saved by a background thread, debounced and written
+atomically (temp file, then rename).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+from types import MappingProxyType
+
+
+class ConfigError(ValueError):
+    """A configuration value is missing, of the wrong type or out of range."""
+
+
+def config_path():
+    """Location of config.json: %APPDATA%/CodeFlowVision on Windows, ~/.config/CodeFlowVision elsewhere."""
+    base = os.getenv("APPDATA") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, "CodeFlowVision", "config.json")
+
+
+def deep_merge(base, overrides):
+    """Return a new dict of base with overrides applied; nested mappings are merged, everything else replaced."""
+    merged = thaw(base)
+    for key, value in overrides.items():
+        if isinstance(value, Mapping) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = thaw(value)
+    return merged
+
+
+def freeze(value):
+    """Read-only deep copy: mappings become MappingProxyType and lists tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Mutable deep copy of a (possibly frozen) configuration value."""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+def check_types(config, defaults, untyped=(), path=""):
+    """Raise ConfigError where config has a different type than the default for the same key.
+
+    untyped lists dotted key paths that may hold more than one type.
+    """
+    for key, default in defaults.items():
+        name = f"{path}{key}"
+        if key not in config or name in untyped:
+            continue
+        value = config[key]
+        if isinstance(default, bool) or default is None:
+            valid = default is None or isinstance(value, bool)
+        elif isinstance(default, (int, float)):
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+        elif isinstance(default, Mapping):
+            valid = isinstance(value, Mapping)
+        elif isinstance(default, (list, tuple)):
+            valid = isinstance(value, (list, tuple))
+        else:
+            valid = isinstance(value, type(default))
+        if not valid:
+            raise ConfigError(f"{name} should be {type(default).__name__}, not {type(value).__name__}")
+        if isinstance(default, Mapping):
+            check_types(value, default, untyped, f"{name}.")
+
+
+def changed_keys(old, new):
+    """Top-level keys whose values differ between two configurations."""
+    return {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+
+
+class ConfigService:
+    """Owns config.json for the running application.
+
+    snapshot is replaced, never mutated, so readers on any thread see either
+    the old or the new configuration. update() must be called from the UI
+    thread; poll() applies pending file edits there and calls
+    listener(old, new, keys) for each reload.
+    """
+
+    def __init__(self, path, defaults, validate=None, untyped=(), save_delay=0.5, reload_delay=0.2,
+                 clock=time.monotonic, wake=None):
+        self.path = path
+        self.defaults = freeze(defaults)
+        self.validate = validate
+        self.untyped = untyped
+        self.save_delay = save_delay
+        self.reload_delay = reload_delay
+        self.clock = clock
+        self.wake = wake
+        self.listeners = []
+        self.exists = os.path.exists(path)
+        self._file_lock = threading.Lock()  # guards the two below: the saver thread writes them
+        self._file_config = {}  # merged contents of the file as last read or written
+        self._last_written = None  # serialized text of our own last save
+        self._reload_at = None
+        self._saver = ConfigSaver(self)
+        self._watcher = None
+        self.reloads = 0
+        self.rejected = 0
+        self.snapshot = freeze(self._load())
+
+    def _parse(self, text):
+        """Merge file text over the defaults and validate it; raise ConfigError or ValueError."""
+        overrides = json.loads(text)
+        if not isinstance(overrides, dict):
+            raise ConfigError("config.json must contain an object")
+        config = deep_merge(self.defaults, overrides)
+        check_types(config, self.defaults, self.untyped)
+        if self.validate is not None:
+            self.validate(config)
+        return config
+
+    def _read(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _load(self):
+        config = thaw(self.defaults)
+        if self.exists:
+            try:
+                config = self._parse(self._read())
+            except (OSError, ValueError) as e:
+                logging.error(f"Invalid config file {self.path}, using defaults: {e}")
+        self._file_config = config
+        return config
+
+    def update(self, changes, save=True):
+        """Deep-merge changes into the snapshot; validated, and saved in the background unless save is False."""
+        config = deep_merge(self.snapshot, changes)
+        check_types(config, self.defaults, self.untyped)
+        if self.validate is not None:
+            self.validate(config)
+        self.snapshot = freeze(config)
+        if save:
+            self._saver.schedule(self.clock() + self.save_delay)
+        return self.snapshot
+
+    # Hot reload
+
+    def watch(self):
+        """Start watching the file for edits made outside the application."""
+        if self._watcher is None:
+            self._watcher = FileWatcher(self.path, self.file_changed)
+            self._watcher.start()
+
+    def file_changed(self):
+        """Note that the file changed (any thread); the reload happens reload_delay later in poll()."""
+        self._reload_at = self.clock() + self.reload_delay
+        if self.wake is not None:
+            self.wake()
+
+    def time_until_ready(self):
+        if self._reload_at is None:
+            return None
+        return max(0.0, self._reload_at - self.clock())
+
+    def poll(self):
+        """Apply a pending file edit once it has settled (UI thread); return True if it changed anything."""
+        if self._reload_at is None or self.clock() < self._reload_at:
+            return False
+        self._reload_at = None
+        return self.reload()
+
+    def reload(self):
+        """Re-read the file and apply the keys edited there since it was last read or written."""
+        try:
+            text = self._read()
+        except OSError as e:
+            logging.error(f"Failed to read {self.path}: {e}")
+            return False
+        with self._file_lock:
+            if text == self._last_written:
+                return False  # our own save
+        try:
+            config = self._parse(text)
+        except ValueError as e:
+            self.rejected += 1
+            logging.error(f"Ignoring invalid edit to {self.path}: {e}")
+            return False
+        with self._file_lock:
+            keys = changed_keys(self._file_config, config)
+            self._file_config = config
+        if not keys:
+            return False
+        # Runtime-only changes (e.g. the current preset) survive edits to other keys
+        merged = thaw(self.snapshot)
+        for key in keys:
+            merged[key] = config[key]
+        try:
+            if self.validate is not None:
+                self.validate(merged)
+        except ValueError as e:
+            self.rejected += 1
+            logging.error(f"Ignoring edit to {self.path}: {e}")
+            return False
+        old = self.snapshot
+        self.snapshot = freeze(merged)
+        self.reloads += 1
+        logging.info(f"Reloaded {self.path}: {', '.join(sorted(keys))}")
+        for listener in self.listeners:
+            listener(old, self.snapshot, keys)
+        return True
+
+    # Saving
+
+    def write(self, snapshot):
+        """Write snapshot to the file atomically (called on the saver thread)."""
+        text = json.dumps(thaw(snapshot), indent=4)
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        with self._file_lock:
+            self._last_written = text
+            self._file_config = thaw(snapshot)
+        os.replace(temp_path, self.path)
+        self.exists = True
+
+    def flush(self):
+        """Write any pending save now and stop the saver and watcher threads (e.g. on exit)."""
+        self._saver.stop()
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def stats(self):
+        return {
+            "reloads": self.reloads,
+            "rejected": self.rejected,
+            "saves": self._saver.saves,
+            "coalesced_saves": self._saver.coalesced,
+        }
+
+
+class ConfigSaver:
+    """Background thread that writes the latest snapshot once saves stop arriving."""
+
+    def __init__(self, service):
+        self.service = service
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()  # the thread and stop() may both write
+        self._due = None
+        self._thread = None
+        self._stopping = False
+        self.saves = 0
+        self.coalesced = 0
+
+    def schedule(self, due):
+        with self._condition:
+            if self._due is not None:
+                self.coalesced += 1
+            self._due = due
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="config-saver", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        clock = self.service.clock
+        while True:
+            with self._condition:
+                while self._due is None and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                wait = self._due - clock()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue  # re-check: the save may have been pushed back or stopped
+                self._due = None
+            self._save()
+
+    def _save(self):
+        with self._write_lock:
+            try:
+                self.service.write(self.service.snapshot)
+                self.saves += 1
+            except OSError as e:
+                logging.error(f"Failed to save {self.service.path}: {e}")
+
+    def stop(self):
+        """Stop the thread and write a pending save immediately."""
+        with self._condition:
+            pending = self._due is not None
+            self._due = None
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        with self._condition:
+            self._thread = None
+            self._stopping = False  # a later schedule() starts a new thread
+        if pending:
+            self._save()
+
+
+class FileWatcher:
+    """Calls on_change() from a background thread whenever path's size or mtime changes.
+
+    On Windows the thread sleeps on a directory change notification; elsewhere
+    it checks the file every interval seconds.
+    """
+
+    def __init__(self, path, on_change, interval=1.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def _run(self):
+        wait, close = self._waiter()
+        try:
+            while not self._stop.is_set():
+                wait()
+                signature = self._stat()
+                if signature != self._signature:
+                    self._signature = signature
+                    self.on_change()
+        finally:
+            close()
+
+    def _waiter(self):
+        """Return (wait, close): wait() blocks until the directory may have changed or the interval
+        passes, close() releases what wait() needs once the thread is done."""
+        interval = self.interval
+        try:
+            import win32con
+            import win32event
+            import win32file
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            handle = win32file.FindFirstChangeNotification(
+                directory, False,
+                win32con.FILE_NOTIFY_CHANGE_LAST_WRITE | win32con.FILE_NOTIFY_CHANGE_FILE_NAME | win32con.FILE_NOTIFY_CHANGE_SIZE
+            )
+        except Exception:
+            # Not on Windows, or the notification could not be created
+            return (lambda: self._stop.wait(interval)), (lambda: None)
+
+        def wait():
+            if win32event.WaitForSingleObject(handle, int(interval * 1000)) == win32event.WAIT_OBJECT_0:
+                win32file.FindNextChangeNotification(handle)
+        return wait, lambda: win32file.FindCloseChangeNotification(handle)
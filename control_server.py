@@ -0,0 +1,459 @@
+"""
+Local control server for CodeFlowVision.
+Scripts and editor tasks drive a running instance over a named pipe on
+Windows or a Unix domain socket elsewhere, using line-delimited JSON. Each
+request line carries a batch of commands and gets exactly one response line:
+
+    {"id": 1, "commands": [{"cmd": "preset", "name": "documentation"}, {"cmd": "state"}]}
+    {"id": 1, "results": [{"ok": true}, {"ok": true, "result": {...}}]}
+
+A request may also be a single command object ({"cmd": "state"}). Commands run
+in order on the UI thread and a failing command does not stop the rest of the
+batch. I/O happens on background threads; the UI thread only runs
+process(), which it is woken for through wake().
+"""
+import json
+import logging
+import os
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+# Longest accepted request line; longer ones close the connection
+MAX_LINE = 1024 * 1024
+
+
+def default_address():
+    """Per-user pipe name on Windows, per-user socket path elsewhere."""
+    if sys.platform == "win32":
+        return r"\\.\pipe\CodeFlowVision-" + os.getenv("USERNAME", "user")
+    directory = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"codeflowvision-{os.getuid()}.sock")
+
+
+class ControlServer:
+    """Parse request lines, run their commands on the UI thread and send back the results.
+
+    handlers maps a command name to handler(command) where command is the
+    request's dict; the return value (if not None) is sent as "result". A
+    handler signals a bad command by raising KeyError, ValueError or TypeError.
+    """
+
+    def __init__(self, handlers, address=None, wake=None, clock=time.monotonic, max_samples=1000):
+        self.handlers = handlers
+        self.address = address or default_address()
+        self.wake = wake
+        self.clock = clock
+        self.transport = None
+        self._requests = deque()  # (line, reply, received_at), appended by I/O threads
+        self.latencies = deque(maxlen=max_samples)
+        self.requests = 0
+        self.commands = 0
+        self.errors = 0
+
+    def start(self):
+        """Start listening; return False if the transport could not be started."""
+        if self.transport is not None:
+            return True
+        transport_type = NamedPipeTransport if sys.platform == "win32" else UnixSocketTransport
+        transport = transport_type(self.address, self.submit)
+        try:
+            transport.start()
+        except Exception as e:
+            logging.error(f"Failed to start control server on {self.address}: {e}")
+            return False
+        self.transport = transport
+        logging.info(f"Control server listening on {self.address}")
+        return True
+
+    def stop(self):
+        if self.transport is not None:
+            self.transport.stop()
+            self.transport = None
+
+    def submit(self, line, reply):
+        """Queue a request line from an I/O thread; reply(bytes) is called with the response line."""
+        self._requests.append((line, reply, self.clock()))
+        if self.wake is not None:
+            self.wake()
+
+    def pending(self):
+        return len(self._requests)
+
+    def process(self):
+        """Handle every queued request (UI thread); return the number handled."""
+        handled = 0
+        while self._requests:
+            line, reply, received_at = self._requests.popleft()
+            try:
+                response = self.handle(line)
+                data = json.dumps(response, separators=(",", ":"))
+            except Exception as e:
+                # The client still gets an answer, and the UI thread keeps running
+                self.errors += 1
+                logging.exception("Control request failed")
+                data = json.dumps({"id": None, "error": f"internal error: {type(e).__name__}: {e}"})
+            response = data.encode("utf-8") + b"\n"
+            try:
+                reply(response)
+            except Exception as e:
+                logging.debug(f"Control client went away before its reply: {e}")
+            self.latencies.append(self.clock() - received_at)
+            handled += 1
+        return handled
+
+    def handle(self, line):
+        """Run one request line and return the response object."""
+        self.requests += 1
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self.errors += 1
+            return {"id": None, "error": f"invalid JSON: {e}"}
+        if not isinstance(request, dict):
+            self.errors += 1
+            return {"id": None, "error": "request must be an object"}
+        batch = request.get("commands", [request] if "cmd" in request else None)
+        if not isinstance(batch, list):
+            self.errors += 1
+            return {"id": request.get("id"), "error": "request needs \"cmd\" or a \"commands\" list"}
+        return {"id": request.get("id"), "results": [self.run_command(command) for command in batch]}
+
+    def run_command(self, command):
+        self.commands += 1
+        if not isinstance(command, dict) or command.get("cmd") not in self.handlers:
+            self.errors += 1
+            name = command.get("cmd") if isinstance(command, dict) else command
+            return {"ok": False, "error": f"unknown command: {name}"}
+        try:
+            result = self.handlers[command["cmd"]](command)
+        except (KeyError, ValueError, TypeError) as e:
+            self.errors += 1
+            # str(KeyError) quotes its message; a missing field is reported by name
+            message = e.args[0] if isinstance(e, KeyError) and e.args else e
+            return {"ok": False, "error": f"{type(e).__name__}: {message}"}
+        except Exception as e:
+            self.errors += 1
+            logging.exception(f"Control command {command['cmd']!r} failed")
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        if result is None:
+            return {"ok": True}
+        return {"ok": True, "result": result}
+
+    def stats(self):
+        """Return request counters and receive-to-reply latency (seconds)."""
+        samples = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "commands": self.commands,
+            "errors": self.errors,
+            "pending": len(self._requests),
+            "median_latency": samples[len(samples) // 2] if samples else 0.0,
+            "max_latency": samples[-1] if samples else 0.0,
+        }
+
+
+class UnixSocketTransport:
+    """All clients of a Unix domain socket served by one selector thread."""
+
+    def __init__(self, address, submit):
+        self.address = address
+        self.submit = submit
+        self.selector = None
+        self.listener = None
+        self._wake_r = self._wake_w = None
+        self._lock = threading.Lock()
+        self._outbox = {}  # socket -> bytearray of replies waiting to be written
+        self._dirty = set()  # sockets whose outbox gained data since the last select
+        self._thread = None
+        self.running = False
+
+    def start(self):
+        if os.path.exists(self.address):
+            # Refuse to steal the socket of a running instance; remove a stale one
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.address)
+                raise OSError(f"another instance is listening on {self.address}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.address)
+            finally:
+                probe.close()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.address)
+        os.chmod(self.address, 0o600)
+        self.listener.listen(128)
+        self.listener.setblocking(False)
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ, None)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="control-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # a wakeup is already pending, or we are shutting down
+
+    def _reply(self, sock, data):
+        # Called on the UI thread; the selector thread does the actual write
+        with self._lock:
+            if sock in self._outbox:
+                self._outbox[sock] += data
+                self._dirty.add(sock)
+        self._wake()
+
+    def _run(self):
+        buffers = {}  # socket -> bytearray of unparsed input
+        try:
+            while self.running:
+                for key, events in self.selector.select():
+                    sock = key.fileobj
+                    if sock is self.listener:
+                        self._accept(buffers)
+                    elif sock is self._wake_r:
+                        try:
+                            while sock.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                    else:
+                        if events & selectors.EVENT_READ:
+                            self._read(sock, buffers)
+                        if events & selectors.EVENT_WRITE and sock in buffers:
+                            self._write(sock, buffers)
+                self._flush_dirty(buffers)
+        finally:
+            for sock in list(buffers):
+                self._close(sock, buffers)
+            self.selector.close()
+            self.listener.close()
+            self._wake_r.close()
+            self._wake_w.close()
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+    def _accept(self, buffers):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except BlockingIOError:
+                return
+            conn.setblocking(False)
+            buffers[conn] = bytearray()
+            with self._lock:
+                self._outbox[conn] = bytearray()
+            self.selector.register(conn, selectors.EVENT_READ, None)
+
+    def _read(self, sock, buffers):
+        try:
+            data = sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._close(sock, buffers)
+            return
+        buffer = buffers[sock]
+        buffer += data
+        while True:
+            end = buffer.find(b"\n")
+            if end < 0:
+                break
+            line = bytes(buffer[:end])
+            del buffer[:end + 1]
+            if line.strip():
+                self.submit(line, lambda response, sock=sock: self._reply(sock, response))
+        if len(buffer) > MAX_LINE:
+            logging.warning("Control client sent an oversized request, closing connection")
+            self._close(sock, buffers)
+
+    def _write(self, sock, buffers):
+        """Send as much of sock's outbox as it takes; watch for writability only while some is left."""
+        with self._lock:
+            pending = self._outbox.get(sock)
+            if pending is None:
+                return
+            try:
+                sent = sock.send(pending) if pending else 0
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                sent = None
+            if sent is not None:
+                del pending[:sent]
+                remaining = len(pending)
+        if sent is None:
+            self._close(sock, buffers)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if remaining else 0)
+        if self.selector.get_key(sock).events != events:
+            self.selector.modify(sock, events, None)
+
+    def _flush_dirty(self, buffers):
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = set()
+        for sock in dirty:
+            if sock in buffers:
+                self._write(sock, buffers)
+
+    def _close(self, sock, buffers):
+        buffers.pop(sock, None)
+        with self._lock:
+            self._outbox.pop(sock, None)
+            self._dirty.discard(sock)
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        sock.close()
+
+
+class NamedPipeTransport:
+    """Windows named pipe; one pipe instance and reader thread per connected client.
+
+    Remote clients are rejected, and the pipe's default security descriptor
+    only lets the creating user and administrators write to it.
+    """
+
+    PIPE_REJECT_REMOTE_CLIENTS = 0x00000008
+
+    def __init__(self, address, submit):
+        self.address = address
+        self.submit = submit
+        self._thread = None
+        self.running = False
+
+    def start(self):
+        import win32pipe  # noqa: F401 - fail early if pywin32 is missing
+        self.running = True
+        self._thread = threading.Thread(target=self._serve, name="control-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        # Unblock ConnectNamedPipe with a throwaway connection
+        try:
+            with open(self.address, "r+b", buffering=0):
+                pass
+        except OSError:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def _serve(self):
+        import pywintypes
+        import win32file
+        import win32pipe
+        while self.running:
+            try:
+                pipe = win32pipe.CreateNamedPipe(
+                    self.address,
+                    win32pipe.PIPE_ACCESS_DUPLEX,
+                    win32pipe.PIPE_TYPE_BYTE | win32pipe.PIPE_READMODE_BYTE | win32pipe.PIPE_WAIT |
+                    self.PIPE_REJECT_REMOTE_CLIENTS,
+                    win32pipe.PIPE_UNLIMITED_INSTANCES, 65536, 65536, 0, None
+                )
+                win32pipe.ConnectNamedPipe(pipe, None)
+            except pywintypes.error as e:
+                if e.winerror != 535:  # ERROR_PIPE_CONNECTED: client connected before we waited
+                    logging.error(f"Control pipe error: {e}")
+                    time.sleep(0.5)
+                    continue
+            if not self.running:
+                win32file.CloseHandle(pipe)
+                break
+            threading.Thread(target=self._client, args=(pipe,), name="control-client", daemon=True).start()
+
+    def _client(self, pipe):
+        import queue
+        import pywintypes
+        import win32file
+        import win32pipe
+        replies = queue.SimpleQueue()
+        buffer = bytearray()
+        try:
+            while self.running:
+                _, data = win32file.ReadFile(pipe, 65536)
+                buffer += data
+                while True:
+                    end = buffer.find(b"\n")
+                    if end < 0:
+                        break
+                    line = bytes(buffer[:end])
+                    del buffer[:end + 1]
+                    if line.strip():
+                        self.submit(line, replies.put)
+                        win32file.WriteFile(pipe, replies.get())
+                if len(buffer) > MAX_LINE:
+                    logging.warning("Control client sent an oversized request, closing connection")
+                    break
+        except pywintypes.error:
+            pass  # client disconnected
+        finally:
+            try:
+                win32pipe.DisconnectNamedPipe(pipe)
+            except pywintypes.error:
+                pass
+            win32file.CloseHandle(pipe)
+
+
+def send(commands, address=None, timeout=5.0, request_id=1):
+    """Send one batch of commands to a running instance and return its response object.
+
+    Raises OSError if no instance is listening or it does not answer in time.
+    """
+    address = address or default_address()
+    request = json.dumps({"id": request_id, "commands": commands}).encode("utf-8") + b"\n"
+    if sys.platform == "win32":
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                pipe = open(address, "r+b", buffering=0)
+                break
+            except OSError:
+                # Every pipe instance is busy until the server creates the next one
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+        with pipe:
+            pipe.write(request)
+            response = bytearray()
+            while not response.endswith(b"\n"):
+                chunk = pipe.read(65536)
+                if not chunk:
+                    break
+                response += chunk
+    else:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(address)
+            sock.sendall(request)
+            response = bytearray()
+            while not response.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                response += chunk
+    if not response:
+        raise OSError("control server closed the connection without replying")
+    return json.loads(response)
@@ -0,0 +1,316 @@
+"""
+Unified blocking event loop for CodeFlowVision.
+One loop waits on the Win32 message queue (which also carries Tk and WinEvent
+traffic) and a wake event set by other threads, and sleeps until a timer or
+poller actually needs to run, instead of waking on a fixed interval.
+"""
+import heapq
+import itertools
+import logging
+import math
+import time
+
+
+class Timer:
+    """A scheduled callback; cancel() stops it from firing."""
+
+    __slots__ = ("deadline", "tick", "callback", "interval", "cancelled")
+
+    def __init__(self, deadline, tick, callback, interval=None):
+        self.deadline = deadline
+        self.tick = tick
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Hashed timing wheel with `slots` buckets of `resolution` seconds each.
+
+    Timers never fire early: a timer is bucketed by the first tick at or after
+    its deadline. Timers further out than one rotation simply stay in their
+    bucket until their tick comes round.
+    """
+
+    def __init__(self, resolution=0.01, slots=512, now=0.0):
+        self.resolution = resolution
+        self.slots = slots
+        self._buckets = [[] for _ in range(slots)]
+        self._tick = self._tick_of(now)
+        self._count = 0
+
+    def _tick_of(self, when):
+        return int(math.ceil(when / self.resolution))
+
+    def __len__(self):
+        return self._count
+
+    def schedule(self, deadline, callback, interval=None):
+        """Add a timer firing at deadline (and then every interval, if given)."""
+        timer = Timer(deadline, 0, callback, interval)
+        self._insert(timer)
+        return timer
+
+    def _insert(self, timer):
+        timer.tick = max(self._tick_of(timer.deadline), self._tick)
+        self._buckets[timer.tick % self.slots].append(timer)
+        self._count += 1
+
+    def advance(self, now):
+        """Remove and return timers due at or before now, in deadline order."""
+        # The epsilon keeps now == tick * resolution from rounding down a tick
+        target = int(now / self.resolution + 1e-9)
+        if target < self._tick:
+            return []
+        if not self._count:
+            self._tick = target + 1
+            return []
+        due = []
+        span = min(target - self._tick + 1, self.slots)
+        for offset in range(span):
+            index = (self._tick + offset) % self.slots
+            bucket = self._buckets[index]
+            if not bucket:
+                continue
+            keep = []
+            for timer in bucket:
+                if timer.cancelled:
+                    self._count -= 1
+                elif timer.tick <= target:
+                    due.append(timer)
+                    self._count -= 1
+                else:
+                    keep.append(timer)
+            self._buckets[index] = keep
+        self._tick = target + 1
+        due.sort(key=lambda timer: timer.deadline)
+        return due
+
+    def reschedule(self, timer, now):
+        """Re-arm a periodic timer after it fired, skipping missed periods."""
+        deadline = timer.deadline + timer.interval
+        if deadline <= now:
+            deadline = now + timer.interval
+        timer.deadline = deadline
+        self._insert(timer)
+
+    def next_deadline(self):
+        """Return the time the earliest pending timer will fire, or None."""
+        if not self._count:
+            return None
+        for offset in range(self.slots):
+            tick = self._tick + offset
+            if any(not t.cancelled and t.tick == tick for t in self._buckets[tick % self.slots]):
+                return tick * self.resolution
+        # Everything pending is more than one rotation away
+        ticks = [t.tick for bucket in self._buckets for t in bucket if not t.cancelled]
+        return min(ticks) * self.resolution if ticks else None
+
+
+class Win32MessageSource:
+    """Waits on the thread's Win32 message queue plus a cross-thread wake event.
+
+    Tk on Windows is driven by the same message queue, so dispatch() pumps
+    Win32 messages and then lets Tk process whatever events they produced.
+    """
+
+    INFINITE = 0xFFFFFFFF
+    QS_ALLINPUT = 0x04FF
+    MWMO_INPUTAVAILABLE = 0x0004
+
+    def __init__(self, root=None):
+        import win32event
+        import win32gui
+        self._win32event = win32event
+        self._win32gui = win32gui
+        self.root = root
+        self._wake_event = win32event.CreateEvent(None, False, False, None)
+
+    def wait(self, timeout):
+        """Block until a message, a wake() or the timeout (seconds, None = forever)."""
+        milliseconds = self.INFINITE if timeout is None else max(0, int(math.ceil(timeout * 1000)))
+        self._win32event.MsgWaitForMultipleObjectsEx(
+            [self._wake_event], milliseconds, self.QS_ALLINPUT, self.MWMO_INPUTAVAILABLE
+        )
+
+    def dispatch(self):
+        self._win32gui.PumpWaitingMessages()
+        self.settle()
+
+    def settle(self):
+        """Run Tk events and idle handlers (window mapping, geometry) that are already queued."""
+        if self.root is not None:
+            import _tkinter
+            while self.root.tk.dooneevent(_tkinter.DONT_WAIT):
+                pass
+
+    def wake(self):
+        """Wake a blocked wait(); safe to call from any thread."""
+        self._win32event.SetEvent(self._wake_event)
+
+
+class SimulatedClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def advance_to(self, when):
+        self.now = max(self.now, when)
+
+
+class SimulatedMessageSource:
+    """Scripted message source for running the loop against a fake clock.
+
+    wait() advances the clock to the next scripted message, wake or timeout
+    rather than sleeping. When nothing is scripted and there is no timeout,
+    the simulation is over; set the loop's on_idle to stop it.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock  # a SimulatedClock
+        self._messages = []  # heap of (time, sequence, callback)
+        self._sequence = itertools.count()
+        self._woken = False
+        self.dispatched = 0
+
+    def post(self, at, callback):
+        """Script callback to arrive as a message at clock time `at`."""
+        heapq.heappush(self._messages, (at, next(self._sequence), callback))
+
+    def pending(self):
+        return len(self._messages)
+
+    def wait(self, timeout):
+        if self._woken:
+            self._woken = False
+            return
+        now = self.clock()
+        wake_at = self._messages[0][0] if self._messages else None
+        if timeout is not None:
+            deadline = now + timeout
+            wake_at = deadline if wake_at is None else min(wake_at, deadline)
+        if wake_at is not None:
+            self.clock.advance_to(wake_at)
+
+    def dispatch(self):
+        now = self.clock()
+        while self._messages and self._messages[0][0] <= now:
+            _, _, callback = heapq.heappop(self._messages)
+            callback()
+            self.dispatched += 1
+
+    def settle(self):
+        pass
+
+    def wake(self):
+        self._woken = True
+
+
+class EventLoop:
+    """Block until messages, wakes, timers or pollers need attention.
+
+    Pollers are (run, next_delay) pairs: run() is called after every wakeup,
+    and next_delay() returns how soon the poller needs to run again without
+    any new message (None if it can wait indefinitely).
+    """
+
+    def __init__(self, source, clock=time.monotonic, resolution=0.01):
+        self.source = source
+        self.clock = clock
+        self.timers = TimerWheel(resolution=resolution, now=clock())
+        self.pollers = []
+        self.on_idle = None  # called when the loop would otherwise block forever
+        self.running = False
+        self.started = None
+        self.wakeups = 0
+        self.timers_fired = 0
+
+    def call_later(self, delay, callback):
+        return self.timers.schedule(self.clock() + delay, callback)
+
+    def call_every(self, interval, callback, first=None):
+        delay = interval if first is None else first
+        return self.timers.schedule(self.clock() + delay, callback, interval)
+
+    def add_poller(self, run, next_delay=None):
+        self.pollers.append((run, next_delay))
+
+    def wake(self):
+        """Wake the loop from another thread."""
+        self.source.wake()
+
+    def stop(self):
+        self.running = False
+        self.source.wake()
+
+    def timeout(self):
+        """Seconds the loop may block, or None for no limit."""
+        now = self.clock()
+        timeout = None
+        deadline = self.timers.next_deadline()
+        if deadline is not None:
+            timeout = max(0.0, deadline - now)
+        for _, next_delay in self.pollers:
+            delay = next_delay() if next_delay is not None else None
+            if delay is not None and (timeout is None or delay < timeout):
+                timeout = max(0.0, delay)
+        return timeout
+
+    def run_once(self):
+        """Run due timers and pollers, then block for the next event; return the timeout used."""
+        now = self.clock()
+        for timer in self.timers.advance(now):
+            self.timers_fired += 1
+            try:
+                timer.callback()
+            except Exception as e:
+                logging.error(f"Timer callback failed: {e}", exc_info=True)
+            if timer.interval is not None and not timer.cancelled:
+                self.timers.reschedule(timer, self.clock())
+        for run, _ in self.pollers:
+            # Pollers run hotkey, tray and control commands: one failing must not end the application
+            try:
+                run()
+            except Exception as e:
+                logging.error(f"Poller {getattr(run, '__qualname__', run)} failed: {e}", exc_info=True)
+        # A poller may have built Tk windows (e.g. the Settings dialog) whose idle handlers
+        # must run now: the wait below can be infinite and no message may arrive to wake it
+        self.source.settle()
+        if not self.running:
+            return None
+
+        timeout = self.timeout()
+        if timeout is None and self.on_idle is not None:
+            self.on_idle()
+            if not self.running:
+                return None
+        self.source.wait(timeout)
+        self.wakeups += 1
+        self.source.dispatch()
+        return timeout
+
+    def run(self):
+        """Run until stop() is called."""
+        self.running = True
+        self.started = self.clock()
+        while self.running:
+            self.run_once()
+
+    def stats(self):
+        elapsed = self.clock() - self.started if self.started is not None else 0.0
+        return {
+            "wakeups": self.wakeups,
+            "wakeups_per_second": self.wakeups / elapsed if elapsed > 0 else 0.0,
+            "timers_fired": self.timers_fired,
+            "timers_pending": len(self.timers),
+        }
@@ -0,0 +1,96 @@
+"""
+Focus-follow mode for CodeFlowVision.
+Foreground changes make the focused group window the active one. The first
+change after a quiet period is applied immediately; changes arriving within
+the debounce window (an Alt+Tab burst) are coalesced so only the window focus
+settles on is applied.
+"""
+import time
+from collections import deque
+
+
+class FocusFollower:
+    """Debounce foreground changes into on_focus(hwnd) calls.
+
+    is_managed(hwnd) decides whether a window is worth reacting to; focus moving
+    to anything else (dialogs, popups, other applications) is ignored and drops
+    any change still waiting for focus to settle.
+    """
+
+    def __init__(self, is_managed, on_focus, debounce=0.04, clock=time.monotonic, max_samples=1000):
+        self.is_managed = is_managed
+        self.on_focus = on_focus
+        self.debounce = debounce
+        self.clock = clock
+        self.enabled = True
+        self._pending = None  # (hwnd, timestamp) waiting for focus to settle
+        self._quiet_at = None  # when the current burst is over
+        self.latencies = deque(maxlen=max_samples)
+        self.events = 0
+        self.applied = 0
+        self.coalesced = 0
+        self.ignored = 0
+
+    def note(self, hwnd, timestamp=None):
+        """Record that hwnd became the foreground window; return True if it was applied now."""
+        if not self.enabled:
+            return False
+        now = self.clock()
+        if timestamp is None:
+            timestamp = now
+        self.events += 1
+        if not self.is_managed(hwnd):
+            self.ignored += 1
+            self._pending = None
+            return False
+        in_burst = self._quiet_at is not None and now < self._quiet_at
+        self._quiet_at = now + self.debounce
+        if in_burst:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (hwnd, timestamp)
+            return False
+        self._pending = None
+        return self._apply(hwnd, timestamp)
+
+    def time_until_ready(self, now=None):
+        """Return seconds until a coalesced change is due, or None if nothing is pending."""
+        if self._pending is None:
+            return None
+        if now is None:
+            now = self.clock()
+        return max(0.0, self._quiet_at - now)
+
+    def flush(self, now=None):
+        """Apply the coalesced change once focus has settled; return True if one was applied."""
+        if self._pending is None:
+            return False
+        if now is None:
+            now = self.clock()
+        if now < self._quiet_at:
+            return False
+        hwnd, timestamp = self._pending
+        self._pending = None
+        return self._apply(hwnd, timestamp)
+
+    def _apply(self, hwnd, timestamp):
+        self.on_focus(hwnd)
+        self.applied += 1
+        self.latencies.append(self.clock() - timestamp)
+        return True
+
+    def cancel(self):
+        """Drop any change still waiting for focus to settle."""
+        self._pending = None
+
+    def stats(self):
+        """Return counters and focus-to-apply latency (seconds)."""
+        samples = sorted(self.latencies)
+        return {
+            "events": self.events,
+            "applied": self.applied,
+            "coalesced": self.coalesced,
+            "ignored": self.ignored,
+            "median_latency": samples[len(samples) // 2] if samples else 0.0,
+            "max_latency": samples[-1] if samples else 0.0,
+        }
@@ -0,0 +1,167 @@
+"""
+Latency and call-count instrumentation for CodeFlowVision.
+A Profiler wraps functions with monotonic timers and counting shims only when
+it is enabled; a disabled Profiler installs nothing, so it costs nothing.
+"""
+import csv
+import functools
+import json
+import logging
+import os
+import time
+from collections import Counter, deque
+
+
+class Histogram:
+    """Running count/total/max plus a bounded window of recent samples for percentiles."""
+
+    def __init__(self, max_samples=10000):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p, ordered=None):
+        ordered = ordered if ordered is not None else sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def summary(self):
+        """Return count, total and percentiles in milliseconds."""
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50, ordered) * 1000,
+            "p95_ms": self.percentile(95, ordered) * 1000,
+            "p99_ms": self.percentile(99, ordered) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class PhaseTimer:
+    """Wall-clock durations of named phases (e.g. startup stages), in the order they finished."""
+
+    def __init__(self, clock=time.perf_counter, start=None):
+        self.clock = clock
+        self.start = start if start is not None else clock()
+        self._last = self.start
+        self.phases = []  # (name, seconds)
+
+    def mark(self, name):
+        """End the current phase and name it."""
+        now = self.clock()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def summary(self):
+        """Return per-phase and total durations in milliseconds."""
+        return {
+            "phases_ms": {name: seconds * 1000 for name, seconds in self.phases},
+            "total_ms": (self._last - self.start) * 1000,
+        }
+
+
+class Profiler:
+    """Timers, histograms and call counters with periodic JSON/CSV reports."""
+
+    def __init__(self, enabled=False, report_dir=None, interval=30.0, clock=time.perf_counter):
+        self.enabled = enabled
+        self.report_dir = report_dir
+        self.interval = interval
+        self.clock = clock
+        self.timers = {}
+        self.calls = Counter()
+        self.sources = {}
+        self.started = clock()
+
+    def record(self, name, seconds):
+        histogram = self.timers.get(name)
+        if histogram is None:
+            histogram = self.timers[name] = Histogram()
+        histogram.add(seconds)
+
+    def wrap(self, name, func):
+        """Return func timed under name, or func itself when disabled."""
+        if not self.enabled:
+            return func
+        clock = self.clock
+        record = self.record
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            started = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, clock() - started)
+        return timed
+
+    def instrument(self, owner, names, prefix=""):
+        """Replace owner.<name> (instance method or module function) with a timed wrapper."""
+        if not self.enabled:
+            return
+        for name in names:
+            setattr(owner, name, self.wrap(prefix + name, getattr(owner, name)))
+
+    def count_calls(self, module, names, prefix=""):
+        """Replace module-level functions with shims that count calls."""
+        if not self.enabled:
+            return
+        for name in names:
+            func = getattr(module, name, None)
+            if func is None:
+                continue
+            setattr(module, name, self._counting(prefix + name, func))
+
+    def _counting(self, name, func):
+        calls = self.calls
+
+        @functools.wraps(func)
+        def counted(*args, **kwargs):
+            calls[name] += 1
+            return func(*args, **kwargs)
+        return counted
+
+    def add_source(self, name, stats):
+        """Include stats() of another component in every report."""
+        self.sources[name] = stats
+
+    def report(self):
+        """Return a snapshot of every timer, counter and source."""
+        return {
+            "uptime_s": self.clock() - self.started,
+            "timers": {name: histogram.summary() for name, histogram in sorted(self.timers.items())},
+            "calls": dict(sorted(self.calls.items())),
+            "sources": {name: stats() for name, stats in self.sources.items()},
+        }
+
+    def write_report(self, directory=None):
+        """Write profile.json and profile.csv into directory (default: report_dir)."""
+        directory = directory or self.report_dir
+        if not self.enabled or not directory:
+            return None
+        report = self.report()
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, "profile.json")
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=4)
+        fields = ["name", "count", "total_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+        with open(os.path.join(directory, "profile.csv"), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for name, summary in report["timers"].items():
+                writer.writerow(dict(summary, name=name))
+            for name, count in report["calls"].items():
+                writer.writerow({"name": name, "count": count})
+        logging.debug(f"Profile report written to {json_path}")
+        return json_path
@@ -0,0 +1,207 @@
+"""
+Multi-monitor window layouts.
+Layouts are computed as pure geometry over a list of Monitor work areas, so
+they can be checked against synthetic monitor topologies; the Win32 helpers
+at the bottom read the real topology and apply a layout in one batched
+deferred-positioning transaction.
+"""
+import logging
+from collections import namedtuple
+
+
+class Rect(namedtuple("Rect", ["left", "top", "right", "bottom"])):
+    """Screen rectangle in physical pixels (right/bottom exclusive)."""
+
+    __slots__ = ()
+
+    @property
+    def width(self):
+        return self.right - self.left
+
+    @property
+    def height(self):
+        return self.bottom - self.top
+
+    def center(self):
+        return (self.left + self.right) // 2, (self.top + self.bottom) // 2
+
+    def contains(self, x, y):
+        return self.left <= x < self.right and self.top <= y < self.bottom
+
+
+# rect: full monitor bounds; work_area: bounds minus taskbars and docked toolbars
+Monitor = namedtuple("Monitor", ["handle", "rect", "work_area", "primary", "dpi"])
+
+LAYOUT_MODES = ("split", "stacked", "per-monitor")
+
+
+def divide(length, count, ratios=None, gap=0):
+    """Split length into count integer spans proportional to ratios, separated by gap.
+
+    Returns (offset, size) pairs; rounding slack goes to the last span so the
+    spans exactly cover the length.
+    """
+    if count <= 0:
+        return []
+    if not ratios or len(ratios) != count or any(r <= 0 for r in ratios):
+        ratios = [1] * count
+    usable = max(0, length - gap * (count - 1))
+    total = float(sum(ratios))
+    spans = []
+    offset = 0
+    for index, ratio in enumerate(ratios):
+        if index == count - 1:
+            size = usable - sum(size for _, size in spans)
+        else:
+            size = int(round(usable * ratio / total))
+        spans.append((offset, size))
+        offset += size + gap
+    return spans
+
+
+def split(area, count, ratios=None, gap=0):
+    """Side-by-side columns filling area."""
+    return [Rect(area.left + offset, area.top, area.left + offset + size, area.bottom)
+            for offset, size in divide(area.width, count, ratios, gap)]
+
+
+def stacked(area, count, ratios=None, gap=0):
+    """Rows filling area, top to bottom."""
+    return [Rect(area.left, area.top + offset, area.right, area.top + offset + size)
+            for offset, size in divide(area.height, count, ratios, gap)]
+
+
+def choose_monitor(monitors, spec="current", point=None):
+    """Pick a monitor by index, "primary", or "current" (the one containing point)."""
+    if not monitors:
+        return None
+    if isinstance(spec, int):
+        return monitors[spec % len(monitors)]
+    if spec == "current" and point is not None:
+        for monitor in monitors:
+            if monitor.rect.contains(*point):
+                return monitor
+    for monitor in monitors:
+        if monitor.primary:
+            return monitor
+    return monitors[0]
+
+
+def compute_layout(mode, monitors, hwnds, ratios=None, monitor=None, gap=0):
+    """Return [(hwnd, Rect)] placing hwnds according to mode.
+
+    split/stacked divide one monitor's work area (monitor, or the primary);
+    per-monitor gives each window a whole work area, in monitor order from
+    the primary, wrapping around and splitting when there are more windows
+    than monitors.
+    """
+    if not hwnds or not monitors:
+        return []
+    if mode == "per-monitor":
+        ordered = sorted(monitors, key=lambda m: (not m.primary, m.rect.left, m.rect.top))
+        buckets = [[] for _ in ordered]
+        for index, hwnd in enumerate(hwnds):
+            buckets[index % len(ordered)].append(hwnd)
+        placements = []
+        for target, bucket in zip(ordered, buckets):
+            placements.extend(zip(bucket, split(target.work_area, len(bucket), gap=gap)))
+        return placements
+
+    target = monitor or choose_monitor(monitors, "primary")
+    if mode == "stacked":
+        rects = stacked(target.work_area, len(hwnds), ratios, gap)
+    elif mode == "split":
+        rects = split(target.work_area, len(hwnds), ratios, gap)
+    else:
+        raise ValueError(f"Unknown layout mode: {mode}")
+    return list(zip(hwnds, rects))
+
+
+def expand(rect, margins):
+    """Grow rect by (left, top, right, bottom) margins, e.g. invisible resize borders."""
+    left, top, right, bottom = margins
+    return Rect(rect.left - left, rect.top - top, rect.right + right, rect.bottom + bottom)
+
+
+# Win32 side
+
+def enable_dpi_awareness():
+    """Make the process per-monitor DPI aware so coordinates are physical pixels on every monitor."""
+    try:
+        import ctypes
+        ctypes.windll.shcore.SetProcessDpiAwareness(2)  # PROCESS_PER_MONITOR_DPI_AWARE
+    except (AttributeError, OSError):
+        pass
+
+
+def _monitor_dpi(handle):
+    try:
+        import ctypes
+        from ctypes import wintypes
+        x, y = wintypes.UINT(), wintypes.UINT()
+        if ctypes.windll.shcore.GetDpiForMonitor(int(handle), 0, ctypes.byref(x), ctypes.byref(y)) == 0:
+            return x.value
+    except (AttributeError, OSError):
+        pass
+    return 96
+
+
+def enum_monitors():
+    """Return the Monitor list for the current display topology."""
+    import win32api
+    monitors = []
+    for handle, _, _ in win32api.EnumDisplayMonitors():
+        info = win32api.GetMonitorInfo(handle)
+        monitors.append(Monitor(
+            handle=handle,
+            rect=Rect(*info["Monitor"]),
+            work_area=Rect(*info["Work"]),
+            primary=bool(info["Flags"] & 1),  # MONITORINFOF_PRIMARY
+            dpi=_monitor_dpi(handle),
+        ))
+    return monitors
+
+
+def frame_margins(hwnd):
+    """Return the invisible border widths around hwnd's visible frame (Windows 10+ shadows)."""
+    try:
+        import ctypes
+        from ctypes import wintypes
+        import win32gui
+        frame = wintypes.RECT()
+        DWMWA_EXTENDED_FRAME_BOUNDS = 9
+        if ctypes.windll.dwmapi.DwmGetWindowAttribute(
+                wintypes.HWND(hwnd), DWMWA_EXTENDED_FRAME_BOUNDS, ctypes.byref(frame), ctypes.sizeof(frame)) != 0:
+            return (0, 0, 0, 0)
+        left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+        return (frame.left - left, frame.top - top, right - frame.right, bottom - frame.bottom)
+    except (AttributeError, OSError):
+        return (0, 0, 0, 0)
+
+
+def apply_layout(placements, exact=False):
+    """Move and resize every window in one BeginDeferWindowPos/EndDeferWindowPos transaction.
+
+    Rects are visible frames, grown by each window's invisible borders, and the
+    windows are raised above other applications (Reset Layout), unless exact is
+    set (rects taken from GetWindowRect, e.g. to put windows back in place).
+    """
+    import win32con
+    import win32gui
+    if not placements:
+        return
+    # Maximized or minimized windows ignore moves until restored
+    for hwnd, _ in placements:
+        if win32gui.IsIconic(hwnd) or win32gui.IsZoomed(hwnd):
+            win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
+    if exact:
+        insert_after, flags = 0, win32con.SWP_NOZORDER | win32con.SWP_NOACTIVATE
+    else:
+        insert_after, flags = win32con.HWND_TOP, win32con.SWP_NOACTIVATE
+    hdwp = win32gui.BeginDeferWindowPos(len(placements))
+    for hwnd, rect in placements:
+        if not exact:
+            rect = expand(rect, frame_margins(hwnd))
+        hdwp = win32gui.DeferWindowPos(hdwp, hwnd, insert_after, rect.left, rect.top, rect.width, rect.height, flags)
+    win32gui.EndDeferWindowPos(hdwp)
+    logging.debug(f"Applied layout to {len(placements)} windows in one batch")
@@ -0,0 +1,141 @@
+"""
+Non-blocking logging for CodeFlowVision.
+Records are put on an in-memory queue by the calling thread and written to a
+rotating log file by a background thread, so a slow disk never delays the UI
+thread. Arguments wrapped in Deferred (such as CodeFlowVision.window_title)
+are evaluated only on the writer thread, and only if the record is actually
+emitted.
+
+Log with %-style arguments rather than f-strings on hot paths so nothing is
+formatted when the level is disabled:
+    logging.info("Active window: %s", Deferred(backend.window_text, hwnd))
+"""
+import atexit
+import copy
+import logging
+import logging.handlers
+import queue
+import time
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+_UNSET = object()
+
+
+class Deferred:
+    """Log argument computed as func(*args) when the record is first written, then reused."""
+
+    __slots__ = ("func", "args", "_value")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+        self._value = _UNSET
+
+    def value(self):
+        if self._value is _UNSET:
+            try:
+                self._value = self.func(*self.args)
+            except Exception as e:
+                self._value = f"<unavailable: {e}>"
+        return self._value
+
+    def __str__(self):
+        return str(self.value())
+
+    def __repr__(self):
+        return repr(self.value())
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the writer thread.
+
+    The stock QueueHandler formats the message in the calling thread, which
+    would evaluate Deferred arguments there. Instead, mutable arguments are
+    copied so later changes don't leak into the message, and tracebacks are
+    rendered now because they reference live frames.
+    """
+
+    _IMMUTABLE = (str, int, float, bool, type(None), tuple, frozenset, Deferred)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        args = record.args
+        if isinstance(args, tuple):
+            record.args = tuple(arg if isinstance(arg, self._IMMUTABLE) else copy.copy(arg) for arg in args)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if record.stack_info:
+            record.stack_info = str(record.stack_info)
+        return record
+
+
+class RotatingLogFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotate the log when it exceeds max_bytes or every interval seconds, whichever comes first.
+
+    Rotated files are numbered like RotatingFileHandler's (codeflow.log.1 is
+    the newest); backup_count of them are kept.
+    """
+
+    def __init__(self, filename, max_bytes=1024 * 1024, interval=24 * 3600, backup_count=5, clock=time.time):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.interval = interval
+        self.clock = clock
+        self.rollover_at = clock() + interval if interval else None
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and self.clock() >= self.rollover_at:
+            return 1
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = self.clock() + self.interval
+
+
+class LogPipeline:
+    """A queue, the handler feeding it and the background thread draining it."""
+
+    def __init__(self, handlers, level=logging.INFO):
+        self.queue = queue.SimpleQueue()
+        self.handler = QueueLogHandler(self.queue)
+        self.handler.setLevel(level)
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.running = False
+
+    def start(self):
+        self.listener.start()
+        self.running = True
+
+    def stop(self):
+        """Flush everything still queued and stop the writer thread."""
+        if not self.running:
+            return
+        self.running = False
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+
+def setup_logging(log_path=None, level=logging.INFO, max_bytes=1024 * 1024, interval=24 * 3600,
+                  backup_count=5, console=True):
+    """Route the root logger through a LogPipeline writing to log_path and/or the console."""
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if log_path:
+        handlers.append(RotatingLogFileHandler(log_path, max_bytes, interval, backup_count))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    pipeline = LogPipeline(handlers, level)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(pipeline.handler)
+    root.setLevel(level)
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    return pipeline
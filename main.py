@@ -3,40 +3,132 @@
 CodeFlow Vision - Transparency Manager for Developer Workflows
 Helps developers work with multiple windows (IDE, browser) simultaneously by managing window transparency.
 """
+import time
+STARTED = time.perf_counter()  # start of the startup-time breakdown
+
 import argparse
+import json
 import sys
 import traceback
 import logging
 import os
-from transparency_manager import CodeFlowVision
+from instrumentation import PhaseTimer, Profiler
+from log_pipeline import setup_logging
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="CodeFlow Vision - Window Transparency Manager")
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     parser.add_argument("--minimized", action="store_true", help="Start minimized to system tray")
     parser.add_argument("--reset-config", action="store_true", help="Reset configuration to defaults")
+    parser.add_argument("--profile", action="store_true", help="Record latency and Win32 call counts to profile.json/profile.csv")
+    parser.add_argument("--log-max-kb", type=int, default=1024, help="Rotate the log file when it exceeds this size (default: 1024)")
+    parser.add_argument("--log-backups", type=int, default=5, help="Number of rotated log files to keep (default: 5)")
+    parser.add_argument("--profile-interval", type=float, default=30.0, help="Seconds between profile reports (default: 30)")
+    parser.add_argument("--record-trace", metavar="PATH", help="Record hotkeys and window events to a session trace for benchmark.py replay")
+    parser.add_argument("--exit-after-startup", action="store_true", help="Exit once startup completes and print the per-phase startup times as JSON")
+
+    # Client subcommands talk to a running instance instead of starting one
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.add_parser("state", help="Print the running instance's state")
+    preset = commands.add_parser("preset", help="Switch transparency preset")
+    preset.add_argument("name")
+    group = commands.add_parser("group", help="Switch window group")
+    group.add_argument("name")
+    opacity = commands.add_parser("opacity", help="Set the opacity of a group's windows")
+    opacity.add_argument("opacity", type=int, help="0 (invisible) to 255 (opaque)")
+    opacity.add_argument("--group", help="Group name (default: the active group)")
+    opacity.add_argument("--role", choices=["ide", "browser"], help="Only windows of this role")
+    layout = commands.add_parser("layout", help="Arrange the group's windows")
+    layout.add_argument("--mode", choices=["split", "stacked", "per-monitor"])
+    layout.add_argument("--ratios", type=float, nargs="+")
+    layout.add_argument("--monitor", help='"current", "primary" or a monitor index')
+    layout.add_argument("--gap", type=int)
+    transparency = commands.add_parser("transparency", help="Turn transparency on or off")
+    transparency.add_argument("state", choices=["on", "off"])
+    commands.add_parser("swap", help="Swap the active window")
+    commands.add_parser("redetect", help="Detect windows again")
+    commands.add_parser("batch", help="Send the JSON commands on stdin (an array or one object per line) in one request")
     return parser.parse_args()
 
+def client_commands(args):
+    """Translate a client subcommand into the control protocol's command list."""
+    if args.command == "batch":
+        text = sys.stdin.read().strip()
+        if text.startswith("["):
+            return json.loads(text)
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if args.command in ("preset", "group"):
+        return [{"cmd": args.command, "name": args.name}]
+    if args.command == "opacity":
+        command = {"cmd": "opacity", "opacity": args.opacity}
+        if args.group:
+            command["group"] = args.group
+        if args.role:
+            command["role"] = args.role
+        return [command]
+    if args.command == "layout":
+        command = {"cmd": "layout"}
+        for key in ("mode", "ratios", "gap"):
+            if getattr(args, key) is not None:
+                command[key] = getattr(args, key)
+        if args.monitor is not None:
+            command["monitor"] = int(args.monitor) if args.monitor.lstrip("-").isdigit() else args.monitor
+        return [command]
+    if args.command == "transparency":
+        return [{"cmd": "transparency", "enabled": args.state == "on"}]
+    return [{"cmd": args.command}]
+
+def run_client(args):
+    """Send a subcommand to the running instance and print its response."""
+    from control_server import send
+    try:
+        response = send(client_commands(args))
+    except ValueError as e:
+        print(f"Invalid batch input: {e}", file=sys.stderr)
+        return 2
+    except OSError as e:
+        print(f"CodeFlow Vision is not running or not answering: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(response, indent=2))
+    failed = "error" in response or any(not result.get("ok") for result in response.get("results", []))
+    return 1 if failed else 0
+
 def main():
     try:
         # Parse command line arguments
+        startup = PhaseTimer(start=STARTED)
         args = parse_arguments()
+        if args.command:
+            return run_client(args)
         
         # Setup logging level based on arguments
         log_level = logging.DEBUG if args.debug else logging.INFO
         log_path = os.path.join(os.getenv('APPDATA'), 'CodeFlowVision', 'codeflow.log')
         os.makedirs(os.path.dirname(log_path), exist_ok=True)
-        logging.basicConfig(
-            level=log_level,
-            format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            handlers=[logging.FileHandler(log_path), logging.StreamHandler()]
+        # Records are written by a background thread; the log rotates daily or when it grows too large
+        log_pipeline = setup_logging(
+            log_path, level=log_level,
+            max_bytes=args.log_max_kb * 1024,
+            backup_count=args.log_backups
         )
         
-        # Initialize the application
-        app = CodeFlowVision()
+        # Profiling reports are written next to the log file
+        profiler = Profiler(enabled=args.profile, report_dir=os.path.dirname(log_path), interval=args.profile_interval)
+        startup.mark("logging")
+
+        # Initialize the application; imported here so client subcommands start instantly
+        from transparency_manager import CodeFlowVision
+        startup.mark("import")
+        app = CodeFlowVision(profiler=profiler, startup=startup)
+        app.exit_after_startup = args.exit_after_startup
+        if args.record_trace:
+            app.record_trace(args.record_trace)
         
         # Run the main loop (which will handle Tkinter)
         app.run()
+        log_pipeline.stop()
+        if args.exit_after_startup:
+            print(json.dumps(startup.summary()))
         
     except Exception as e:
         logging.error(f"Error: {e}", exc_info=True)
@@ -0,0 +1,173 @@
+"""
+Process identity cache for window detection.
+Maps a PID to its process name, keyed by (pid, create_time) so a recycled PID
+never returns the name of the process that previously owned it.
+"""
+from collections import OrderedDict
+
+
+class PsutilProcessTable:
+    """Process table backed by psutil."""
+
+    def __init__(self):
+        import psutil
+        self._psutil = psutil
+        self._errors = (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess)
+        self._last = None  # Process built by the last create_time() call
+
+    def _process(self, pid):
+        # A lookup asks for the creation time first; the name or parent that
+        # follows reuses the same Process instead of opening the process again
+        process = self._last
+        if process is None or process.pid != pid:
+            process = self._psutil.Process(pid)
+        return process
+
+    def create_time(self, pid):
+        """Return the creation time of a process, or None if it is gone."""
+        self._last = None
+        try:
+            # Always a fresh Process: psutil caches the creation time in it
+            process = self._psutil.Process(pid)
+            create_time = process.create_time()
+        except self._errors:
+            return None
+        self._last = process
+        return create_time
+
+    def name(self, pid):
+        """Return the lower-cased name of a process, or None if it is unavailable."""
+        try:
+            return self._process(pid).name().lower()
+        except self._errors:
+            return None
+
+    def ppid(self, pid):
+        """Return the parent PID of a process, or None if it is unavailable."""
+        try:
+            return self._process(pid).ppid()
+        except self._errors:
+            return None
+
+
+class ProcessNameCache:
+    """Bounded LRU cache of process names keyed by (pid, create_time).
+
+    Lookups between begin_pass() and end_pass() are served from a per-pass
+    memo so each process is queried at most once per pass, however many
+    windows it owns. Every other lookup (and the first one of each PID in a
+    pass) reuses the cached name only if the process creation time still
+    matches.
+    """
+
+    def __init__(self, table=None, maxsize=512):
+        self._table = table
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # pid -> (create_time, name)
+        self._parents = {}  # pid -> (create_time, ppid)
+        self._pass_memo = None  # pid -> name during a detection pass
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def table(self):
+        # psutil is only imported once the first process is looked up
+        if self._table is None:
+            self._table = PsutilProcessTable()
+        return self._table
+
+    def begin_pass(self):
+        """Start a detection pass; PIDs will be re-validated once each until end_pass()."""
+        self._pass_memo = {}
+
+    def end_pass(self):
+        """End the detection pass; lookups validate the creation time again."""
+        self._pass_memo = None
+
+    def get_name(self, pid):
+        """Return the lower-cased process name for pid, or None."""
+        memo = self._pass_memo
+        if memo is not None and pid in memo:
+            self.hits += 1
+            return memo[pid]
+
+        create_time = self.table.create_time(pid)
+        if create_time is None:
+            self._entries.pop(pid, None)
+            if memo is not None:
+                memo[pid] = None
+            self.misses += 1
+            return None
+
+        entry = self._entries.get(pid)
+        if entry is not None and entry[0] == create_time:
+            self._entries.move_to_end(pid)
+            self.hits += 1
+            name = entry[1]
+        else:
+            self.misses += 1
+            name = self.table.name(pid)
+            if name is not None:
+                self._entries[pid] = (create_time, name)
+                self._entries.move_to_end(pid)
+                if len(self._entries) > self.maxsize:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._parents.pop(evicted, None)
+                    self.evictions += 1
+            else:
+                self._entries.pop(pid, None)
+
+        if memo is not None:
+            memo[pid] = name
+        return name
+
+    def get_parent(self, pid):
+        """Return the parent PID of pid, or None; cached for the life of the process."""
+        entry = self._entries.get(pid) if self.get_name(pid) is not None else None
+        if entry is None:
+            return None
+        create_time = entry[0]
+        cached = self._parents.get(pid)
+        if cached is not None and cached[0] == create_time:
+            return cached[1]
+        ppid = getattr(self.table, "ppid", None)
+        parent = ppid(pid) if ppid is not None else None
+        self._parents[pid] = (create_time, parent)
+        return parent
+
+    def ancestors(self, pid, depth=4):
+        """Return the names of up to depth ancestor processes, nearest first."""
+        names = []
+        for _ in range(depth):
+            parent = self.get_parent(pid)
+            if not parent or parent == pid:
+                break
+            name = self.get_name(parent)
+            if name is None:
+                break
+            names.append(name)
+            pid = parent
+        return names
+
+    def invalidate(self, pid=None):
+        """Drop one PID, or everything if pid is None."""
+        if pid is None:
+            self._entries.clear()
+            self._parents.clear()
+            if self._pass_memo is not None:
+                self._pass_memo.clear()
+        else:
+            self._entries.pop(pid, None)
+            self._parents.pop(pid, None)
+            if self._pass_memo is not None:
+                self._pass_memo.pop(pid, None)
+
+    def stats(self):
+        """Return hit/miss counters."""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
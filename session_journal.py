@@ -0,0 +1,287 @@
+"""
+Session journal for CodeFlowVision.
+Before the application first changes a window's extended style, opacity or
+position, the window's original values are appended to a small journal file
+next to config.json. On exit (or when the run loop dies with an exception)
+every window in the journal is put back in one batched pass; after a crash
+or a kill, the next start finds the journal and restores those windows
+before anything else, without enumerating the desktop.
+
+The journal is JSON lines, one record per change:
+    {"op":"adopt","hwnd":65538,"pid":1234,"class":"Chrome_WidgetWin_1","exstyle":256,"alpha":null}
+    {"op":"geometry","hwnd":65538,"rect":[0,0,1280,1040]}
+    {"op":"placed","hwnd":65538,"rect":[0,0,960,1040]}
+    {"op":"release","hwnd":65538}
+and is rewritten with only the live entries once released ones dominate it.
+A window is only moved back if it is still where the application last
+placed it; one the user has since moved, maximized or minimized stays put.
+"""
+import json
+import logging
+import os
+
+from layout import Rect
+from window_state import WS_EX_LAYERED, WS_EX_TRANSPARENT
+
+# The extended-style bits the application changes; restoring leaves all others as they are now
+OWN_STYLE_BITS = WS_EX_LAYERED | WS_EX_TRANSPARENT
+
+
+class JournalEntry:
+    """Original state of one window; exstyle or rect is None until that part is changed.
+
+    placed is where the application last put the window, once it has.
+    """
+
+    __slots__ = ("hwnd", "pid", "class_name", "exstyle", "alpha", "rect", "placed")
+
+    def __init__(self, hwnd, pid, class_name, exstyle=None, alpha=None, rect=None, placed=None):
+        self.hwnd = hwnd
+        self.pid = pid
+        self.class_name = class_name
+        self.exstyle = exstyle
+        self.alpha = alpha
+        self.rect = rect
+        self.placed = placed
+
+    def records(self):
+        """The journal records that recreate this entry."""
+        records = [{"op": "adopt", "hwnd": self.hwnd, "pid": self.pid, "class": self.class_name,
+                    "exstyle": self.exstyle, "alpha": self.alpha}]
+        if self.rect is not None:
+            records.append({"op": "geometry", "hwnd": self.hwnd, "rect": list(self.rect)})
+        if self.placed is not None:
+            records.append({"op": "placed", "hwnd": self.hwnd, "rect": list(self.placed)})
+        return records
+
+
+def read_journal(path):
+    """Replay the journal at path into {hwnd: JournalEntry}; a torn last line is ignored."""
+    entries = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return entries
+    for line in lines:
+        try:
+            record = json.loads(line)
+            hwnd = record["hwnd"]
+            op = record["op"]
+        except (ValueError, KeyError, TypeError):
+            continue  # a record cut short by a crash
+        if op == "adopt":
+            entry = entries.get(hwnd)
+            if entry is None:
+                entries[hwnd] = JournalEntry(hwnd, record.get("pid"), record.get("class"),
+                                             record.get("exstyle"), record.get("alpha"))
+            elif entry.exstyle is None:
+                entry.exstyle, entry.alpha = record.get("exstyle"), record.get("alpha")
+        elif op == "geometry" and hwnd in entries and record.get("rect"):
+            entries[hwnd].rect = Rect(*record["rect"])
+        elif op == "placed" and hwnd in entries and record.get("rect"):
+            entries[hwnd].placed = Rect(*record["rect"])
+        elif op == "release":
+            entries.pop(hwnd, None)
+    return entries
+
+
+class SessionJournal:
+    """Append-only record of the original state of every window the application changed.
+
+    backend is the window system (see window_backend.py). Records are flushed
+    as they are written, so the journal survives the process dying at any point.
+    """
+
+    def __init__(self, path, backend, compact_slack=64):
+        self.path = path
+        self.backend = backend
+        self.compact_slack = compact_slack
+        self.entries = {}
+        self._file = None
+        self._records = 0  # records in the file, live or not
+        self.restored = 0
+        self.compactions = 0
+
+    def __contains__(self, hwnd):
+        return hwnd in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Recording
+
+    def adopt(self, hwnd, exstyle, pid=None):
+        """Remember hwnd's original extended style (and alpha, if it was already layered).
+
+        A window already in the journal keeps its first recorded original,
+        including one left over from a previous session.
+        """
+        entry = self.entries.get(hwnd)
+        if entry is not None and entry.exstyle is not None:
+            return
+        backend = self.backend
+        try:
+            if entry is None:
+                entry = self._new_entry(hwnd, pid)
+            alpha = backend.get_alpha(hwnd) if exstyle & WS_EX_LAYERED else None
+        except backend.error:
+            return
+        entry.exstyle = exstyle
+        entry.alpha = alpha
+        self._append({"op": "adopt", "hwnd": hwnd, "pid": entry.pid, "class": entry.class_name,
+                      "exstyle": exstyle, "alpha": alpha})
+
+    def note_geometry(self, hwnd, pid=None):
+        """Remember hwnd's original window rectangle before it is first moved."""
+        entry = self.entries.get(hwnd)
+        if entry is not None and entry.rect is not None:
+            return
+        backend = self.backend
+        try:
+            if entry is None:
+                entry = self._new_entry(hwnd, pid)
+                self._append(entry.records()[0])
+            entry.rect = backend.window_rect(hwnd)
+        except backend.error:
+            return
+        self._append({"op": "geometry", "hwnd": hwnd, "rect": list(entry.rect)})
+
+    def note_placement(self, hwnd):
+        """Remember where hwnd ended up after the application moved it."""
+        entry = self.entries.get(hwnd)
+        if entry is None or entry.rect is None:
+            return
+        backend = self.backend
+        try:
+            placed = backend.window_rect(hwnd)
+        except backend.error:
+            return
+        if placed != entry.placed:
+            entry.placed = placed
+            self._append({"op": "placed", "hwnd": hwnd, "rect": list(placed)})
+
+    def _new_entry(self, hwnd, pid):
+        backend = self.backend
+        if pid is None:
+            pid = backend.window_pid(hwnd)
+        entry = JournalEntry(hwnd, pid, backend.class_name(hwnd))
+        self.entries[hwnd] = entry
+        return entry
+
+    def release(self, hwnd):
+        """Forget hwnd (it was destroyed, or is back to its original state)."""
+        if self.entries.pop(hwnd, None) is None:
+            return
+        self._append({"op": "release", "hwnd": hwnd})
+        if self._records > 2 * len(self.entries) + self.compact_slack:
+            self.compact()
+
+    # Restoring
+
+    def recover(self):
+        """Restore the windows a previous session left changed; return how many were restored."""
+        previous = read_journal(self.path)
+        if not previous:
+            return 0
+        for hwnd, entry in previous.items():
+            self.entries.setdefault(hwnd, entry)
+        restored = self.restore(list(previous))
+        logging.info(f"Restored {restored} of {len(previous)} windows left changed by the previous session")
+        return restored
+
+    def restore(self, hwnds=None):
+        """Put windows (default: all) back to their original state in one pass; return how many were.
+
+        The layered and click-through style bits and alphas are reset window by
+        window. Windows still where the application placed them are moved back
+        in a single deferred-positioning batch. Windows that are gone, or whose
+        handle now belongs to a different window, are dropped. A window that
+        refuses the change stays in the journal so a later run can retry.
+        """
+        backend = self.backend
+        placements = []
+        done = []
+        restored = 0
+        for hwnd in list(self.entries) if hwnds is None else hwnds:
+            entry = self.entries.get(hwnd)
+            if entry is None:
+                continue
+            try:
+                if (not backend.is_window(hwnd) or backend.window_pid(hwnd) != entry.pid
+                        or backend.class_name(hwnd) != entry.class_name):
+                    done.append(hwnd)
+                    continue
+                if entry.exstyle is not None:
+                    # Style bits the window gained since (e.g. WS_EX_TOPMOST) are kept;
+                    # dropping WS_EX_LAYERED discards our alpha along with it
+                    current = backend.get_exstyle(hwnd)
+                    exstyle = (current & ~OWN_STYLE_BITS) | (entry.exstyle & OWN_STYLE_BITS)
+                    if exstyle != current:
+                        backend.set_exstyle(hwnd, exstyle)
+                    if entry.exstyle & WS_EX_LAYERED:
+                        backend.set_alpha(hwnd, entry.alpha if entry.alpha is not None else 255)
+                # A window moved, maximized or minimized since is where the user wants it
+                if entry.rect is not None and (entry.placed is None or backend.window_rect(hwnd) == entry.placed):
+                    placements.append((hwnd, entry.rect))
+            except backend.error as e:
+                logging.warning("Could not restore window %s: %s", hwnd, e)
+                continue
+            done.append(hwnd)
+            restored += 1
+        if placements:
+            try:
+                backend.apply_layout(placements, exact=True)
+            except backend.error as e:
+                logging.warning("Could not restore window positions: %s", e)
+        for hwnd in done:
+            self.entries.pop(hwnd, None)
+        self.compact()
+        self.restored += restored
+        return restored
+
+    # File
+
+    def _append(self, record):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self._records += 1
+
+    def compact(self):
+        """Rewrite the journal with only the live entries (atomically); remove it if there are none."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._records = 0
+        if not self.entries:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                for record in entry.records():
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                    self._records += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.compactions += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self):
+        return {
+            "windows": len(self.entries),
+            "records": self._records,
+            "restored": self.restored,
+            "compactions": self.compactions,
+        }
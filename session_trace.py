@@ -0,0 +1,334 @@
+"""
+Session traces for CodeFlowVision.
+A TraceRecorder captures what happens during a real session (hotkeys,
+windows opening and closing, focus changes) and replay() drives the same
+session through CodeFlowVision on a SimulatedDesktop, on any platform,
+reporting throughput, per-action latency and Win32 call counts.
+
+A trace is a JSON-lines file. The first record describes the desktop when
+recording started; every later record is an event t seconds after that:
+    {"type": "desktop", "monitors": [...], "processes": {...}, "windows": [...], "config": {...}}
+    {"t": 1.25, "type": "create", "window": {...}, "processes": {...}}
+    {"t": 1.5, "type": "focus", "hwnd": 65538}
+    {"t": 1.75, "type": "move", "hwnd": 65538, "rect": [0, 0, 960, 1040]}
+    {"t": 2.0, "type": "hotkey", "action": "swap_active"}
+Event types are create, destroy, focus, minimize, restore, move and hotkey.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from config_service import thaw
+from instrumentation import Histogram, Profiler
+from layout import Monitor, Rect
+from window_events import CREATE, DESTROY, FOREGROUND, MINIMIZE, MOVED, RESTORE
+
+EVENT_TYPES = {CREATE: "create", DESTROY: "destroy", FOREGROUND: "focus", MINIMIZE: "minimize", RESTORE: "restore",
+               MOVED: "move"}
+
+
+class TraceRecorder:
+    """Writes a trace of the session to path, one flushed line per event (safe from any thread)."""
+
+    def __init__(self, path, backend, clock=time.monotonic):
+        self.path = path
+        self.backend = backend
+        self.clock = clock
+        self.started = None
+        self.events = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._processes = {}  # pid -> {"name", "ppid"}, recorded once each
+        table = backend.process_table()
+        if table is None:
+            from process_cache import PsutilProcessTable
+            table = PsutilProcessTable()
+        self._table = table
+
+    def start(self, config):
+        """Open the trace and record the current desktop and configuration."""
+        windows = [window for window in map(self.describe_window, self.backend.enum_windows()) if window]
+        header = {
+            "type": "desktop",
+            "monitors": [
+                {"handle": int(m.handle), "rect": list(m.rect), "work_area": list(m.work_area),
+                 "primary": m.primary, "dpi": m.dpi}
+                for m in self.backend.monitors()
+            ],
+            "processes": self.new_processes(window["pid"] for window in windows),
+            "windows": windows,
+            "config": thaw(config),
+        }
+        self._file = open(self.path, "w", encoding="utf-8")
+        self.started = self.clock()
+        self._write(header)
+        logging.info(f"Recording session trace to {self.path}")
+
+    def describe_window(self, hwnd):
+        """Attributes needed to recreate hwnd in a simulated desktop, or None if it is gone."""
+        backend = self.backend
+        try:
+            rect = backend.window_rect(hwnd)
+            return {
+                "hwnd": hwnd,
+                "title": backend.window_text(hwnd),
+                "class_name": backend.class_name(hwnd),
+                "pid": backend.window_pid(hwnd),
+                "rect": list(rect),
+                "visible": backend.is_visible(hwnd),
+                "child": backend.is_child(hwnd),
+                "exstyle": backend.get_exstyle(hwnd),
+                "owner": backend.owner(hwnd),
+                "cloaked": backend.is_cloaked(hwnd),
+            }
+        except backend.error:
+            return None
+
+    def new_processes(self, pids, depth=4):
+        """Name and parent of each pid (and its ancestors) not recorded yet, by pid."""
+        found = {}
+        for pid in pids:
+            for _ in range(depth + 1):
+                if not pid or pid in self._processes:
+                    break
+                name = self._table.name(pid)
+                if name is None:
+                    break
+                ppid = self._table.ppid(pid) or 0
+                self._processes[pid] = found[str(pid)] = {"name": name, "ppid": ppid}
+                pid = ppid
+        return found
+
+    def record(self, kind, timestamp=None, **fields):
+        """Append an event; timestamp is on the recorder's clock (default: now)."""
+        if self._file is None:
+            return
+        when = self.clock() if timestamp is None else timestamp
+        self._write(dict(t=round(when - self.started, 6), type=kind, **fields))
+        self.events += 1
+
+    def record_window_event(self, event):
+        kind = EVENT_TYPES.get(event.kind)
+        if kind == "create":
+            window = self.describe_window(event.hwnd)
+            if window is not None:
+                processes = self.new_processes([window["pid"]])
+                self.record(kind, event.timestamp, window=window, processes=processes)
+        elif kind == "move":
+            try:
+                rect = self.backend.window_rect(event.hwnd)
+            except self.backend.error:
+                return
+            self.record(kind, event.timestamp, hwnd=event.hwnd, rect=list(rect))
+        elif kind is not None:
+            self.record(kind, event.timestamp, hwnd=event.hwnd)
+
+    def _write(self, record):
+        with self._lock:
+            if self._file is not None:
+                self._file.write(json.dumps(record) + "\n")
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class RecordingEventSource:
+    """Event source wrapper that records every event it passes on."""
+
+    def __init__(self, source, recorder):
+        self.source = source
+        self.recorder = recorder
+
+    def start(self):
+        return self.source.start()
+
+    def stop(self):
+        self.source.stop()
+
+    @property
+    def running(self):
+        return self.source.running
+
+    def poll(self):
+        events = self.source.poll()
+        for event in events:
+            self.recorder.record_window_event(event)
+        return events
+
+
+def load_trace(path):
+    """Return (header, events) read from a trace file."""
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records or records[0].get("type") != "desktop":
+        raise ValueError(f"{path} is not a session trace")
+    return records[0], records[1:]
+
+
+def build_desktop(header, costs=None):
+    """A SimulatedDesktop in the state the trace header describes."""
+    from simulated_desktop import SimulatedDesktop
+    monitors = [
+        Monitor(m["handle"], Rect(*m["rect"]), Rect(*m["work_area"]), m["primary"], m["dpi"])
+        for m in header.get("monitors", [])
+    ]
+    desktop = SimulatedDesktop(monitors=monitors or None, costs=costs)
+    add_processes(desktop, header.get("processes", {}))
+    for window in reversed(header.get("windows", [])):  # bottom first, so the z-order matches
+        desktop.create_window(**window)
+    desktop.events.poll()  # these windows existed before the application started
+    return desktop
+
+
+def add_processes(desktop, processes):
+    for pid, process in processes.items():
+        desktop.add_process(int(pid), process["name"], process.get("ppid", 0))
+
+
+def apply_event(desktop, app, event):
+    """Make one trace event happen on the simulated desktop."""
+    kind = event["type"]
+    if kind == "create":
+        add_processes(desktop, event.get("processes", {}))
+        desktop.create_window(**event["window"])
+    elif kind == "destroy":
+        desktop.destroy_window(event["hwnd"])
+    elif kind == "focus":
+        desktop.focus(event["hwnd"])
+    elif kind == "minimize":
+        desktop.minimize(event["hwnd"])
+    elif kind == "restore":
+        desktop.unminimize(event["hwnd"])
+    elif kind == "move":
+        desktop.move_window(event["hwnd"], event["rect"])
+    elif kind == "hotkey":
+        combination = app.config["hotkeys"].get(event["action"])
+        if combination is None or not desktop.press(combination):
+            app.on_hotkey(event["action"])
+
+
+class ActionMeter:
+    """Attributes wall time, modeled Win32 time and calls to each action.
+
+    Everything that happens from one action until the next (including
+    debounced commands and fade frames it started) is charged to it.
+    """
+
+    def __init__(self, desktop):
+        self.desktop = desktop
+        self.wall = {}
+        self.modeled = {}
+        self.calls = {}
+        self.counts = Counter()
+        self._current = None
+
+    def _mark(self):
+        return time.perf_counter(), self.desktop.busy, sum(self.desktop.calls.values())
+
+    def begin(self, kind):
+        self.end()
+        self.counts[kind] += 1
+        self._current = (kind,) + self._mark()
+
+    def end(self):
+        if self._current is None:
+            return
+        kind, wall, busy, calls = self._current
+        now_wall, now_busy, now_calls = self._mark()
+        for samples, value in ((self.wall, now_wall - wall), (self.modeled, now_busy - busy),
+                               (self.calls, now_calls - calls)):
+            if kind not in samples:
+                samples[kind] = Histogram()
+            samples[kind].add(value)
+        self._current = None
+
+    def summary(self):
+        actions = {}
+        for kind in sorted(self.counts):
+            wall = self.wall[kind].summary()
+            modeled = self.modeled[kind].summary()
+            calls = self.calls[kind]
+            actions[kind] = {
+                "count": self.counts[kind],
+                "wall_p50_ms": wall["p50_ms"],
+                "wall_p95_ms": wall["p95_ms"],
+                "modeled_p50_ms": modeled["p50_ms"],
+                "modeled_p95_ms": modeled["p95_ms"],
+                "calls_per_action": calls.total / calls.count,
+            }
+        return actions
+
+
+def replay(header, events, costs=None, settle=1.0):
+    """Run CodeFlowVision against a simulated desktop through a recorded session.
+
+    Returns throughput, per-action latency (wall and modeled Win32 time),
+    per-method timings and Win32 call counts.
+    """
+    from transparency_manager import CodeFlowVision
+    desktop = build_desktop(header, costs)
+    meter = ActionMeter(desktop)
+    profiler = Profiler(enabled=True)
+    with tempfile.TemporaryDirectory() as directory:
+        config_file = os.path.join(directory, "config.json")
+        with open(config_file, "w", encoding="utf-8") as f:
+            json.dump(dict(header.get("config", {}), control_server=False), f)
+        app = CodeFlowVision(profiler=profiler, backend=desktop, config_file=config_file)
+
+        start = desktop.clock()
+        meter.begin("startup")
+        for event in events:
+            def dispatch(event=event):
+                meter.begin(event["type"])
+                apply_event(desktop, app, event)
+            desktop.source.post(start + event["t"], dispatch)
+        end = start + (events[-1]["t"] if events else 0.0) + settle
+        app.loop.call_later(end - start, app.loop.stop)
+
+        started = time.perf_counter()
+        app.run()
+        wall = time.perf_counter() - started
+        meter.end()
+
+    report = profiler.report()
+    return {
+        "events": len(events),
+        "simulated_s": desktop.clock() - start,
+        "wall_s": wall,
+        "events_per_s": len(events) / wall if wall > 0 else 0.0,
+        "actions": meter.summary(),
+        "methods_ms": {name: {"count": timer["count"], "p50": timer["p50_ms"], "p95": timer["p95_ms"]}
+                       for name, timer in report["timers"].items()},
+        "win32_calls": dict(sorted(desktop.calls.items())),
+        "modeled_win32_ms": desktop.busy * 1000,
+        "journal": app.journal.stats(),
+    }
+
+
+def regressions(result, baseline, tolerance=0.05):
+    """Describe every Win32 call count in result that grew by more than tolerance over baseline.
+
+    Call counts of a replay are deterministic, so any growth is a change in
+    behavior rather than noise.
+    """
+    found = []
+
+    def check(name, value, before):
+        if value > before * (1 + tolerance) and value - before >= 1e-9:
+            found.append(f"{name}: {before:g} -> {value:g}")
+
+    for name, count in result["win32_calls"].items():
+        check(name, count, baseline["win32_calls"].get(name, 0))
+    for kind, action in result["actions"].items():
+        before = baseline["actions"].get(kind)
+        if before is not None:
+            check(f"{kind} calls per action", action["calls_per_action"], before["calls_per_action"])
+    return found
@@ -0,0 +1,405 @@
+"""
+In-memory desktop for running CodeFlowVision without Windows.
+SimulatedDesktop implements the window_backend interface over a model of
+windows (title, class, owning process, rectangle, visibility, extended style,
+alpha, owner window, cloaked and minimized state), the z-order, processes and monitors. Every backend
+call is counted under its pywin32 name and advances a SimulatedClock by a
+modeled cost, so a replayed session reports the same call counts a profiled
+real session would, plus an estimate of the time spent in them.
+
+Scenario methods (create_window, destroy_window, focus, minimize, ...) change
+the desktop the way another program or the user would, emitting the same
+window events the WinEvent hooks deliver. They are free and not counted.
+"""
+import itertools
+from collections import Counter
+
+from event_loop import SimulatedClock, SimulatedMessageSource
+from layout import Monitor, Rect
+from window_events import CREATE, DESTROY, FOREGROUND, MINIMIZE, MOVED, RESTORE, ScriptedEventSource
+from window_state import WS_EX_LAYERED
+
+# Rough per-call costs in seconds, in line with profiles of a busy Windows 10
+# desktop. Calls that send a message to the window's thread (GetWindowText,
+# ShowWindow, SetWindowPos...) or reach into another process (psutil) cost
+# far more than reads of the window's own state.
+DEFAULT_COSTS = {
+    "win32gui.EnumWindows": 20e-6,
+    "win32gui.GetWindowText": 8e-6,
+    "win32gui.GetClassName": 1e-6,
+    "win32gui.GetWindowPlacement": 1e-6,
+    "win32gui.GetWindowRect": 1e-6,
+    "win32gui.GetWindow": 0.2e-6,
+    "win32gui.IsWindow": 0.2e-6,
+    "win32gui.IsWindowVisible": 0.2e-6,
+    "win32gui.IsIconic": 0.2e-6,
+    "win32gui.IsZoomed": 0.2e-6,
+    "win32gui.GetWindowLong": 0.3e-6,
+    "win32gui.SetWindowLong": 40e-6,
+    "win32gui.GetLayeredWindowAttributes": 0.5e-6,
+    "win32gui.SetLayeredWindowAttributes": 60e-6,
+    "win32gui.SetWindowPos": 120e-6,
+    "win32gui.ShowWindow": 250e-6,
+    "win32gui.SetForegroundWindow": 150e-6,
+    "win32gui.BeginDeferWindowPos": 1e-6,
+    "win32gui.DeferWindowPos": 2e-6,
+    "win32gui.EndDeferWindowPos": 200e-6,
+    "win32process.GetWindowThreadProcessId": 0.3e-6,
+    "win32api.EnumDisplayMonitors": 10e-6,
+    "dwmapi.DwmGetWindowAttribute": 1e-6,
+    "psutil.create_time": 15e-6,
+    "psutil.name": 25e-6,
+    "psutil.ppid": 15e-6,
+}
+
+# Additional cost of EnumWindows per window enumerated
+ENUM_COST_PER_WINDOW = 0.1e-6
+
+
+class SimulatedWindowError(OSError):
+    """Raised by calls on a window that does not exist, like pywintypes.error."""
+
+
+class SimulatedWindow:
+    """State of one top-level window."""
+
+    __slots__ = ("hwnd", "title", "class_name", "pid", "rect", "visible", "child",
+                 "exstyle", "alpha", "owner", "cloaked", "minimized", "maximized")
+
+    def __init__(self, hwnd, title, class_name, pid, rect, visible=True, child=False,
+                 exstyle=0, owner=0, cloaked=False):
+        self.hwnd = hwnd
+        self.title = title
+        self.class_name = class_name
+        self.pid = pid
+        self.rect = rect
+        self.visible = visible
+        self.child = child
+        self.exstyle = exstyle
+        self.alpha = None  # unset until the window is layered and given one
+        self.owner = owner
+        self.cloaked = cloaked  # hidden by DWM, e.g. on another virtual desktop
+        self.minimized = False
+        self.maximized = False
+
+    def describe(self):
+        """JSON-serializable attributes, as recorded in traces."""
+        return {
+            "hwnd": self.hwnd,
+            "title": self.title,
+            "class_name": self.class_name,
+            "pid": self.pid,
+            "rect": list(self.rect),
+            "visible": self.visible,
+            "child": self.child,
+            "exstyle": self.exstyle,
+            "owner": self.owner,
+            "cloaked": self.cloaked,
+        }
+
+
+class SimulatedHotkeys:
+    """Hotkey bindings registered with the desktop; press() on the desktop triggers them."""
+
+    def __init__(self, desktop, bindings):
+        self.desktop = desktop
+        self.bindings = dict(bindings)
+
+    def stop(self):
+        if self.desktop.hotkeys is self:
+            self.desktop.hotkeys = None
+
+
+class SimulatedTray:
+    """Tray menu state: which entries are checked; select() picks one."""
+
+    def __init__(self, items, on_command, activate=None):
+        self.on_command = on_command
+        self.activate = activate
+        self.checked = {command: checked for _, command, checked in items if checked is not None}
+
+    def set_checked(self, command, checked):
+        self.checked[command] = checked
+
+    def select(self, command):
+        self.on_command(command)
+
+
+class SimulatedDesktop:
+    """A window system held in memory, implementing the window_backend interface.
+
+    costs overrides DEFAULT_COSTS by call name. calls counts every backend
+    call; busy is the total modeled time spent in them.
+    """
+
+    def __init__(self, monitors=None, costs=None, clock=None):
+        self.clock = clock or SimulatedClock()
+        self.error = SimulatedWindowError
+        self.monitor_list = list(monitors or [
+            Monitor(1, Rect(0, 0, 1920, 1080), Rect(0, 0, 1920, 1040), True, 96),
+        ])
+        self.costs = dict(DEFAULT_COSTS, **(costs or {}))
+        self.windows = {}
+        self.z_order = []  # hwnds, topmost first
+        self.processes = {}  # pid -> (name, ppid, create_time)
+        self.foreground = None
+        self.calls = Counter()
+        self.busy = 0.0
+        self.events = ScriptedEventSource(self.clock)
+        self.source = SimulatedMessageSource(self.clock)
+        self.hotkeys = None
+        self.tray = None
+        self._hwnds = itertools.count(0x10000, 2)
+
+    def _call(self, name, extra=0.0):
+        self.calls[name] += 1
+        cost = self.costs.get(name, 0.0) + extra
+        self.busy += cost
+        self.clock.advance(cost)
+
+    def _window(self, name, hwnd):
+        """Count a call on hwnd and return its window, raising error if it does not exist."""
+        self._call(name)
+        window = self.windows.get(hwnd)
+        if window is None:
+            raise SimulatedWindowError(f"{name}: invalid window handle {hwnd}")
+        return window
+
+    def _emit(self, kind, hwnd):
+        # WinEvent callbacks arrive as messages, so they wake the loop
+        self.events.emit(kind, hwnd)
+        self.source.wake()
+
+    def stats(self):
+        return {
+            "windows": len(self.windows),
+            "calls": dict(sorted(self.calls.items())),
+            "modeled_ms": self.busy * 1000,
+        }
+
+    # Scenario
+
+    def add_process(self, pid, name, ppid=0, create_time=None):
+        self.processes[pid] = (name.lower(), ppid, create_time if create_time is not None else self.clock())
+
+    def end_process(self, pid):
+        self.processes.pop(pid, None)
+
+    def create_window(self, title, pid, class_name="", rect=None, visible=True, child=False, hwnd=None,
+                      exstyle=0, owner=0, cloaked=False):
+        """Open a window on top of the z-order and return its handle."""
+        hwnd = hwnd if hwnd is not None else next(self._hwnds)
+        rect = Rect(*rect) if rect is not None else Rect(100, 100, 1300, 900)
+        self.windows[hwnd] = SimulatedWindow(hwnd, title, class_name, pid, rect, visible, child,
+                                             exstyle, owner, cloaked)
+        self.z_order.insert(0, hwnd)
+        if visible:
+            self._emit(CREATE, hwnd)
+        return hwnd
+
+    def destroy_window(self, hwnd):
+        if self.windows.pop(hwnd, None) is None:
+            return
+        self.z_order.remove(hwnd)
+        if self.foreground == hwnd:
+            self.foreground = None
+        self._emit(DESTROY, hwnd)
+
+    def focus(self, hwnd):
+        """The user activates hwnd: it is restored if needed, raised and made the foreground window."""
+        window = self.windows.get(hwnd)
+        if window is None:
+            return
+        if window.minimized:
+            window.minimized = False
+            self._emit(RESTORE, hwnd)
+        self._raise(hwnd)
+        self.foreground = hwnd
+        self._emit(FOREGROUND, hwnd)
+
+    def minimize(self, hwnd):
+        window = self.windows.get(hwnd)
+        if window is None or window.minimized:
+            return
+        window.minimized = True
+        self._emit(MINIMIZE, hwnd)
+
+    def unminimize(self, hwnd):
+        window = self.windows.get(hwnd)
+        if window is None or not window.minimized:
+            return
+        window.minimized = False
+        self._emit(RESTORE, hwnd)
+
+    def move_window(self, hwnd, rect):
+        """The user finishes moving or resizing hwnd."""
+        window = self.windows.get(hwnd)
+        if window is None:
+            return
+        window.rect = Rect(*rect)
+        self._emit(MOVED, hwnd)
+
+    def set_cloaked(self, hwnd, cloaked):
+        if hwnd in self.windows:
+            self.windows[hwnd].cloaked = cloaked
+
+    def set_title(self, hwnd, title):
+        if hwnd in self.windows:
+            self.windows[hwnd].title = title
+
+    def press(self, combination):
+        """Press a hotkey combination; return False if nothing is bound to it."""
+        callback = self.hotkeys.bindings.get(combination) if self.hotkeys else None
+        if callback is None:
+            return False
+        callback()
+        return True
+
+    def _raise(self, hwnd):
+        self.z_order.remove(hwnd)
+        self.z_order.insert(0, hwnd)
+
+    # Backend interface
+
+    def message_source(self):
+        return self.source
+
+    def event_source(self):
+        return self.events
+
+    def process_table(self):
+        return self
+
+    def instrument(self, profiler):
+        profiler.add_source("desktop", self.stats)
+
+    def enum_windows(self):
+        self._call("win32gui.EnumWindows", ENUM_COST_PER_WINDOW * len(self.z_order))
+        return list(self.z_order)
+
+    def is_window(self, hwnd):
+        self._call("win32gui.IsWindow")
+        return hwnd in self.windows
+
+    def is_visible(self, hwnd):
+        self._call("win32gui.IsWindowVisible")
+        window = self.windows.get(hwnd)
+        return window is not None and window.visible
+
+    def is_child(self, hwnd):
+        return self._window("win32gui.GetWindowLong", hwnd).child
+
+    def is_iconic(self, hwnd):
+        self._call("win32gui.IsIconic")
+        window = self.windows.get(hwnd)
+        return window is not None and window.minimized
+
+    def window_text(self, hwnd):
+        self._call("win32gui.GetWindowText")
+        window = self.windows.get(hwnd)
+        return window.title if window is not None else ""
+
+    def class_name(self, hwnd):
+        return self._window("win32gui.GetClassName", hwnd).class_name
+
+    def restored_size(self, hwnd):
+        rect = self._window("win32gui.GetWindowPlacement", hwnd).rect
+        return rect.width, rect.height
+
+    def window_rect(self, hwnd):
+        return self._window("win32gui.GetWindowRect", hwnd).rect
+
+    def owner(self, hwnd):
+        return self._window("win32gui.GetWindow", hwnd).owner
+
+    def is_cloaked(self, hwnd):
+        return self._window("dwmapi.DwmGetWindowAttribute", hwnd).cloaked
+
+    def window_pid(self, hwnd):
+        return self._window("win32process.GetWindowThreadProcessId", hwnd).pid
+
+    def get_exstyle(self, hwnd):
+        return self._window("win32gui.GetWindowLong", hwnd).exstyle
+
+    def set_exstyle(self, hwnd, style):
+        self._window("win32gui.SetWindowLong", hwnd).exstyle = style
+
+    def get_alpha(self, hwnd):
+        window = self._window("win32gui.GetLayeredWindowAttributes", hwnd)
+        if not window.exstyle & WS_EX_LAYERED:
+            raise SimulatedWindowError(f"GetLayeredWindowAttributes: window {hwnd} is not layered")
+        return window.alpha if window.alpha is not None else 255
+
+    def set_alpha(self, hwnd, alpha):
+        window = self._window("win32gui.SetLayeredWindowAttributes", hwnd)
+        if not window.exstyle & WS_EX_LAYERED:
+            raise SimulatedWindowError(f"SetLayeredWindowAttributes: window {hwnd} is not layered")
+        window.alpha = alpha
+
+    def restore(self, hwnd):
+        window = self._window("win32gui.ShowWindow", hwnd)
+        window.maximized = False
+        if window.minimized:
+            window.minimized = False
+            self._emit(RESTORE, hwnd)
+
+    def send_to_bottom(self, hwnd):
+        self._window("win32gui.SetWindowPos", hwnd)
+        self.z_order.remove(hwnd)
+        self.z_order.append(hwnd)
+
+    def bring_to_top(self, hwnd):
+        self._window("win32gui.SetWindowPos", hwnd)
+        self._raise(hwnd)
+
+    def set_foreground(self, hwnd):
+        self._window("win32gui.SetForegroundWindow", hwnd)
+        self.focus(hwnd)
+
+    def enable_dpi_awareness(self):
+        pass
+
+    def monitors(self):
+        self._call("win32api.EnumDisplayMonitors")
+        return list(self.monitor_list)
+
+    def apply_layout(self, placements, exact=False):
+        if not placements:
+            return
+        for hwnd, _ in placements:
+            window = self.windows.get(hwnd)
+            self._call("win32gui.IsIconic")
+            self._call("win32gui.IsZoomed")
+            if window is not None and (window.minimized or window.maximized):
+                self.restore(hwnd)
+        self._call("win32gui.BeginDeferWindowPos")
+        for hwnd, rect in placements:
+            self._window("win32gui.DeferWindowPos", hwnd).rect = rect
+            if not exact:
+                self._raise(hwnd)  # HWND_TOP
+        self._call("win32gui.EndDeferWindowPos")
+
+    def listen_hotkeys(self, bindings):
+        self.hotkeys = SimulatedHotkeys(self, bindings)
+        return self.hotkeys
+
+    def create_tray(self, items, on_command, activate=None):
+        self.tray = SimulatedTray(items, on_command, activate)
+        return self.tray
+
+    # Process table (ProcessNameCache interface)
+
+    def create_time(self, pid):
+        self._call("psutil.create_time")
+        process = self.processes.get(pid)
+        return process[2] if process else None
+
+    def name(self, pid):
+        self._call("psutil.name")
+        process = self.processes.get(pid)
+        return process[0] if process else None
+
+    def ppid(self, pid):
+        self._call("psutil.ppid")
+        process = self.processes.get(pid)
+        return process[1] if process else None
@@ -1,23 +1,33 @@
-import os
-import json
 import logging
-from tkinter import Tk, Toplevel, Label, Entry, Button, messagebox
-from pynput import keyboard
-import win32gui
-import win32con
-import win32api
-import win32process
-import psutil
-from collections import defaultdict
-import sys
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import os
+from process_cache import ProcessNameCache
+from animation import EASINGS, FadeScheduler
+from command_bus import CommandBus
+from config_service import ConfigError, ConfigService, config_path
+from control_server import ControlServer
+from event_loop import EventLoop
+from focus_follow import FocusFollower
+from instrumentation import PhaseTimer, Profiler
+from log_pipeline import Deferred, setup_logging
+from session_journal import SessionJournal
+from layout import LAYOUT_MODES, choose_monitor, compute_layout
+from window_state import LayeredWindowState
+from window_events import WindowTracker, CREATE, DESTROY, FOREGROUND, MINIMIZE, MOVED, RESTORE
+from window_ranking import DEFAULT_WEIGHTS, WindowRanker
+from window_registry import WindowRegistry
+from window_rules import compile_rules
 
 # Default configuration
 DEFAULT_CONFIG = {
     "ide_process_names": ["code.exe", "pycharm64.exe", "eclipse.exe", "sublime_text.exe", "atom.exe", "webstorm64.exe", "cursor.exe"],
     "browser_process_names": ["chrome.exe", "firefox.exe", "msedge.exe", "opera.exe", "brave.exe", "vivaldi.exe", "safari.exe", "iexplore.exe"],
+    # Window-matching rules, tried in order before the process-name lists above (see window_rules.py)
+    "rules": [
+        {"exclude": True, "title": "^DevTools"},  # Browser/Electron developer tools
+        {"exclude": True, "max_width": 399},  # Popups, tooltips and extension panels
+        {"exclude": True, "max_height": 299},
+        {"role": "ide", "class": ["SunAwtFrame"], "title": " \u2013 "}  # JetBrains IDEs ("project - file" with an en dash)
+    ],
     "current_preset": "dynamic",
     "presets": {
         "dynamic": {"active": 160, "background": 255},  # Active (top) transparent, background (behind) opaque
@@ -26,133 +36,530 @@ DEFAULT_CONFIG = {
         "presentation": {"ide": 255, "browser": 64}
     },
     "clickthrough_enabled": False,
+    # Named groups of windows to manage: how many of the topmost windows of each role
+    "groups": {
+        "default": {"ide": 1, "browser": 1}
+    },
+    "active_group": "default",
+    # How candidate windows are ranked for groups: score contributions for a window's
+    # share of the screen, having been focused, and being minimized, owned by another
+    # window, a tool window or cloaked (see window_ranking.py)
+    "ranking": dict(DEFAULT_WEIGHTS),
+    # Reset-layout arrangement: mode is split, stacked or per-monitor; ratios size the split
+    # columns/rows (e.g. [2, 1]); monitor is "current", "primary" or a monitor index
+    "layout": {"mode": "split", "ratios": [], "monitor": "current", "gap": 0},
+    # Make the focused group window the active one; focus changes closer together
+    # than focus_debounce_ms are coalesced into the last one
+    "focus_follow": True,
+    "focus_debounce_ms": 40,
+    # Accept commands from scripts over a local named pipe (see control_server.py)
+    "control_server": True,
     "hotkeys": {
         "toggle_transparency": "<ctrl>+<alt>+<f7>",
         "swap_active": "<alt>+<f1>",  # Changed to <Alt>+<F1>
         "reset_layout": "<ctrl>+<alt>+<f8>",
         "next_preset": "<ctrl>+<alt>+<f9>",
+        "next_group": "<ctrl>+<alt>+<f10>",
         "exit": "<ctrl>+<alt>+<f12>"
     },
+    "command_debounce_ms": 30,
+    "fade_duration_ms": 150,
+    "fade_fps": 60,
+    "fade_easing": "ease-in-out",
     "performance_mode": True,
     "auto_start": False
 }
 
-# Helper function to get process name from window handle
-def get_process_name(hwnd):
+# Methods timed when profiling is enabled (the backend counts its own calls)
+PROFILED_METHODS = [
+    "detect_windows", "set_transparency", "apply_transparency",
+    "swap_active_window", "reset_layout", "follow_focus", "get_process_name"
+]
+
+# Tray menu entries: (label, command posted when chosen)
+TRAY_MENU = [
+    ("Settings", "settings"),
+    ("Toggle Transparency", "toggle_transparency"),
+    ("Redetect Windows", "redetect"),
+    ("Focus Follow", "toggle_focus_follow"),
+    ("Exit", "exit"),
+]
+
+# Config values whose type differs from the default's (a monitor index instead of "current")
+UNTYPED_CONFIG_KEYS = ("layout.monitor",)
+
+def validate_config(config):
+    """Raise ConfigError for values the application cannot use."""
+    for name, preset in config["presets"].items():
+        for key, value in preset.items():
+            if key == "group":
+                continue
+            if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 255:
+                raise ConfigError(f"presets.{name}.{key} should be an opacity from 0 to 255")
+    if config["current_preset"] not in config["presets"]:
+        raise ConfigError(f"current_preset {config['current_preset']!r} is not one of the presets")
+    if not config["groups"]:
+        raise ConfigError("groups needs at least one group")
+    for name, spec in config["groups"].items():
+        if not all(isinstance(count, int) and count >= 0 for count in spec.values()):
+            raise ConfigError(f"groups.{name} should map roles to window counts")
+    if config["active_group"] not in config["groups"]:
+        raise ConfigError(f"active_group {config['active_group']!r} is not one of the groups")
+    if config["layout"]["mode"] not in LAYOUT_MODES:
+        raise ConfigError(f"layout.mode should be one of {', '.join(LAYOUT_MODES)}")
+    if config["fade_easing"] not in EASINGS:
+        raise ConfigError(f"fade_easing should be one of {', '.join(EASINGS)}")
+    if config["fade_fps"] <= 0:
+        raise ConfigError("fade_fps should be positive")
     try:
-        _, pid = win32process.GetWindowThreadProcessId(hwnd)
-        process = psutil.Process(pid)
-        return process.name().lower()
-    except (psutil.NoSuchProcess, psutil.AccessDenied):
-        return None
+        from pynput import keyboard
+    except ImportError:
+        return  # no keyboard backend here (e.g. a headless replay); hotkeys are not used
+    for action, combination in config["hotkeys"].items():
+        try:
+            keyboard.HotKey.parse(combination)
+        except (ValueError, TypeError) as e:
+            raise ConfigError(f"hotkeys.{action}: invalid key combination {combination!r}: {e}")
 
 class CodeFlowVision:
-    def __init__(self):
-        """Initialize the CodeFlowVision application."""
-        self.config = self.load_config()
+    def __init__(self, profiler=None, startup=None, backend=None, config_file=None):
+        """Bring up configuration, the tray icon and hotkeys.
+
+        Window detection runs on the first event-loop iteration and Tk is only
+        created when a dialog is needed, so the tray icon appears as early as
+        possible. startup is a PhaseTimer that records each stage. backend is
+        the window system (see window_backend.py), the real desktop by default.
+        """
+        self.startup = startup or PhaseTimer()
+        self.exit_after_startup = False
+        if backend is None:
+            from window_backend import Win32Backend
+            backend = Win32Backend()
+        self.backend = backend
+        # Shared process-name cache; one cross-process lookup per process per detection pass
+        self.process_cache = ProcessNameCache(backend.process_table())
+        self.profiler = profiler or Profiler()
+        if self.profiler.enabled:
+            self.setup_profiling()
+        self.config_service = ConfigService(
+            config_file or config_path(), DEFAULT_CONFIG, validate=validate_config, untyped=UNTYPED_CONFIG_KEYS
+        )
+        self.config_service.listeners.append(self.on_config_reload)
+        # Original state of every window we change, so it can be put back on exit or after a crash
+        self.journal = SessionJournal(
+            os.path.join(os.path.dirname(self.config_service.path), "session.journal"), backend
+        )
+        self.window_rules = compile_rules(self.config)
+        self.startup.mark("config")
         self.ide_window = None
         self.browser_window = None
         self.active_window = None
+        self.group_windows = []  # members of the active group, in swap rotation order
+        self.managed_windows = set()  # windows we have applied transparency to
         self.transparency_enabled = False
         self.hotkey_listener = None
-        self.tray_hwnd = None
-        self.root = Tk()
-        self.root.withdraw()  # Hide the main Tkinter window
-        self.detect_windows()
-        if self.ide_window and self.browser_window:
-            self.active_window = self.ide_window
-        self.setup_hotkeys()
+        self.tray = None
+        self.trace = None  # TraceRecorder, when recording the session
+        clock = backend.clock
+        self.command_bus = CommandBus(debounce=self.config["command_debounce_ms"] / 1000, clock=clock)
+        backend.enable_dpi_awareness()
+        self.root = None  # hidden Tk root, created by ensure_tk() on first use
+        self.loop = EventLoop(backend.message_source(), clock=clock)
+        self.command_bus.on_post = self.loop.wake
+        self.config_service.wake = self.loop.wake
+        self.window_state = LayeredWindowState(
+            backend.get_exstyle, backend.set_exstyle, backend.set_alpha, on_adopt=self.adopt_window
+        )
+        self.fader = FadeScheduler(
+            self.apply_fade_frame,
+            clock=clock,
+            duration=self.config["fade_duration_ms"] / 1000,
+            fps=self.config["fade_fps"],
+            easing=self.config["fade_easing"]
+        )
+        self.window_registry = WindowRegistry()
+        self.ranker = WindowRanker(backend, self.config["ranking"])
+        self.window_tracker = WindowTracker(
+            backend.event_source(), self.window_registry, self.classify_window, clock=clock
+        )
+        self.window_tracker.listeners.append(self.on_window_event)
+        self.focus_follower = FocusFollower(
+            lambda hwnd: hwnd in self.window_registry,
+            self.follow_focus,
+            debounce=self.config["focus_debounce_ms"] / 1000,
+            clock=clock
+        )
+        self.focus_follower.enabled = self.config["focus_follow"]
+        self.window_tracker.focus_listeners.append(
+            lambda event, role: self.focus_follower.note(event.hwnd, event.timestamp)
+        )
+        self.loop.add_poller(self.window_tracker.process)
+        self.loop.add_poller(self.config_service.poll, self.config_service.time_until_ready)
+        self.loop.add_poller(self.focus_follower.flush, self.focus_follower.time_until_ready)
+        self.loop.add_poller(self.process_commands, self.command_bus.time_until_ready)
+        self.loop.add_poller(self.run_fade_frame, self.fader.next_frame_delay)
+        self.control_server = ControlServer(self.control_handlers(), wake=self.loop.wake)
+        self.loop.add_poller(self.control_server.process)
+        self.startup.mark("engines")
         self.create_tray_icon()
-        config_path = os.path.join(os.getenv('APPDATA'), 'CodeFlowVision', 'config.json')
-        if not os.path.exists(config_path):
+        self.startup.mark("tray")
+        self.setup_hotkeys()
+        self.startup.mark("hotkeys")
+
+    def finish_startup(self):
+        """Second startup stage, run from the event loop once the tray icon and hotkeys are up."""
+        self.journal.recover()
+        self.startup.mark("restore")
+        self.detect_windows()
+        if len(self.group_windows) >= 2:
+            self.apply_transparency()
+        self.startup.mark("detection")
+        logging.info(f"Startup: {self.startup.summary()}")
+        if self.exit_after_startup:
+            self.loop.stop()
+            return
+        if not self.config_service.exists:
+            from tkinter import messagebox
+            self.ensure_tk()
             messagebox.showinfo(
                 "Welcome to CodeFlowVision",
                 "Press <Ctrl>+<Alt>+<F7> to toggle transparency\n"
                 "<Alt>+<F1> to swap active window\n"
                 "<Ctrl>+<Alt>+<F8> to reset layout\n"
                 "<Ctrl>+<Alt>+<F9> to cycle presets\n"
+                "<Ctrl>+<Alt>+<F10> to switch window group\n"
                 "<Ctrl>+<Alt>+<F12> to exit"
             )
 
-    def load_config(self):
-        """Load configuration from JSON file or use default."""
-        config_path = os.path.join(os.getenv('APPDATA'), 'CodeFlowVision', 'config.json')
-        if os.path.exists(config_path):
+    def ensure_tk(self):
+        """Return the hidden Tk root, creating it (and driving it from the event loop) on first use."""
+        if self.root is None:
+            from tkinter import Tk
+            self.root = Tk()
+            self.root.withdraw()  # Hide the main Tkinter window
+            self.loop.source.root = self.root
+        return self.root
+
+    def setup_profiling(self):
+        """Install timers and Win32 call counters."""
+        self.profiler.instrument(self, PROFILED_METHODS)
+        self.backend.instrument(self.profiler)
+        self.profiler.add_source("process_cache", self.process_cache.stats)
+        self.profiler.add_source("window_rules", lambda: self.window_rules.stats())
+        self.profiler.add_source("window_state", lambda: self.window_state.stats())
+        self.profiler.add_source("window_tracker", lambda: self.window_tracker.stats())
+        self.profiler.add_source("command_bus", lambda: self.command_bus.stats())
+        self.profiler.add_source("fader", lambda: self.fader.stats())
+        self.profiler.add_source("focus_follower", lambda: self.focus_follower.stats())
+        self.profiler.add_source("event_loop", lambda: self.loop.stats())
+        self.profiler.add_source("control_server", lambda: self.control_server.stats())
+        self.profiler.add_source("journal", lambda: self.journal.stats())
+        self.profiler.add_source("ranker", lambda: self.ranker.stats())
+
+    @property
+    def config(self):
+        """The current configuration snapshot (read-only; change it through config_service.update)."""
+        return self.config_service.snapshot
+
+    def on_config_reload(self, old, new, keys):
+        """Rebuild only what depends on the top-level config keys edited in config.json."""
+        if keys & {"rules", "ide_process_names", "browser_process_names"}:
+            self.window_rules = compile_rules(new)
+            self.detect_windows()
+            self.apply_transparency()
+        elif "ranking" in keys:
+            self.ranker.weights = dict(DEFAULT_WEIGHTS, **new["ranking"])
+            self.window_registry.set_scores({info.hwnd: self.ranker.score(info.hwnd) for info in self.window_registry})
+            self.update_group()
+            self.apply_transparency()
+        elif keys & {"groups", "active_group"}:
+            self.update_group()
+            self.apply_transparency()
+        elif keys & {"presets", "current_preset", "clickthrough_enabled"}:
+            self.apply_transparency()
+        if "hotkeys" in keys:
+            if self.hotkey_listener is not None:
+                self.hotkey_listener.stop()
+            self.setup_hotkeys()
+        if keys & {"fade_duration_ms", "fade_fps", "fade_easing"}:
+            self.fader.duration = new["fade_duration_ms"] / 1000
+            self.fader.frame_interval = 1.0 / new["fade_fps"]
+            self.fader.easing = EASINGS[new["fade_easing"]]
+        if keys & {"focus_follow", "focus_debounce_ms"}:
+            self.focus_follower.enabled = new["focus_follow"]
+            self.focus_follower.debounce = new["focus_debounce_ms"] / 1000
+            self.focus_follower.cancel()
+        if "command_debounce_ms" in keys:
+            self.command_bus.debounce = new["command_debounce_ms"] / 1000
+            self.command_bus.max_delay = self.command_bus.debounce * 4
+        if "control_server" in keys:
+            if new["control_server"]:
+                self.control_server.start()
+            else:
+                self.control_server.stop()
+
+    def window_title(self, hwnd):
+        """The title of hwnd as a log argument, read only if the record is written."""
+        return Deferred(self.backend.window_text, hwnd)
+
+    def get_process_name(self, hwnd, pid=None):
+        """Return the lower-cased name of the process owning hwnd, or None."""
+        if pid is None:
             try:
-                with open(config_path, 'r') as f:
-                    config = json.load(f)
-                # Ensure all default keys are present
-                for key in DEFAULT_CONFIG:
-                    if key not in config:
-                        config[key] = DEFAULT_CONFIG[key]
-                return config
-            except json.JSONDecodeError:
-                logging.error("Invalid config file, using defaults")
-        return DEFAULT_CONFIG.copy()
-
-    def save_config(self):
-        """Save current configuration to JSON file."""
-        config_path = os.path.join(os.getenv('APPDATA'), 'CodeFlowVision', 'config.json')
-        os.makedirs(os.path.dirname(config_path), exist_ok=True)
-        with open(config_path, 'w') as f:
-            json.dump(self.config, f, indent=4)
+                pid = self.backend.window_pid(hwnd)
+            except self.backend.error:
+                return None
+        if pid is None:
+            return None
+        return self.process_cache.get_name(pid)
+
+    def classify_window(self, hwnd):
+        """Return (role, process_name, pid) for a candidate IDE or browser window, or None."""
+        backend = self.backend
+        try:
+            if backend.is_child(hwnd):
+                return None
+            if not backend.is_visible(hwnd):
+                return None
+            title = backend.window_text(hwnd)
+            if not title:
+                return None
+            class_name = backend.class_name(hwnd)
+            known, verdict = self.window_rules.recall(hwnd, title)
+            if known:
+                return verdict
+            pid = backend.window_pid(hwnd)
+        except backend.error:
+            return None
+
+        def window_size():
+            # The restored rectangle, so minimized windows are not mistaken for popups
+            return backend.restored_size(hwnd)
+
+        process_name = self.get_process_name(hwnd, pid)
+        role = self.window_rules.match(
+            process_name, class_name, title,
+            size=window_size,
+            ancestors=lambda: self.process_cache.ancestors(pid) if pid else []
+        )
+        verdict = (role, process_name, pid) if role else None
+        self.window_rules.remember(hwnd, title, verdict)
+        return verdict
 
     def detect_windows(self):
-        """Detect IDE and browser windows."""
-        def enum_windows_callback(hwnd, _):
-            if win32gui.IsWindowVisible(hwnd) and win32gui.GetWindowText(hwnd):
-                process_name = get_process_name(hwnd)
-                if process_name in self.config["ide_process_names"] and self.ide_window is None:
-                    self.ide_window = hwnd
-                    logging.info(f"IDE detected: {process_name} (hwnd: {hwnd}, title: {win32gui.GetWindowText(hwnd)})")
-                elif process_name in self.config["browser_process_names"] and self.browser_window is None:
-                    self.browser_window = hwnd
-                    logging.info(f"Browser detected: {process_name} (hwnd: {hwnd}, title: {win32gui.GetWindowText(hwnd)})")
-
-        win32gui.EnumWindows(enum_windows_callback, None)
-        logging.info(f"Detected IDE window: {self.ide_window}, Browser window: {self.browser_window}")
-
-    def set_transparency(self, hwnd, opacity, clickthrough=False):
-        """Set transparency and click-through for a window."""
-        if not hwnd or not win32gui.IsWindow(hwnd):
+        """Detect IDE and browser windows with a single enumeration and refresh the registry."""
+        self.process_cache.begin_pass()
+        candidates = []
+        try:
+            hwnds = self.backend.enum_windows()
+            for hwnd in hwnds:
+                verdict = self.classify_window(hwnd)
+                if verdict is not None:
+                    candidates.append((hwnd,) + verdict)
+        finally:
+            # Windows classified between scans must see recycled PIDs
+            self.process_cache.end_pass()
+        seen = set(hwnds)
+        self.window_tracker.note_scan()
+        self.window_rules.retain(seen)
+        self.ranker.retain(seen)
+        # A scan re-reads every candidate's features; events keep them current afterwards
+        self.ranker.set_monitors(self.backend.monitors())
+        scores = {}
+        minimized = []
+        for hwnd, *_ in candidates:
+            scores[hwnd] = self.ranker.score(hwnd, refresh=True)
+            features = self.ranker.features(hwnd)
+            if features is not None and features.minimized:
+                minimized.append(hwnd)
+        self.window_registry.refresh(candidates, scores, minimized)
+        self.update_group()
+        for hwnd in self.group_windows:
+            info = self.window_registry.get(hwnd)
+            logging.info("%s detected: %s (hwnd: %s, title: %s)", info.role, info.process_name, hwnd, self.window_title(hwnd))
+        logging.info("Detected IDE window: %s, Browser window: %s", self.ide_window, self.browser_window)
+        logging.debug("Process cache: %s, candidates: %d", self.process_cache.stats(), len(self.window_registry))
+
+    def update_group(self):
+        """Resolve the active group from the registry; return True if its members changed."""
+        groups = self.config["groups"]
+        spec = groups.get(self.config["active_group"]) or next(iter(groups.values()))
+        members = self.window_registry.group(spec)
+        ides = members.get("ide", [])
+        browsers = members.get("browser", [])
+        self.ide_window = ides[0] if ides else None
+        self.browser_window = browsers[0] if browsers else None
+
+        # Interleave roles so swapping alternates between code and documentation
+        rotation = []
+        per_role = list(members.values())
+        for index in range(max((len(hwnds) for hwnds in per_role), default=0)):
+            rotation.extend(hwnds[index] for hwnds in per_role if index < len(hwnds))
+
+        changed = rotation != self.group_windows
+        self.group_windows = rotation
+        if self.active_window not in rotation:
+            self.active_window = rotation[0] if len(rotation) >= 2 else None
+        return changed
+
+    def set_active_group(self, name):
+        """Switch the managed group and re-apply transparency."""
+        if name not in self.config["groups"]:
+            logging.error(f"Unknown window group: {name}")
+            return
+        self.config_service.update({"active_group": name}, save=False)
+        self.update_group()
+        self.apply_transparency()
+        logging.info(f"Window group changed to {name}: {self.group_windows}")
+
+    def cycle_group(self, steps=1):
+        """Cycle through the configured window groups."""
+        group_names = list(self.config["groups"].keys())
+        current = self.config["active_group"]
+        current_index = group_names.index(current) if current in group_names else -1
+        self.set_active_group(group_names[(current_index + steps) % len(group_names)])
+
+    def on_window_event(self, event, role):
+        """Re-rank a candidate window that changed; update the active group when one appears or is destroyed."""
+        hwnd = event.hwnd
+        if event.kind == DESTROY:
+            self.window_rules.forget(hwnd)
+            self.window_state.invalidate(hwnd)
+            self.fader.cancel(hwnd)
+            self.managed_windows.discard(hwnd)
+            self.journal.release(hwnd)
+            self.ranker.forget(hwnd)
+        elif event.kind == CREATE:
+            self.rank_window(hwnd)
+        else:
+            if event.kind == FOREGROUND:
+                self.ranker.note_focus(hwnd)
+            elif event.kind in (MINIMIZE, RESTORE):
+                self.ranker.note_minimized(hwnd, event.kind == MINIMIZE)
+            elif event.kind == MOVED:
+                self.ranker.invalidate(hwnd)
+            # The new rank takes effect the next time the group is resolved
+            self.rank_window(hwnd)
+            return
+        if not self.update_group():
             return
+        logging.info("Group updated (%s %s): %s", event.kind, event.hwnd, self.group_windows)
+        if len(self.group_windows) >= 2:
+            self.apply_transparency()
+
+    def rank_window(self, hwnd):
+        """Score hwnd from its (cached) features and re-sort it in the registry."""
+        self.window_registry.set_score(hwnd, self.ranker.score(hwnd))
+
+    def follow_focus(self, hwnd):
+        """Make the focused candidate window the active one (focus-follow mode)."""
+        # Focusing a candidate outside the group raises it above the group's members
+        changed = hwnd not in self.group_windows and self.update_group()
+        if hwnd not in self.group_windows or (hwnd == self.active_window and not changed):
+            return
+        self.active_window = hwnd
+        if changed or (self.transparency_enabled and self.config["current_preset"] == "dynamic"):
+            self.apply_transparency()
+        logging.debug("Focus moved to %s, active window updated", self.window_title(hwnd))
+
+    def toggle_focus_follow(self):
+        """Turn focus-follow mode on or off and remember the choice."""
+        enabled = not self.config["focus_follow"]
+        self.config_service.update({"focus_follow": enabled})
+        self.focus_follower.enabled = enabled
+        self.focus_follower.cancel()
+        if self.tray is not None:
+            self.tray.set_checked("toggle_focus_follow", enabled)
+        logging.info(f"Focus follow {'enabled' if enabled else 'disabled'}")
+
+    def adopt_window(self, hwnd, exstyle):
+        """Journal a window's original extended style before we first change it."""
+        info = self.window_registry.get(hwnd)
+        self.journal.adopt(hwnd, exstyle, info.pid if info else None)
+
+    def restore_windows(self):
+        """Put every window we changed back the way it was; return how many were restored."""
+        self.fader.cancel()
+        restored = self.journal.restore()
+        self.window_state.invalidate()
+        self.managed_windows.clear()
+        logging.info(f"Restored {restored} windows")
+        return restored
+
+    def set_transparency(self, hwnd, opacity, clickthrough=False, animate=True):
+        """Set transparency and click-through for a window, fading the opacity if enabled."""
+        if not hwnd:
+            return
+        if not self.backend.is_window(hwnd):
+            self.window_state.invalidate(hwnd)
+            self.fader.cancel(hwnd)
+            return
+        opacity = int(opacity)
         try:
-            style = win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE)
-            new_style = style | win32con.WS_EX_LAYERED
-            if clickthrough:
-                new_style |= win32con.WS_EX_TRANSPARENT
+            if animate and self.fader.enabled:
+                # Apply the style now at the last applied alpha; the fader owns the alpha from here
+                state = self.window_state.get(hwnd)
+                applied = state.opacity if state else 255
+                self.window_state.apply(hwnd, applied, clickthrough)
+                self.fader.animate(hwnd, self.fader.current(hwnd, applied), opacity)
             else:
-                new_style &= ~win32con.WS_EX_TRANSPARENT
-            win32gui.SetWindowLong(hwnd, win32con.GWL_EXSTYLE, new_style)
-            win32gui.SetLayeredWindowAttributes(hwnd, 0, int(opacity), win32con.LWA_ALPHA)
+                self.fader.cancel(hwnd)
+                self.window_state.apply(hwnd, opacity, clickthrough)
+        except Exception as e:
+            self.window_state.invalidate(hwnd)
+            self.fader.cancel(hwnd)
+            logging.error("Failed to set transparency for window %s: %s", hwnd, e)
+
+    def apply_fade_frame(self, hwnd, opacity):
+        """Apply one animation frame's opacity to a window."""
+        state = self.window_state.get(hwnd)
+        if state is None or not self.backend.is_window(hwnd):
+            self.window_state.invalidate(hwnd)
+            self.fader.cancel(hwnd)
+            return
+        try:
+            self.window_state.apply(hwnd, opacity, state.clickthrough)
         except Exception as e:
-            logging.error(f"Failed to set transparency for window {hwnd}: {e}")
+            self.window_state.invalidate(hwnd)
+            self.fader.cancel(hwnd)
+            logging.error("Failed to animate transparency for window %s: %s", hwnd, e)
+
+    def run_fade_frame(self):
+        """Render an animation frame if one is due."""
+        delay = self.fader.next_frame_delay()
+        if delay is not None and delay <= 0:
+            self.fader.tick()
 
     def apply_transparency(self):
-        """Apply transparency based on current state and preset."""
-        if not self.ide_window or not self.browser_window:
+        """Apply transparency to the active group based on current state and preset."""
+        if len(self.group_windows) < 2:
             self.detect_windows()
-            if not self.ide_window or not self.browser_window:
+            if len(self.group_windows) < 2:
                 return
 
+        targets = {}
         if not self.transparency_enabled:
-            self.set_transparency(self.ide_window, 255, False)
-            self.set_transparency(self.browser_window, 255, False)
-            return
-
-        preset = self.config["presets"][self.config["current_preset"]]
-        if self.config["current_preset"] == "dynamic":
+            targets = {hwnd: (255, False) for hwnd in self.group_windows}
+        elif self.config["current_preset"] == "dynamic":
+            preset = self.config["presets"]["dynamic"]
             active_opacity = preset["active"]  # Transparent for top window
-            background_opacity = preset["background"]  # Opaque for behind window
-            if self.active_window == self.ide_window:
-                self.set_transparency(self.ide_window, active_opacity, False)
-                self.set_transparency(self.browser_window, background_opacity, self.config["clickthrough_enabled"])
-            else:
-                self.set_transparency(self.ide_window, background_opacity, self.config["clickthrough_enabled"])
-                self.set_transparency(self.browser_window, active_opacity, False)
+            background_opacity = preset["background"]  # Opaque for behind windows
+            for hwnd in self.group_windows:
+                if hwnd == self.active_window:
+                    targets[hwnd] = (active_opacity, False)
+                else:
+                    targets[hwnd] = (background_opacity, self.config["clickthrough_enabled"])
         else:
-            self.set_transparency(self.ide_window, preset["ide"], False)
-            self.set_transparency(self.browser_window, preset["browser"], False)
+            preset = self.config["presets"][self.config["current_preset"]]
+            for hwnd in self.group_windows:
+                targets[hwnd] = (preset.get(self.window_registry.role_of(hwnd), 255), False)
+
+        for hwnd, (opacity, clickthrough) in targets.items():
+            self.set_transparency(hwnd, opacity, clickthrough)
+        # Windows that left the group go back to fully opaque
+        for hwnd in self.managed_windows - targets.keys():
+            self.set_transparency(hwnd, 255, False)
+        self.managed_windows = set(targets)
 
     def toggle_transparency(self):
         """Toggle transparency on/off."""
@@ -161,173 +568,247 @@ class CodeFlowVision:
         state = "enabled" if self.transparency_enabled else "disabled"
         logging.info(f"Transparency {state}")
 
-    def swap_active_window(self):
-        """Swap the active window, make the top window transparent, and ensure it stays on top."""
-        if not self.ide_window or not self.browser_window:
-            logging.error("IDE or browser window not detected.")
+    def next_in_group(self, steps=1):
+        """Return the window steps after the active one in the group rotation."""
+        rotation = self.group_windows
+        index = rotation.index(self.active_window) if self.active_window in rotation else -1
+        return rotation[(index + steps) % len(rotation)]
+
+    def swap_active_window(self, steps=1):
+        """Rotate the active window steps places through the group, make it transparent, and ensure it stays on top."""
+        if len(self.group_windows) < 2:
+            logging.error("Not enough windows detected in the active group.")
             return
+        if steps % len(self.group_windows) == 0 and self.active_window in self.group_windows:
+            return  # whole turns of the rotation leave the same window active
 
         if self.config["current_preset"] == "dynamic":
-            # Swap the active window
-            self.active_window = self.browser_window if self.active_window == self.ide_window else self.ide_window
-            background_window = self.browser_window if self.active_window == self.ide_window else self.ide_window
+            # Rotate the active window; the previously active one goes behind
+            background_window = self.active_window if self.active_window in self.group_windows else self.group_windows[-1]
+            self.active_window = self.next_in_group(steps)
 
             # Apply transparency: active (top) is transparent, background (behind) is opaque
             self.apply_transparency()
 
             # If transparency is enabled, adjust the Z-order
             if self.transparency_enabled:
+                backend = self.backend
                 try:
                     # Restore windows if minimized
-                    if win32gui.IsIconic(self.active_window):
-                        win32gui.ShowWindow(self.active_window, win32con.SW_RESTORE)
-                    if win32gui.IsIconic(background_window):
-                        win32gui.ShowWindow(background_window, win32con.SW_RESTORE)
+                    if backend.is_iconic(self.active_window):
+                        backend.restore(self.active_window)
+                    if backend.is_iconic(background_window):
+                        backend.restore(background_window)
 
                     # Ensure the background (opaque) window is behind
-                    win32gui.SetWindowPos(
-                        background_window,
-                        win32con.HWND_BOTTOM,  # Push it to the bottom of the Z-order
-                        0, 0, 0, 0,
-                        win32con.SWP_NOMOVE | win32con.SWP_NOSIZE
-                    )
+                    backend.send_to_bottom(background_window)
                     # Bring the active (transparent) window to the top
-                    win32gui.SetWindowPos(
-                        self.active_window,
-                        win32con.HWND_TOP,  # Place it at the top of the Z-order
-                        0, 0, 0, 0,
-                        win32con.SWP_NOMOVE | win32con.SWP_NOSIZE
-                    )
+                    backend.bring_to_top(self.active_window)
                     logging.info(
-                        f"Z-order set: {win32gui.GetWindowText(self.active_window)} (transparent) "
-                        f"on top of {win32gui.GetWindowText(background_window)} (opaque)"
+                        "Z-order set: %s (transparent) on top of %s (opaque)",
+                        self.window_title(self.active_window), self.window_title(background_window)
                     )
                 except Exception as e:
                     logging.error(f"Failed to set Z-order: {e}")
 
-            logging.info(f"Active window swapped to: {win32gui.GetWindowText(self.active_window)}")
+            logging.info("Active window swapped to: %s", self.window_title(self.active_window))
         else:
             # Handle non-dynamic mode
-            target = self.browser_window if self.active_window == self.ide_window else self.ide_window
+            target = self.next_in_group(steps)
             try:
-                win32gui.SetForegroundWindow(target)
+                self.backend.set_foreground(target)
                 self.active_window = target
-                logging.info(f"Foreground set to: {win32gui.GetWindowText(target)}")
+                logging.info("Foreground set to: %s", self.window_title(target))
             except Exception as e:
                 logging.error(f"Failed to set foreground window: {e}")
 
-    def reset_layout(self):
-        """Reset windows to side-by-side layout."""
-        if not self.ide_window or not self.browser_window:
-            return
-        screen_width = win32api.GetSystemMetrics(win32con.SM_CXSCREEN)
-        screen_height = win32api.GetSystemMetrics(win32con.SM_CYSCREEN)
-        win32gui.SetWindowPos(self.ide_window, win32con.HWND_TOP, 0, 0, screen_width // 2, screen_height, 0)
-        win32gui.SetWindowPos(self.browser_window, win32con.HWND_TOP, screen_width // 2, 0, screen_width // 2, screen_height, 0)
-        logging.info("Window layout reset to side-by-side")
+    def reset_layout(self, overrides=None):
+        """Arrange the group's windows using the configured layout, in one batched move.
+
+        overrides replaces layout settings for this call only. Returns the number
+        of windows arranged.
+        """
+        if len(self.group_windows) < 2:
+            return 0
+        settings = dict(self.config["layout"], **(overrides or {}))
+        # IDE windows first (left or top), then browsers
+        hwnds = sorted(self.group_windows, key=lambda hwnd: self.window_registry.role_of(hwnd) != "ide")
+        try:
+            monitors = self.backend.monitors()
+            point = None
+            if self.active_window:
+                point = self.backend.window_rect(self.active_window).center()
+            monitor = choose_monitor(monitors, settings.get("monitor", "current"), point)
+            placements = compute_layout(settings["mode"], monitors, hwnds, settings.get("ratios"), monitor, settings.get("gap", 0))
+            for hwnd, _ in placements:
+                info = self.window_registry.get(hwnd)
+                self.journal.note_geometry(hwnd, info.pid if info else None)
+            self.backend.apply_layout(placements)
+            for hwnd, _ in placements:
+                self.journal.note_placement(hwnd)
+        except Exception as e:
+            logging.error(f"Failed to reset layout: {e}")
+            return 0
+        logging.info(f"Window layout reset to {settings['mode']} across {len(monitors)} monitor(s)")
+        return len(placements)
+
+    def set_preset(self, name):
+        """Switch to a transparency preset, and to its window group if it names one."""
+        if name not in self.config["presets"]:
+            raise KeyError(f"unknown preset: {name}")
+        changes = {"current_preset": name}
+        group = self.config["presets"][name].get("group")
+        if group in self.config["groups"] and group != self.config["active_group"]:
+            changes["active_group"] = group
+        self.config_service.update(changes, save=False)
+        if "active_group" in changes:
+            self.update_group()
+        self.apply_transparency()
+        logging.info(f"Preset changed to {name}")
 
-    def cycle_preset(self):
+    def cycle_preset(self, steps=1):
         """Cycle through transparency presets."""
         preset_names = list(self.config["presets"].keys())
         current_index = preset_names.index(self.config["current_preset"])
-        next_index = (current_index + 1) % len(preset_names)
-        self.config["current_preset"] = preset_names[next_index]
-        self.apply_transparency()
-        logging.info(f"Preset changed to {self.config['current_preset']}")
+        self.set_preset(preset_names[(current_index + steps) % len(preset_names)])
+
+    def control_handlers(self):
+        """Commands accepted by the control server, by name; each takes the request's command dict."""
+        def group(command):
+            if command["name"] not in self.config["groups"]:
+                raise KeyError(f"unknown group: {command['name']}")
+            self.set_active_group(command["name"])
+
+        def layout(command):
+            overrides = {key: command[key] for key in ("mode", "ratios", "monitor", "gap") if key in command}
+            mode = overrides.get("mode", self.config["layout"]["mode"])
+            if mode not in LAYOUT_MODES:
+                raise ValueError(f"unknown layout mode: {mode}")
+            return {"windows": self.reset_layout(overrides)}
+
+        def transparency(command):
+            if bool(command["enabled"]) != self.transparency_enabled:
+                self.toggle_transparency()
+
+        return {
+            "state": lambda command: self.describe_state(),
+            "preset": lambda command: self.set_preset(command["name"]),
+            "group": group,
+            "opacity": lambda command: {"windows": self.set_group_opacity(
+                command["opacity"], command.get("group"), command.get("role"))},
+            "layout": layout,
+            "transparency": transparency,
+            "swap": lambda command: self.swap_active_window(),
+            "redetect": lambda command: self.redetect_windows(),
+        }
+
+    def describe_state(self):
+        """Return a JSON-serializable summary of what is being managed."""
+        windows = []
+        for hwnd in self.group_windows:
+            info = self.window_registry.get(hwnd)
+            state = self.window_state.get(hwnd)
+            windows.append({
+                "hwnd": hwnd,
+                "role": info.role if info else None,
+                "process": info.process_name if info else None,
+                "opacity": state.opacity if state else 255,
+                "active": hwnd == self.active_window,
+            })
+        return {
+            "transparency_enabled": self.transparency_enabled,
+            "preset": self.config["current_preset"],
+            "group": self.config["active_group"],
+            "focus_follow": self.config["focus_follow"],
+            "windows": windows,
+        }
+
+    def set_group_opacity(self, opacity, group=None, role=None):
+        """Set one opacity on a group's windows (optionally one role) until the next preset change.
+
+        Returns the hwnds changed.
+        """
+        opacity = int(opacity)
+        if not 0 <= opacity <= 255:
+            raise ValueError("opacity must be between 0 and 255")
+        name = group or self.config["active_group"]
+        if name not in self.config["groups"]:
+            raise KeyError(f"unknown group: {name}")
+        members = self.window_registry.group(self.config["groups"][name])
+        hwnds = [hwnd for member_role, role_hwnds in members.items()
+                 if role is None or member_role == role for hwnd in role_hwnds]
+        for hwnd in hwnds:
+            self.set_transparency(hwnd, opacity)
+        self.managed_windows.update(hwnds)
+        return hwnds
 
     def setup_hotkeys(self):
         """Set up global hotkeys."""
         hotkeys = {k: lambda a=v: self.on_hotkey(a) for v, k in self.config["hotkeys"].items()}
         try:
-            self.hotkey_listener = keyboard.GlobalHotKeys(hotkeys)
-            self.hotkey_listener.start()
+            self.hotkey_listener = self.backend.listen_hotkeys(hotkeys)
             logging.info("Hotkeys set up successfully")
         except Exception as e:
             logging.error(f"Failed to set up hotkeys: {e}")
 
     def on_hotkey(self, action):
-        """Handle hotkey actions."""
+        """Handle hotkey actions (called on the hotkey listener thread)."""
+        if self.trace is not None:
+            self.trace.record("hotkey", action=action)
+        self.command_bus.post(action)
+
+    def execute_command(self, command):
+        """Run a coalesced command on the UI thread."""
         actions = {
             "toggle_transparency": self.toggle_transparency,
-            "swap_active": self.swap_active_window,
+            "swap_active": lambda: self.swap_active_window(command.count),
             "reset_layout": self.reset_layout,
-            "next_preset": self.cycle_preset,
-            "exit": self.root.quit
+            "next_preset": lambda: self.cycle_preset(command.count),
+            "next_group": lambda: self.cycle_group(command.count),
+            "toggle_focus_follow": self.toggle_focus_follow,
+            "redetect": self.redetect_windows,
+            "settings": self.show_settings,
+            "exit": self.loop.stop
         }
-        if action in actions:
-            actions[action]()
+        if command.count and command.name in actions:
+            actions[command.name]()
+        self.command_bus.complete(command)
+
+    def process_commands(self):
+        """Drain and execute pending commands."""
+        for command in self.command_bus.drain():
+            # One failing command must not drop the rest of the batch (e.g. a queued exit)
+            try:
+                self.execute_command(command)
+            except Exception as e:
+                logging.error(f"Command {command.name} failed: {e}", exc_info=True)
+
+    def record_trace(self, path):
+        """Record hotkeys and window events to a session trace (see session_trace.py); call before run()."""
+        from session_trace import RecordingEventSource, TraceRecorder
+        self.trace = TraceRecorder(path, self.backend, clock=self.backend.clock)
+        self.trace.start(self.config)
+        self.window_tracker.source = RecordingEventSource(self.window_tracker.source, self.trace)
+
+    def redetect_windows(self):
+        """Forget the tracked windows and detect them again."""
+        self.ide_window = self.browser_window = self.active_window = None
+        self.group_windows = []
+        self.detect_windows()
+        self.apply_transparency()
 
     def create_tray_icon(self):
         """Create system tray icon with context menu."""
-        wc = win32gui.WNDCLASS()
-        wc.hInstance = win32api.GetModuleHandle(None)
-        wc.lpszClassName = 'CodeFlowVisionTray'
-        wc.style = win32con.CS_VREDRAW | win32con.CS_HREDRAW
-        wc.hCursor = win32gui.LoadCursor(0, win32con.IDC_ARROW)
-        wc.hbrBackground = win32con.COLOR_WINDOW
-        wc.lpfnWndProc = self.tray_window_proc
-        try:
-            class_atom = win32gui.RegisterClass(wc)
-        except Exception as e:
-            logging.error(f"Failed to register tray class: {e}")
-            return
-
-        self.tray_hwnd = win32gui.CreateWindow(
-            class_atom, 'CodeFlowVisionTray', 0, 0, 0, 0, 0, 0, 0, wc.hInstance, None
-        )
-
-        # Load icon
-        try:
-            if getattr(sys, 'frozen', False):
-                # If running as exe
-                icon_path = os.path.join(sys._MEIPASS, 'icon.ico')
-            else:
-                # If running as script
-                icon_path = os.path.join(os.path.dirname(__file__), 'icon.ico')
-            hicon = win32gui.LoadIcon(0, icon_path)
-        except:
-            hicon = win32gui.LoadIcon(0, win32con.IDI_APPLICATION)
-        nid = (self.tray_hwnd, 0, win32gui.NIF_ICON | win32gui.NIF_MESSAGE | win32gui.NIF_TIP,
-               win32con.WM_USER + 20, hicon, 'CodeFlowVision')
-        try:
-            win32gui.Shell_NotifyIcon(win32gui.NIM_ADD, nid)
-        except Exception as e:
-            logging.error(f"Failed to add tray icon: {e}")
-
-        self.tray_menu = win32gui.CreatePopupMenu()
-        win32gui.AppendMenu(self.tray_menu, win32con.MF_STRING, 1001, 'Settings')
-        win32gui.AppendMenu(self.tray_menu, win32con.MF_STRING, 1002, 'Toggle Transparency')
-        win32gui.AppendMenu(self.tray_menu, win32con.MF_STRING, 1003, 'Redetect Windows')
-        win32gui.AppendMenu(self.tray_menu, win32con.MF_STRING, 1004, 'Exit')
-
-    def tray_window_proc(self, hwnd, msg, wparam, lparam):
-        """Handle tray icon messages."""
-        if msg == win32con.WM_USER + 20:
-            if lparam == win32con.WM_RBUTTONUP:
-                pos = win32gui.GetCursorPos()
-                win32gui.SetForegroundWindow(self.tray_hwnd)
-                win32gui.TrackPopupMenu(self.tray_menu, win32con.TPM_LEFTALIGN, pos[0], pos[1], 0, self.tray_hwnd, None)
-                win32gui.PostMessage(self.tray_hwnd, win32con.WM_NULL, 0, 0)
-            elif lparam == win32con.WM_LBUTTONDBLCLK:
-                self.show_settings()
-        elif msg == win32con.WM_COMMAND:
-            if wparam == 1001:
-                self.show_settings()
-            elif wparam == 1002:
-                self.toggle_transparency()
-            elif wparam == 1003:
-                self.ide_window = self.browser_window = self.active_window = None
-                self.detect_windows()
-                if self.ide_window and self.browser_window:
-                    self.active_window = self.ide_window
-                self.apply_transparency()
-            elif wparam == 1004:
-                self.root.quit()
-        return win32gui.DefWindowProc(hwnd, msg, wparam, lparam)
+        items = [
+            (label, command, self.config["focus_follow"] if command == "toggle_focus_follow" else None)
+            for label, command in TRAY_MENU
+        ]
+        self.tray = self.backend.create_tray(items, self.command_bus.post, activate="settings")
 
     def show_settings(self):
         """Show settings dialog."""
-        settings_window = Toplevel(self.root)
+        from tkinter import Toplevel, Label, Entry, Button, messagebox
+        settings_window = Toplevel(self.ensure_tk())
         settings_window.title("CodeFlowVision Settings")
         settings_window.geometry("300x200")
 
@@ -346,9 +827,7 @@ class CodeFlowVision:
                 active = int(active_opacity_entry.get())
                 background = int(background_opacity_entry.get())
                 if 0 <= active <= 255 and 0 <= background <= 255:
-                    self.config["presets"]["dynamic"]["active"] = active
-                    self.config["presets"]["dynamic"]["background"] = background
-                    self.save_config()
+                    self.config_service.update({"presets": {"dynamic": {"active": active, "background": background}}})
                     self.apply_transparency()
                     settings_window.destroy()
                 else:
@@ -360,27 +839,47 @@ class CodeFlowVision:
 
     def run(self):
         """Run the main application loop."""
-        def pump_messages():
-            win32gui.PumpWaitingMessages()
-            self.root.after(100, pump_messages)
-
         def check_windows():
-            if self.ide_window and not win32gui.IsWindow(self.ide_window):
-                self.ide_window = None
-            if self.browser_window and not win32gui.IsWindow(self.browser_window):
-                self.browser_window = None
-            if (self.ide_window is None or self.browser_window is None) and self.transparency_enabled:
+            # Fallback polling, only used when WinEvent hooks are unavailable
+            lost = [hwnd for hwnd in self.group_windows if not self.backend.is_window(hwnd)]
+            for hwnd in lost:
+                self.window_state.invalidate(hwnd)
+                self.managed_windows.discard(hwnd)
+                self.window_registry.remove(hwnd)
+                self.journal.release(hwnd)
+            if lost:
+                self.update_group()
+            if len(self.group_windows) < 2 and self.transparency_enabled:
                 self.detect_windows()
-                if self.ide_window and self.browser_window and self.active_window is None:
-                    self.active_window = self.ide_window
                 self.apply_transparency()
-            self.root.after(5000, check_windows)  # Check every 5 seconds
 
-        self.apply_transparency()
-        self.root.after(100, pump_messages)
-        self.root.after(5000, check_windows)
-        self.root.mainloop()
+        # Messages, Tk events, hotkey commands and timers all wake the same blocking loop
+        self.loop.source.dispatch = self.profiler.wrap("pump_messages", self.loop.source.dispatch)
+        check_windows = self.profiler.wrap("check_windows", check_windows)
+
+        self.loop.call_later(0, self.finish_startup)
+        if self.profiler.enabled:
+            self.loop.call_every(self.profiler.interval, self.profiler.write_report)
+        if not self.window_tracker.start():
+            logging.warning("Window event hooks unavailable, falling back to polling")
+            self.loop.call_every(5.0, check_windows)  # Check every 5 seconds
+        if self.config["control_server"]:
+            self.control_server.start()
+        self.config_service.watch()
+        try:
+            self.loop.run()
+        finally:
+            # Also on the way out of an error, so no window is left transparent or click-through
+            self.restore_windows()
+            self.journal.close()
+        self.control_server.stop()
+        self.window_tracker.stop()
+        self.config_service.flush()
+        if self.trace is not None:
+            self.trace.close()
+        self.profiler.write_report()
 
 if __name__ == "__main__":
+    setup_logging()
     app = CodeFlowVision()
     app.run()
\ No newline at end of file
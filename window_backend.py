@@ -0,0 +1,274 @@
+"""
+Window-system backend for CodeFlowVision.
+CodeFlowVision makes every window, process, monitor, hotkey and tray call
+through a backend object, so the same application code runs against the real
+desktop (Win32Backend) or against simulated_desktop.SimulatedDesktop on any
+platform.
+
+A backend provides:
+    clock, error                      time source and the exception window calls raise
+    message_source(), event_source()  for the event loop and the WindowTracker
+    process_table()                   for ProcessNameCache (None for the psutil default)
+    enum_windows()                    top-level windows, topmost first
+    is_window, is_visible, is_child, is_iconic, window_text, class_name,
+    restored_size, window_rect, window_pid, owner, is_cloaked
+    get_exstyle, set_exstyle, get_alpha, set_alpha
+    restore, send_to_bottom, bring_to_top, set_foreground
+    enable_dpi_awareness(), monitors(), apply_layout(placements, exact)
+    listen_hotkeys(bindings), create_tray(items, on_command, activate)
+    instrument(profiler)              count the backend's calls in profiler reports
+"""
+import logging
+import os
+import sys
+import time
+
+import layout
+from event_loop import Win32MessageSource
+from layout import Rect
+from window_events import WinEventHookSource
+
+# pywin32 functions counted when profiling is enabled, by module
+PROFILED_CALLS = {
+    "win32gui": [
+        "EnumWindows", "GetWindowText", "GetClassName", "GetWindowPlacement", "GetWindowRect", "GetWindow",
+        "IsWindow", "IsWindowVisible", "IsIconic", "IsZoomed",
+        "GetWindowLong", "SetWindowLong", "GetLayeredWindowAttributes", "SetLayeredWindowAttributes", "SetWindowPos",
+        "ShowWindow", "SetForegroundWindow", "PumpWaitingMessages",
+        "BeginDeferWindowPos", "DeferWindowPos", "EndDeferWindowPos"
+    ],
+    "win32process": ["GetWindowThreadProcessId"],
+    "win32api": ["EnumDisplayMonitors", "GetMonitorInfo"],
+}
+
+DWMWA_CLOAKED = 14
+
+
+class Win32Backend:
+    """The real desktop, through pywin32, WinEvent hooks, psutil and pynput."""
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self):
+        import win32api
+        import win32con
+        import win32gui
+        import win32process
+        self._api = win32api
+        self._con = win32con
+        self._gui = win32gui
+        self._process = win32process
+        self.error = win32gui.error
+
+    def message_source(self):
+        return Win32MessageSource()
+
+    def event_source(self):
+        return WinEventHookSource()
+
+    def process_table(self):
+        return None  # ProcessNameCache imports psutil on the first lookup
+
+    def instrument(self, profiler):
+        """Count pywin32 calls (the shims see every call made through this backend)."""
+        for module_name, names in PROFILED_CALLS.items():
+            module = sys.modules.get(module_name)
+            if module is not None:
+                profiler.count_calls(module, names, prefix=f"{module_name}.")
+
+    # Windows
+
+    def enum_windows(self):
+        hwnds = []
+        self._gui.EnumWindows(lambda hwnd, _: hwnds.append(hwnd), None)
+        return hwnds
+
+    def is_window(self, hwnd):
+        return bool(self._gui.IsWindow(hwnd))
+
+    def is_visible(self, hwnd):
+        return bool(self._gui.IsWindowVisible(hwnd))
+
+    def is_child(self, hwnd):
+        return bool(self._gui.GetWindowLong(hwnd, self._con.GWL_STYLE) & self._con.WS_CHILD)
+
+    def is_iconic(self, hwnd):
+        return bool(self._gui.IsIconic(hwnd))
+
+    def window_text(self, hwnd):
+        return self._gui.GetWindowText(hwnd)
+
+    def class_name(self, hwnd):
+        return self._gui.GetClassName(hwnd)
+
+    def restored_size(self, hwnd):
+        """(width, height) of the restored rectangle, so minimized windows keep their real size."""
+        left, top, right, bottom = self._gui.GetWindowPlacement(hwnd)[4]
+        return right - left, bottom - top
+
+    def window_rect(self, hwnd):
+        return Rect(*self._gui.GetWindowRect(hwnd))
+
+    def window_pid(self, hwnd):
+        _, pid = self._process.GetWindowThreadProcessId(hwnd)
+        return pid
+
+    def owner(self, hwnd):
+        """Handle of the window that owns hwnd (dialogs, popups), or 0."""
+        return self._gui.GetWindow(hwnd, self._con.GW_OWNER)
+
+    def is_cloaked(self, hwnd):
+        """True if DWM hides hwnd although it is visible (another virtual desktop, suspended apps)."""
+        import ctypes
+        from ctypes import wintypes
+        cloaked = wintypes.DWORD()
+        try:
+            result = ctypes.windll.dwmapi.DwmGetWindowAttribute(
+                wintypes.HWND(hwnd), DWMWA_CLOAKED, ctypes.byref(cloaked), ctypes.sizeof(cloaked))
+        except (AttributeError, OSError):
+            return False
+        return result == 0 and cloaked.value != 0
+
+    def get_exstyle(self, hwnd):
+        return self._gui.GetWindowLong(hwnd, self._con.GWL_EXSTYLE)
+
+    def set_exstyle(self, hwnd, style):
+        self._gui.SetWindowLong(hwnd, self._con.GWL_EXSTYLE, style)
+
+    def get_alpha(self, hwnd):
+        """Alpha of a layered window (255 if it is layered for a color key only)."""
+        _, alpha, flags = self._gui.GetLayeredWindowAttributes(hwnd)
+        return alpha if flags & self._con.LWA_ALPHA else 255
+
+    def set_alpha(self, hwnd, alpha):
+        self._gui.SetLayeredWindowAttributes(hwnd, 0, alpha, self._con.LWA_ALPHA)
+
+    def restore(self, hwnd):
+        self._gui.ShowWindow(hwnd, self._con.SW_RESTORE)
+
+    def _set_z(self, hwnd, after):
+        flags = self._con.SWP_NOMOVE | self._con.SWP_NOSIZE
+        self._gui.SetWindowPos(hwnd, after, 0, 0, 0, 0, flags)
+
+    def send_to_bottom(self, hwnd):
+        self._set_z(hwnd, self._con.HWND_BOTTOM)
+
+    def bring_to_top(self, hwnd):
+        self._set_z(hwnd, self._con.HWND_TOP)
+
+    def set_foreground(self, hwnd):
+        self._gui.SetForegroundWindow(hwnd)
+
+    # Monitors and layout
+
+    def enable_dpi_awareness(self):
+        layout.enable_dpi_awareness()
+
+    def monitors(self):
+        return layout.enum_monitors()
+
+    def apply_layout(self, placements, exact=False):
+        layout.apply_layout(placements, exact)
+
+    # Input and shell
+
+    def listen_hotkeys(self, bindings):
+        """Start a global hotkey listener for {combination: callback}; return it (it has stop())."""
+        from pynput import keyboard
+        listener = keyboard.GlobalHotKeys(bindings)
+        listener.start()
+        return listener
+
+    def create_tray(self, items, on_command, activate=None):
+        """Show the notification-area icon; return a Win32Tray, or None if it could not be created."""
+        tray = Win32Tray(items, on_command, activate)
+        return tray if tray.create() else None
+
+
+class Win32Tray:
+    """Notification-area icon with a popup menu.
+
+    items are (label, command, checked) tuples, checked being None for a plain
+    entry. on_command(command) is called with the chosen entry's command, or
+    with activate when the icon is double-clicked.
+    """
+
+    FIRST_ID = 1001
+
+    def __init__(self, items, on_command, activate=None):
+        import win32api
+        import win32con
+        import win32gui
+        self._api = win32api
+        self._con = win32con
+        self._gui = win32gui
+        self.items = items
+        self.on_command = on_command
+        self.activate = activate
+        self.message = win32con.WM_USER + 20
+        self.hwnd = None
+        self.menu = None
+        self._ids = {command: self.FIRST_ID + index for index, (_, command, _) in enumerate(items)}
+        self._commands = {menu_id: command for command, menu_id in self._ids.items()}
+
+    def create(self):
+        win32con, win32gui = self._con, self._gui
+        wc = win32gui.WNDCLASS()
+        wc.hInstance = self._api.GetModuleHandle(None)
+        wc.lpszClassName = 'CodeFlowVisionTray'
+        wc.style = win32con.CS_VREDRAW | win32con.CS_HREDRAW
+        wc.hCursor = win32gui.LoadCursor(0, win32con.IDC_ARROW)
+        wc.hbrBackground = win32con.COLOR_WINDOW
+        wc.lpfnWndProc = self.window_proc
+        try:
+            class_atom = win32gui.RegisterClass(wc)
+        except Exception as e:
+            logging.error(f"Failed to register tray class: {e}")
+            return False
+
+        self.hwnd = win32gui.CreateWindow(
+            class_atom, 'CodeFlowVisionTray', 0, 0, 0, 0, 0, 0, 0, wc.hInstance, None
+        )
+
+        # Load icon
+        try:
+            if getattr(sys, 'frozen', False):
+                # If running as exe
+                icon_path = os.path.join(sys._MEIPASS, 'icon.ico')
+            else:
+                # If running as script
+                icon_path = os.path.join(os.path.dirname(__file__), 'icon.ico')
+            hicon = win32gui.LoadIcon(0, icon_path)
+        except:
+            hicon = win32gui.LoadIcon(0, win32con.IDI_APPLICATION)
+        nid = (self.hwnd, 0, win32gui.NIF_ICON | win32gui.NIF_MESSAGE | win32gui.NIF_TIP,
+               self.message, hicon, 'CodeFlowVision')
+        try:
+            win32gui.Shell_NotifyIcon(win32gui.NIM_ADD, nid)
+        except Exception as e:
+            logging.error(f"Failed to add tray icon: {e}")
+
+        self.menu = win32gui.CreatePopupMenu()
+        for label, command, checked in self.items:
+            flags = win32con.MF_STRING | (win32con.MF_CHECKED if checked else 0)
+            win32gui.AppendMenu(self.menu, flags, self._ids[command], label)
+        return True
+
+    def set_checked(self, command, checked):
+        flags = self._con.MF_CHECKED if checked else self._con.MF_UNCHECKED
+        self._gui.CheckMenuItem(self.menu, self._ids[command], flags)
+
+    def window_proc(self, hwnd, msg, wparam, lparam):
+        """Handle tray icon messages."""
+        win32con, win32gui = self._con, self._gui
+        if msg == self.message:
+            if lparam == win32con.WM_RBUTTONUP:
+                pos = win32gui.GetCursorPos()
+                win32gui.SetForegroundWindow(self.hwnd)
+                win32gui.TrackPopupMenu(self.menu, win32con.TPM_LEFTALIGN, pos[0], pos[1], 0, self.hwnd, None)
+                win32gui.PostMessage(self.hwnd, win32con.WM_NULL, 0, 0)
+            elif lparam == win32con.WM_LBUTTONDBLCLK and self.activate:
+                self.on_command(self.activate)
+        elif msg == win32con.WM_COMMAND and wparam in self._commands:
+            self.on_command(self._commands[wparam])
+        return win32gui.DefWindowProc(hwnd, msg, wparam, lparam)
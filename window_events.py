@@ -0,0 +1,242 @@
+"""
+Window lifecycle events for CodeFlowVision.
+Event sources report create/destroy/foreground/minimize/move events, and a
+WindowTracker keeps an incremental registry of candidate IDE and browser
+windows up to date so lost windows can be replaced without rescanning.
+"""
+import logging
+import sys
+import time
+from collections import deque, namedtuple
+
+# Event kinds
+CREATE = "create"
+DESTROY = "destroy"
+FOREGROUND = "foreground"
+MINIMIZE = "minimize"
+RESTORE = "restore"
+MOVED = "moved"  # the user finished moving or resizing the window
+
+WindowEvent = namedtuple("WindowEvent", ["kind", "hwnd", "timestamp"])
+
+
+class ScriptedEventSource:
+    """In-memory event source; events are pushed by a script or test."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._pending = deque()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        return True
+
+    def stop(self):
+        self.running = False
+
+    def emit(self, kind, hwnd, timestamp=None):
+        """Queue an event, stamped with the source clock unless given."""
+        if timestamp is None:
+            timestamp = self.clock()
+        self._pending.append(WindowEvent(kind, hwnd, timestamp))
+
+    def poll(self):
+        """Return and clear all pending events."""
+        events = []
+        while self._pending:
+            events.append(self._pending.popleft())
+        return events
+
+
+class WinEventHookSource:
+    """Event source backed by out-of-context WinEvent hooks.
+
+    Hook callbacks are delivered on the thread that called start(), while it
+    pumps messages, so start() must be called from the UI thread.
+    """
+
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    EVENT_SYSTEM_MOVESIZEEND = 0x000B
+    EVENT_SYSTEM_MINIMIZESTART = 0x0016
+    EVENT_SYSTEM_MINIMIZEEND = 0x0017
+    EVENT_OBJECT_DESTROY = 0x8001
+    EVENT_OBJECT_SHOW = 0x8002
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WINEVENT_SKIPOWNPROCESS = 0x0002
+    OBJID_WINDOW = 0
+    CHILDID_SELF = 0
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._pending = deque()
+        self._hooks = []
+        self._callback = None
+        self.running = False
+
+    def start(self):
+        """Install the hooks; return False if they could not be installed."""
+        if sys.platform != "win32":
+            return False
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        proc_type = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        kinds = {
+            self.EVENT_SYSTEM_FOREGROUND: FOREGROUND,
+            self.EVENT_SYSTEM_MOVESIZEEND: MOVED,
+            self.EVENT_SYSTEM_MINIMIZESTART: MINIMIZE,
+            self.EVENT_SYSTEM_MINIMIZEEND: RESTORE,
+            self.EVENT_OBJECT_DESTROY: DESTROY,
+            self.EVENT_OBJECT_SHOW: CREATE,
+        }
+
+        def callback(hook, event, hwnd, id_object, id_child, thread_id, event_time):
+            if not hwnd or id_object != self.OBJID_WINDOW or id_child != self.CHILDID_SELF:
+                return
+            kind = kinds.get(event)
+            if kind is not None:
+                self._pending.append(WindowEvent(kind, hwnd, self.clock()))
+
+        # Keep a reference so the callback is not garbage collected
+        self._callback = proc_type(callback)
+        flags = self.WINEVENT_OUTOFCONTEXT | self.WINEVENT_SKIPOWNPROCESS
+        ranges = [
+            (self.EVENT_SYSTEM_FOREGROUND, self.EVENT_SYSTEM_FOREGROUND),
+            (self.EVENT_SYSTEM_MOVESIZEEND, self.EVENT_SYSTEM_MOVESIZEEND),
+            (self.EVENT_SYSTEM_MINIMIZESTART, self.EVENT_SYSTEM_MINIMIZEEND),
+            (self.EVENT_OBJECT_DESTROY, self.EVENT_OBJECT_SHOW),
+        ]
+        for low, high in ranges:
+            hook = user32.SetWinEventHook(low, high, 0, self._callback, 0, 0, flags)
+            if not hook:
+                logging.error(f"Failed to install WinEvent hook for events {low:#x}-{high:#x}")
+                self.stop()
+                return False
+            self._hooks.append(hook)
+        self.running = True
+        return True
+
+    def stop(self):
+        """Remove all installed hooks."""
+        if self._hooks:
+            import ctypes
+            for hook in self._hooks:
+                ctypes.windll.user32.UnhookWinEvent(hook)
+        self._hooks = []
+        self.running = False
+
+    def poll(self):
+        """Return and clear all events received since the last poll."""
+        events = []
+        while self._pending:
+            events.append(self._pending.popleft())
+        return events
+
+
+class WindowTracker:
+    """Apply window events from a source to a window_registry.WindowRegistry.
+
+    classify(hwnd) returns (role, process_name, pid) for a candidate window, or None.
+    Listeners are called as listener(event, role) for events that touch a
+    candidate window; focus_listeners are called as listener(event, role) for
+    every foreground change, with role None for non-candidate windows.
+
+    Windows are classified when shown, and again when focused while unknown:
+    a window shown without a title, or that only matches a title rule later,
+    is registered then, and listeners see a CREATE event for it first.
+    """
+
+    def __init__(self, source, registry, classify, clock=time.monotonic, max_samples=1000):
+        self.source = source
+        self.registry = registry
+        self.classify = classify
+        self.clock = clock
+        self.listeners = []
+        self.focus_listeners = []
+        self.latencies = deque(maxlen=max_samples)
+        self.events_processed = 0
+        self.late_registrations = 0
+        self.scans = 0
+
+    def start(self):
+        return self.source.start()
+
+    def stop(self):
+        self.source.stop()
+
+    @property
+    def running(self):
+        return self.source.running
+
+    def note_scan(self):
+        """Record that a full window enumeration was performed."""
+        self.scans += 1
+
+    def process(self):
+        """Drain the event source; return the number of events handled."""
+        events = self.source.poll()
+        for event in events:
+            if event.kind == FOREGROUND and event.hwnd not in self.registry:
+                self._register_late(event)
+            role = self._apply(event)
+            if role is not None:
+                for listener in self.listeners:
+                    listener(event, role)
+            if event.kind == FOREGROUND:
+                for listener in self.focus_listeners:
+                    listener(event, role)
+            self.latencies.append(self.clock() - event.timestamp)
+        self.events_processed += len(events)
+        return len(events)
+
+    def _register_late(self, event):
+        created = event._replace(kind=CREATE)
+        role = self._apply(created)
+        if role is None:
+            return
+        self.late_registrations += 1
+        for listener in self.listeners:
+            listener(created, role)
+
+    def _apply(self, event):
+        registry = self.registry
+        hwnd = event.hwnd
+        if event.kind == DESTROY:
+            return registry.remove(hwnd)
+        if event.kind == CREATE:
+            if hwnd in registry:
+                return None
+            verdict = self.classify(hwnd)
+            if verdict is None:
+                return None
+            registry.add(hwnd, *verdict)
+            return verdict[0]
+        role = registry.role_of(hwnd)
+        if role is None:
+            return None
+        if event.kind == FOREGROUND:
+            registry.touch(hwnd)
+            registry.set_minimized(hwnd, False)
+        elif event.kind == MINIMIZE:
+            registry.set_minimized(hwnd, True)
+        elif event.kind == RESTORE:
+            registry.set_minimized(hwnd, False)
+        return role
+
+    def stats(self):
+        """Return event counters and reaction latency (seconds)."""
+        samples = sorted(self.latencies)
+        return {
+            "events": self.events_processed,
+            "late_registrations": self.late_registrations,
+            "scans": self.scans,
+            "candidates": len(self.registry),
+            "max_latency": samples[-1] if samples else 0.0,
+            "median_latency": samples[len(samples) // 2] if samples else 0.0,
+        }
@@ -0,0 +1,176 @@
+"""
+Ranking of candidate windows.
+Browsers and Electron IDEs own many visible, titled top-level windows
+(tooltips, popups, DevTools, windows parked on other virtual desktops), so
+the first window of a process in EnumWindows order is often not the one the
+user works in. WindowRanker scores each candidate from a few cached features:
+on-screen area, minimized and cloaked state, owner and tool-window styles,
+and whether the user has focused it. The WindowRegistry keeps each role
+sorted by score and then z-order, so among comparable windows the topmost
+(most recently focused) one wins.
+
+Features are read once per window and then kept up to date from window
+events (focus, minimize, restore, move), so re-ranking after a change reads
+and re-sorts only the window that changed.
+"""
+# Extended window style (same value as win32con)
+WS_EX_TOOLWINDOW = 0x00000080
+
+# Score contributions; the area weight is scaled by the window's size (see
+# WindowRanker), the others apply when the window has that property
+DEFAULT_WEIGHTS = {
+    "area": 30,
+    "focused": 10,
+    "minimized": -40,
+    "owned": -100,
+    "tool_window": -200,
+    "cloaked": -200,
+}
+
+# Score of a window that vanished while its features were read
+LOST = float("-inf")
+
+
+class WindowFeatures:
+    """What the ranker knows about one window."""
+
+    __slots__ = ("area", "minimized", "cloaked", "owned", "tool_window")
+
+    def __init__(self, area, minimized, cloaked, owned, tool_window):
+        self.area = area  # 0 (off screen) to 1 (full size), in area_steps steps
+        self.minimized = minimized
+        self.cloaked = cloaked
+        self.owned = owned
+        self.tool_window = tool_window
+
+    def __repr__(self):
+        return (f"WindowFeatures(area={self.area}, minimized={self.minimized}, cloaked={self.cloaked}, "
+                f"owned={self.owned}, tool_window={self.tool_window})")
+
+
+class WindowRanker:
+    """Score windows from cached features read through backend (see window_backend.py).
+
+    A window's area is its on-screen part relative to full_share of the
+    smallest monitor, capped at 1 and rounded to area_steps steps: any window
+    the user could work in counts as full size, so main windows tie on area
+    and focus and the z-order decide between them.
+    """
+
+    def __init__(self, backend, weights=None, full_share=0.25, area_steps=4):
+        self.backend = backend
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.full_share = full_share
+        self.area_steps = area_steps
+        self._features = {}  # hwnd -> WindowFeatures
+        self._focused = set()  # hwnds the user has focused this session
+        self._monitors = None  # monitor rects, read on first use
+        self._reference = 1
+        self.reads = 0
+        self.hits = 0
+
+    def set_monitors(self, monitors):
+        """Use these monitors for on-screen areas; cached areas are recomputed lazily."""
+        self._monitors = [monitor.rect for monitor in monitors]
+        smallest = min((rect.width * rect.height for rect in self._monitors), default=0)
+        self._reference = smallest * self.full_share or 1
+        self._features.clear()
+
+    def visible_area(self, rect):
+        """Part of rect on any monitor, in square pixels."""
+        total = 0
+        for monitor in self._monitors:
+            width = min(rect.right, monitor.right) - max(rect.left, monitor.left)
+            height = min(rect.bottom, monitor.bottom) - max(rect.top, monitor.top)
+            if width > 0 and height > 0:
+                total += width * height
+        return total
+
+    def read(self, hwnd):
+        """Read hwnd's features from the window system; None if the window is gone."""
+        backend = self.backend
+        if self._monitors is None:
+            self.set_monitors(backend.monitors())
+        try:
+            minimized = backend.is_iconic(hwnd)
+            if minimized:
+                # Minimized windows are parked off screen; judge them by their restored size
+                width, height = backend.restored_size(hwnd)
+                area = max(width, 0) * max(height, 0)
+            else:
+                area = self.visible_area(backend.window_rect(hwnd))
+            features = WindowFeatures(
+                round(min(area / self._reference, 1.0) * self.area_steps) / self.area_steps,
+                minimized,
+                backend.is_cloaked(hwnd),
+                bool(backend.owner(hwnd)),
+                bool(backend.get_exstyle(hwnd) & WS_EX_TOOLWINDOW),
+            )
+        except backend.error:
+            return None
+        self.reads += 1
+        return features
+
+    def features(self, hwnd, refresh=False):
+        """Cached features of hwnd, read if missing (or if refresh is set)."""
+        features = None if refresh else self._features.get(hwnd)
+        if features is not None:
+            self.hits += 1
+            return features
+        features = self.read(hwnd)
+        if features is not None:
+            self._features[hwnd] = features
+        return features
+
+    def score(self, hwnd, refresh=False):
+        """Higher for likelier main windows; LOST if hwnd no longer exists."""
+        features = self.features(hwnd, refresh)
+        if features is None:
+            return LOST
+        weights = self.weights
+        score = weights["area"] * features.area
+        if hwnd in self._focused:
+            score += weights["focused"]
+        if features.minimized:
+            score += weights["minimized"]
+        if features.owned:
+            score += weights["owned"]
+        if features.tool_window:
+            score += weights["tool_window"]
+        if features.cloaked:
+            score += weights["cloaked"]
+        return score
+
+    # Updates from window events
+
+    def note_focus(self, hwnd):
+        """hwnd became the foreground window, so it is on screen: restored and not cloaked."""
+        self._focused.add(hwnd)
+        features = self._features.get(hwnd)
+        if features is not None:
+            features.minimized = False
+            features.cloaked = False
+
+    def note_minimized(self, hwnd, minimized):
+        # The restored size is the size the window had on screen, so the area stands
+        features = self._features.get(hwnd)
+        if features is not None:
+            features.minimized = minimized
+
+    def invalidate(self, hwnd):
+        """Forget hwnd's cached features (it moved or was resized); the next score reads them again."""
+        self._features.pop(hwnd, None)
+
+    def forget(self, hwnd):
+        self._features.pop(hwnd, None)
+        self._focused.discard(hwnd)
+
+    def retain(self, hwnds):
+        """Drop everything about windows not in hwnds (after a full scan)."""
+        hwnds = set(hwnds)
+        for hwnd in [hwnd for hwnd in self._features if hwnd not in hwnds]:
+            del self._features[hwnd]
+        self._focused &= hwnds
+
+    def stats(self):
+        return {"windows": len(self._features), "reads": self.reads, "hits": self.hits}
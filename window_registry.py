@@ -0,0 +1,227 @@
+"""
+Indexed registry of candidate IDE and browser windows.
+Windows are indexed by role, process name and PID, and carry a z-order rank
+and a score (see window_ranking.py). Each role's windows are kept sorted by
+score, then z-order, so named groups ("the top three IDE windows plus the top
+two browsers") are resolved without enumerating the desktop again, and a
+change to one window re-sorts only that window.
+"""
+import bisect
+from collections import OrderedDict
+
+
+class WindowInfo:
+    """What the registry knows about one candidate window."""
+
+    __slots__ = ("hwnd", "role", "process_name", "pid", "z", "score")
+
+    def __init__(self, hwnd, role, process_name, pid, z, score=0.0):
+        self.hwnd = hwnd
+        self.role = role
+        self.process_name = process_name
+        self.pid = pid
+        self.z = z  # lower is closer to the top of the z-order
+        self.score = score  # higher is a likelier main window
+
+    def __repr__(self):
+        return (f"WindowInfo(hwnd={self.hwnd}, role={self.role!r}, process={self.process_name!r}, "
+                f"pid={self.pid}, z={self.z}, score={self.score})")
+
+
+class WindowRegistry:
+    """Candidate windows with O(1) lookup by hwnd, role, process name and PID.
+
+    Per-role indexes are ordered from least to most recently used, so the
+    most recent candidate of a role is always at the end. Per-role rankings
+    are sorted lists of (key, hwnd), best first, updated by bisection.
+    """
+
+    def __init__(self):
+        self._windows = {}  # hwnd -> WindowInfo
+        self._by_role = {}  # role -> OrderedDict(hwnd -> None)
+        self._by_process = {}  # process name -> set of hwnds
+        self._by_pid = {}  # pid -> set of hwnds
+        self._ranked = {}  # role -> sorted [(key, hwnd)]
+        self._keys = {}  # hwnd -> its current key in _ranked
+        self._top = 0  # z rank given to the next window raised to the top
+        self.minimized = set()
+
+    def __contains__(self, hwnd):
+        return hwnd in self._windows
+
+    def __len__(self):
+        return len(self._windows)
+
+    def __iter__(self):
+        return iter(self._windows.values())
+
+    def get(self, hwnd):
+        return self._windows.get(hwnd)
+
+    def add(self, hwnd, role, process_name=None, pid=None, z=None, score=None):
+        """Register hwnd (or update it); without z it is treated as the new top window.
+
+        Without score an existing window keeps its score and a new one scores 0.
+        """
+        previous = self._windows.get(hwnd)
+        if previous is not None:
+            self._unindex(previous)
+        if z is None:
+            self._top -= 1
+            z = self._top
+        if score is None:
+            score = previous.score if previous is not None else 0.0
+        info = WindowInfo(hwnd, role, process_name, pid, z, score)
+        self._windows[hwnd] = info
+        windows = self._by_role.setdefault(role, OrderedDict())
+        windows[hwnd] = None
+        windows.move_to_end(hwnd)
+        if process_name is not None:
+            self._by_process.setdefault(process_name, set()).add(hwnd)
+        if pid is not None:
+            self._by_pid.setdefault(pid, set()).add(hwnd)
+        self._rank(info)
+        return info
+
+    def _key(self, info):
+        return (-info.score, info.hwnd in self.minimized, info.z)
+
+    def _rank(self, info):
+        key = self._keys[info.hwnd] = self._key(info)
+        bisect.insort(self._ranked.setdefault(info.role, []), (key, info.hwnd))
+
+    def _unrank(self, info):
+        key = self._keys.pop(info.hwnd, None)
+        if key is None:
+            return
+        ranked = self._ranked[info.role]
+        del ranked[bisect.bisect_left(ranked, (key, info.hwnd))]
+
+    def _rerank_all(self):
+        """Rebuild every ranking with one sort per role (after bulk changes)."""
+        self._keys = {hwnd: self._key(info) for hwnd, info in self._windows.items()}
+        self._ranked = {}
+        for hwnd, info in self._windows.items():
+            self._ranked.setdefault(info.role, []).append((self._keys[hwnd], hwnd))
+        for ranked in self._ranked.values():
+            ranked.sort()
+
+    def _unindex(self, info):
+        self._unrank(info)
+        self._by_role[info.role].pop(info.hwnd, None)
+        for index, key in ((self._by_process, info.process_name), (self._by_pid, info.pid)):
+            hwnds = index.get(key)
+            if hwnds is not None:
+                hwnds.discard(info.hwnd)
+                if not hwnds:
+                    del index[key]
+
+    def remove(self, hwnd):
+        """Forget hwnd; return the role it had, or None."""
+        info = self._windows.pop(hwnd, None)
+        self.minimized.discard(hwnd)
+        if info is None:
+            return None
+        self._unindex(info)
+        return info.role
+
+    def refresh(self, entries, scores=None, minimized=()):
+        """Replace the contents from one enumeration of (hwnd, role, process_name, pid), top first.
+
+        scores maps hwnds to their scores (default 0) and minimized lists the
+        minimized ones; the rankings are built with one sort.
+        """
+        self.clear()
+        scores = scores or {}
+        self.minimized.update(minimized)
+        windows = self._windows
+        # Register bottom-up so the topmost window of each role is also the most recent
+        for z in range(len(entries) - 1, -1, -1):
+            hwnd, role, process_name, pid = entries[z]
+            windows[hwnd] = WindowInfo(hwnd, role, process_name, pid, z, scores.get(hwnd, 0.0))
+            self._by_role.setdefault(role, OrderedDict())[hwnd] = None
+            if process_name is not None:
+                self._by_process.setdefault(process_name, set()).add(hwnd)
+            if pid is not None:
+                self._by_pid.setdefault(pid, set()).add(hwnd)
+        self.minimized.intersection_update(windows)
+        self._rerank_all()
+        self._top = 0
+
+    def touch(self, hwnd):
+        """Mark hwnd as the most recently used window and move it to the top of the z-order."""
+        info = self._windows.get(hwnd)
+        if info is None:
+            return
+        self._by_role[info.role].move_to_end(hwnd)
+        self._unrank(info)
+        self._top -= 1
+        info.z = self._top
+        self._rank(info)
+
+    def set_minimized(self, hwnd, minimized):
+        info = self._windows.get(hwnd)
+        if info is None or minimized == (hwnd in self.minimized):
+            return
+        self._unrank(info)
+        if minimized:
+            self.minimized.add(hwnd)
+        else:
+            self.minimized.discard(hwnd)
+        self._rank(info)
+
+    def set_score(self, hwnd, score):
+        """Change one window's score, re-sorting only that window."""
+        info = self._windows.get(hwnd)
+        if info is None or info.score == score:
+            return
+        self._unrank(info)
+        info.score = score
+        self._rank(info)
+
+    def set_scores(self, scores):
+        """Change many windows' scores at once ({hwnd: score}), with one sort per role."""
+        for hwnd, score in scores.items():
+            info = self._windows.get(hwnd)
+            if info is not None:
+                info.score = score
+        self._rerank_all()
+
+    def role_of(self, hwnd):
+        info = self._windows.get(hwnd)
+        return info.role if info is not None else None
+
+    def process_name(self, hwnd):
+        info = self._windows.get(hwnd)
+        return info.process_name if info is not None else None
+
+    def by_process(self, process_name):
+        return set(self._by_process.get(process_name, ()))
+
+    def by_pid(self, pid):
+        return set(self._by_pid.get(pid, ()))
+
+    def by_role(self, role):
+        """Return the hwnds of a role, least recently used first."""
+        return list(self._by_role.get(role, ()))
+
+    def top(self, role, count):
+        """Return up to count hwnds of role, best first: highest score, then not minimized, then topmost."""
+        ranked = self._ranked.get(role)
+        if not ranked or count <= 0:
+            return []
+        return [hwnd for _, hwnd in ranked[:count]]
+
+    def group(self, spec):
+        """Resolve a group spec such as {"ide": 3, "browser": 2} to hwnds per role."""
+        return {role: self.top(role, count) for role, count in spec.items()}
+
+    def clear(self):
+        self._windows.clear()
+        self._by_role.clear()
+        self._by_process.clear()
+        self._by_pid.clear()
+        self._ranked.clear()
+        self._keys.clear()
+        self.minimized.clear()
+        self._top = 0
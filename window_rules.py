@@ -0,0 +1,222 @@
+"""
+Declarative window-matching rules.
+Rules from config.json are compiled once into a RuleMatcher: process and class
+names go into hashed lookup tables, all title patterns into a single combined
+regex, and each rule becomes one bit so candidate rules are found with a few
+integer operations per window.
+
+A rule is a dict; every field is optional and all given fields must match:
+    role            "ide" or "browser" (the verdict when the rule matches)
+    exclude         true to reject the window instead of assigning a role
+    process         list of process names (case-insensitive)
+    class           list of window class names
+    title           regular expression searched in the title (case-insensitive)
+    parent_process  list of process names, any of which must be an ancestor
+    min_width, min_height, max_width, max_height   window size bounds in pixels
+Rules are tried in order and the first match wins.
+"""
+import logging
+import re
+from collections import OrderedDict
+from collections.abc import Mapping
+
+SIZE_FIELDS = ("min_width", "min_height", "max_width", "max_height")
+# Above this many candidate title patterns, one combined regex pass beats individual searches
+COMBINED_REGEX_THRESHOLD = 3
+
+
+def default_rules(config):
+    """Implicit rules for the ide_process_names/browser_process_names lists."""
+    return [
+        {"role": "ide", "process": config.get("ide_process_names", [])},
+        {"role": "browser", "process": config.get("browser_process_names", [])},
+    ]
+
+
+def compile_rules(config):
+    """Build a RuleMatcher from config["rules"] followed by the process-name lists."""
+    return RuleMatcher(list(config.get("rules", [])) + default_rules(config))
+
+
+class RuleMatcher:
+    """Compiled form of an ordered list of rules, with a per-window verdict memo."""
+
+    def __init__(self, rules, memo_size=4096):
+        self.rules = []
+        for rule in rules:
+            try:
+                self.rules.append(self._validate(rule))
+            except (ValueError, TypeError, re.error) as e:
+                logging.error(f"Ignoring invalid window rule {rule}: {e}")
+
+        # bit i stands for self.rules[i]; a lower bit means a higher priority
+        self.process_bits = {}
+        self.class_bits = {}
+        self.process_any = 0  # rules with no process constraint
+        self.class_any = 0
+        self.title_any = 0
+        self.role_mask = 0  # rules that assign a role rather than exclude
+        title_patterns = []
+        self._checks = []  # per rule: (verdict, size bounds or None, parent names or None)
+        for index, rule in enumerate(self.rules):
+            bit = 1 << index
+            bounds = None
+            if any(key in rule for key in SIZE_FIELDS):
+                inf = float("inf")
+                bounds = (rule.get("min_width", 0), rule.get("min_height", 0),
+                          rule.get("max_width", inf), rule.get("max_height", inf))
+            parents = frozenset(rule["parent_process"]) if "parent_process" in rule else None
+            self._checks.append((None if rule.get("exclude") else rule["role"], bounds, parents))
+            if not rule.get("exclude"):
+                self.role_mask |= bit
+            if "process" in rule:
+                for name in rule["process"]:
+                    self.process_bits[name] = self.process_bits.get(name, 0) | bit
+            else:
+                self.process_any |= bit
+            if "class" in rule:
+                for name in rule["class"]:
+                    self.class_bits[name] = self.class_bits.get(name, 0) | bit
+            else:
+                self.class_any |= bit
+            if "title" in rule:
+                title_patterns.append((index, rule["title"]))
+            else:
+                self.title_any |= bit
+        self._compile_titles(title_patterns)
+
+        self.memo_size = memo_size
+        self._memo = OrderedDict()  # hwnd -> (title, verdict)
+        self.matches = 0
+        self.memo_hits = 0
+
+    @staticmethod
+    def _validate(rule):
+        if not isinstance(rule, Mapping):
+            raise TypeError("rule must be an object")
+        if not rule.get("exclude") and rule.get("role") not in ("ide", "browser"):
+            raise ValueError("rule needs a role of 'ide' or 'browser', or exclude: true")
+        rule = dict(rule)
+        for key in ("process", "parent_process"):
+            if key in rule:
+                rule[key] = [str(name).lower() for name in rule[key]]
+        if "class" in rule:
+            rule["class"] = [str(name) for name in rule["class"]]
+        if "title" in rule:
+            re.compile(rule["title"])
+        for key in SIZE_FIELDS:
+            if key in rule:
+                rule[key] = int(rule[key])
+        return rule
+
+    def _compile_titles(self, patterns):
+        """Combine all title patterns into one regex that reports every rule it matches.
+
+        Each pattern sits in an optional lookahead at position 0 followed by an
+        empty named group, so a single match() records which patterns occur.
+        """
+        self._title_regex = None
+        self._title_regexes = {index: re.compile(pattern, re.IGNORECASE) for index, pattern in patterns}
+        if not patterns:
+            return
+        parts = [f"(?:(?=.*?(?:{pattern}))(?P<r{index}>))?" for index, pattern in patterns]
+        try:
+            self._title_regex = re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+        except re.error:
+            # Patterns using their own groups or backreferences cannot be combined
+            self._title_regex = None
+
+    def title_bits(self, title, needed):
+        """Return the subset of the rule bits in needed whose title pattern matches title.
+
+        A handful of candidates are searched individually; beyond that a single
+        pass of the combined regex is cheaper.
+        """
+        bits = 0
+        indexes = []
+        while needed:
+            bit = needed & -needed
+            needed ^= bit
+            indexes.append(bit.bit_length() - 1)
+        if self._title_regex is not None and len(indexes) > COMBINED_REGEX_THRESHOLD:
+            match = self._title_regex.match(title)
+            for index in indexes:
+                if match.group(f"r{index}") is not None:
+                    bits |= 1 << index
+        else:
+            for index in indexes:
+                if self._title_regexes[index].search(title):
+                    bits |= 1 << index
+        return bits
+
+    def match(self, process_name, class_name, title, size=None, ancestors=None):
+        """Return the role for a window, or None if excluded or unmatched.
+
+        size() -> (width, height) and ancestors() -> [process names] are only
+        called when a candidate rule needs them.
+        """
+        self.matches += 1
+        process_name = (process_name or "").lower()
+        candidates = (self.process_bits.get(process_name, 0) | self.process_any) & \
+                     (self.class_bits.get(class_name, 0) | self.class_any)
+        if not candidates & self.role_mask:
+            return None
+        needs_title = candidates & ~self.title_any
+        if needs_title:
+            candidates = (candidates & self.title_any) | self.title_bits(title or "", needs_title)
+
+        window_size = None
+        window_ancestors = None
+        checks = self._checks
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            verdict, bounds, parents = checks[bit.bit_length() - 1]
+            if bounds is not None:
+                if window_size is None:
+                    window_size = size() if size is not None else (0, 0)
+                width, height = window_size
+                if not (bounds[0] <= width <= bounds[2] and bounds[1] <= height <= bounds[3]):
+                    continue
+            if parents is not None:
+                if window_ancestors is None:
+                    window_ancestors = set(ancestors()) if ancestors is not None else set()
+                if window_ancestors.isdisjoint(parents):
+                    continue
+            return verdict
+        return None
+
+    def recall(self, hwnd, title):
+        """Return (True, verdict) if hwnd was classified with this title before, else (False, None)."""
+        entry = self._memo.get(hwnd)
+        if entry is not None and entry[0] == title:
+            self.memo_hits += 1
+            return True, entry[1]
+        return False, None
+
+    def remember(self, hwnd, title, verdict):
+        """Memoize the verdict for hwnd until its title changes."""
+        self._memo[hwnd] = (title, verdict)
+        self._memo.move_to_end(hwnd)
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+
+    def forget(self, hwnd=None):
+        """Drop the memo for one window, or all windows."""
+        if hwnd is None:
+            self._memo.clear()
+        else:
+            self._memo.pop(hwnd, None)
+
+    def retain(self, hwnds):
+        """Drop memo entries for windows not in hwnds (e.g. after a full enumeration)."""
+        for hwnd in [hwnd for hwnd in self._memo if hwnd not in hwnds]:
+            del self._memo[hwnd]
+
+    def stats(self):
+        return {
+            "rules": len(self.rules),
+            "matches": self.matches,
+            "memo_hits": self.memo_hits,
+            "memo_size": len(self._memo),
+        }
@@ -0,0 +1,100 @@
+"""
+Applied-state cache for layered window attributes.
+Remembers the opacity, click-through flag and extended style last applied to
+each window so repeated requests issue only the Win32 calls that change
+something.
+"""
+from collections import namedtuple
+
+# Extended window styles (same values as win32con)
+WS_EX_TRANSPARENT = 0x00000020
+WS_EX_LAYERED = 0x00080000
+
+AppliedState = namedtuple("AppliedState", ["opacity", "clickthrough", "exstyle"])
+
+CALLS = ("GetWindowLong", "SetWindowLong", "SetLayeredWindowAttributes")
+
+
+class LayeredWindowState:
+    """Issue the minimal set of style/alpha calls to reach a target state.
+
+    get_exstyle(hwnd), set_exstyle(hwnd, style) and set_alpha(hwnd, alpha)
+    wrap GetWindowLong, SetWindowLong and SetLayeredWindowAttributes. The
+    extended style is re-read on every apply (a cheap, local call) so changes
+    made by other programs invalidate the cached entry.
+
+    on_adopt(hwnd, exstyle), if given, is called with the style read before
+    changing a window that has no cached entry, so the original can be kept.
+    """
+
+    def __init__(self, get_exstyle, set_exstyle, set_alpha, on_adopt=None):
+        self.get_exstyle = get_exstyle
+        self.set_exstyle = set_exstyle
+        self.set_alpha = set_alpha
+        self.on_adopt = on_adopt
+        self._applied = {}
+        self.issued = dict.fromkeys(CALLS, 0)
+        self.skipped = dict.fromkeys(CALLS, 0)
+        self.external_changes = 0
+
+    def apply(self, hwnd, opacity, clickthrough=False):
+        """Bring hwnd to the given opacity and click-through state.
+
+        Returns True if any state-changing call was issued.
+        """
+        exstyle = self.get_exstyle(hwnd)
+        self.issued["GetWindowLong"] += 1
+
+        entry = self._applied.get(hwnd)
+        if entry is not None and entry.exstyle != exstyle:
+            # Someone else changed the style; nothing we remember can be trusted
+            self.external_changes += 1
+            entry = None
+        if entry is None and self.on_adopt is not None:
+            self.on_adopt(hwnd, exstyle)
+
+        new_style = exstyle | WS_EX_LAYERED
+        if clickthrough:
+            new_style |= WS_EX_TRANSPARENT
+        else:
+            new_style &= ~WS_EX_TRANSPARENT
+
+        changed = False
+        if new_style != exstyle:
+            self.set_exstyle(hwnd, new_style)
+            self.issued["SetWindowLong"] += 1
+            changed = True
+        else:
+            self.skipped["SetWindowLong"] += 1
+
+        # A window that just became layered has no alpha yet, so always set it then
+        newly_layered = not exstyle & WS_EX_LAYERED
+        if entry is None or newly_layered or entry.opacity != opacity:
+            self.set_alpha(hwnd, opacity)
+            self.issued["SetLayeredWindowAttributes"] += 1
+            changed = True
+        else:
+            self.skipped["SetLayeredWindowAttributes"] += 1
+
+        self._applied[hwnd] = AppliedState(opacity, clickthrough, new_style)
+        return changed
+
+    def get(self, hwnd):
+        """Return the last AppliedState for hwnd, or None."""
+        return self._applied.get(hwnd)
+
+    def invalidate(self, hwnd=None):
+        """Forget one window (e.g. when it is destroyed), or all if hwnd is None."""
+        if hwnd is None:
+            self._applied.clear()
+        else:
+            self._applied.pop(hwnd, None)
+
+    def stats(self):
+        """Return counters of issued and skipped Win32 calls."""
+        return {
+            "windows": len(self._applied),
+            "issued": dict(self.issued),
+            "skipped": dict(self.skipped),
+            "external_changes": self.external_changes,
+        }